@@ -1,15 +1,24 @@
 #!/usr/bin/env python
 import os
 import optparse
+import hashlib
 
 import sys
 import re
 
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
+try:
+    import json
+except ImportError:
+    json = None
+
 from pip.exceptions import InstallationError, CommandError, PipError
+from pip.backwardcompat import Queue, Empty as QueueEmpty, reraise
 from pip.log import logger
-from pip.util import get_installed_distributions, get_prog
-from pip.vcs import git, mercurial, subversion, bazaar  # noqa
-from pip.baseparser import create_main_parser
 from pip.commands import commands, get_similar_commands, get_summaries
 
 
@@ -33,7 +42,8 @@ def autocomplete():
     except IndexError:
         current = ''
 
-    subcommands = [cmd for cmd, summary in get_summaries()]
+    data = completion_data()
+    subcommands = list(data['commands'])
     options = []
     # subcommand
     try:
@@ -41,7 +51,6 @@ def autocomplete():
     except IndexError:
         subcommand_name = None
 
-    parser = create_main_parser()
     # subcommand options
     if subcommand_name:
         # special case: 'help' subcommand has no options
@@ -51,19 +60,17 @@ def autocomplete():
         if subcommand_name == 'uninstall' and not current.startswith('-'):
             installed = []
             lc = current.lower()
-            for dist in get_installed_distributions(local_only=True):
-                if dist.key.startswith(lc) and dist.key not in cwords[1:]:
-                    installed.append(dist.key)
+            for key in data['installed']:
+                if key.startswith(lc) and key not in cwords[1:]:
+                    installed.append(key)
             # if there are no dists installed, fall back to option completion
             if installed:
                 for dist in installed:
                     print(dist)
                 sys.exit(1)
 
-        subcommand = commands[subcommand_name](parser)
-        options += [(opt.get_opt_string(), opt.nargs)
-                    for opt in subcommand.parser.option_list_all
-                    if opt.help != optparse.SUPPRESS_HELP]
+        options += [tuple(option) for option in
+                    data['command_options'][subcommand_name]]
 
         # filter out previously specified options from available options
         prev_opts = [x.split('=')[0] for x in cwords[1:cword - 1]]
@@ -79,26 +86,109 @@ def autocomplete():
     else:
         # show main parser options only when necessary
         if current.startswith('-') or current.startswith('--'):
-            opts = [i.option_list for i in parser.option_groups]
-            opts.append(parser.option_list)
-            opts = (o for it in opts for o in it)
-
-            subcommands += [i.get_opt_string() for i in opts
-                            if i.help != optparse.SUPPRESS_HELP]
+            subcommands += [opt for opt, nargs in data['main_options']]
 
         print(' '.join([x for x in subcommands if x.startswith(current)]))
     sys.exit(1)
 
 
-def parseopts(args):
+def _completion_data_path():
+    from pip.locations import default_storage_dir
+    key = hashlib.sha1((sys.executable or sys.prefix).encode('utf-8'))
+    key = key.hexdigest()[:16]
+    return os.path.join(default_storage_dir, 'completion', key + '.json')
+
+
+def _completion_sources():
+    """The files the options of the commands are defined in."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    sources = [os.path.join(here, name)
+               for name in ('baseparser.py', 'cmdoptions.py')]
+    commands_dir = os.path.join(here, 'commands')
+    sources.extend([os.path.join(commands_dir, name)
+                    for name in sorted(os.listdir(commands_dir))
+                    if name.endswith('.py')])
+    mtimes = []
+    for path in sources:
+        try:
+            mtimes.append([path, os.stat(path).st_mtime])
+        except OSError:
+            pass
+    return mtimes
+
+
+def completion_data():
+    """
+    Return what autocomplete() needs: the names of the commands, the
+    options of the main parser and of each command as [option, nargs]
+    pairs, and the keys of the local installed distributions.
+
+    All of it is kept in a file in the storage directory, so completion
+    doesn't have to import the commands and pkg_resources on every TAB
+    press.  The options are made again when pip changes, and the installed
+    distributions when a directory on sys.path changes.
+    """
+    from pip.locations import sys_path_mtimes
+    path = _completion_data_path()
+    data = {}
+    if json is not None:
+        try:
+            fp = open(path)
+            try:
+                data = json.load(fp)
+            finally:
+                fp.close()
+        except (IOError, OSError, ValueError):
+            data = {}
+    changed = False
+    sources = [__version__, _completion_sources()]
+    if data.get('sources') != sources:
+        data.update(_make_completion_options())
+        data['sources'] = sources
+        changed = True
+    sys_path = [sys.prefix, sys_path_mtimes()]
+    if data.get('sys_path') != sys_path:
+        from pip.util import get_installed_distributions
+        data['installed'] = [dist.key for dist in
+                             get_installed_distributions(local_only=True)]
+        data['sys_path'] = sys_path
+        changed = True
+    if changed and json is not None:
+        from pip.util import write_atomic
+        try:
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            write_atomic(path, json.dumps(data), 'w')
+        except (IOError, OSError):
+            pass
+    return data
+
+
+def _make_completion_options():
+    from pip.baseparser import create_main_parser
     parser = create_main_parser()
-    parser.main = True # so the help formatter knows
+    opts = [i.option_list for i in parser.option_groups]
+    opts.append(parser.option_list)
+    opts = (o for it in opts for o in it)
+    main_options = [[i.get_opt_string(), i.nargs] for i in opts
+                    if i.help != optparse.SUPPRESS_HELP]
+    command_options = {}
+    for name in commands:
+        subcommand = commands[name](parser)
+        command_options[name] = [
+            [opt.get_opt_string(), opt.nargs]
+            for opt in subcommand.parser.option_list_all
+            if opt.help != optparse.SUPPRESS_HELP]
+    return {
+        'commands': [cmd for cmd, summary in get_summaries()],
+        'main_options': main_options,
+        'command_options': command_options,
+        }
 
-    # create command listing
-    command_summaries = get_summaries()
 
-    description = [''] + ['%-27s %s' % (i, j) for i, j in command_summaries]
-    parser.description = '\n'.join(description)
+def parseopts(args):
+    from pip.baseparser import create_main_parser
+    parser = create_main_parser()
 
     options, args = parser.parse_args(args)
 
@@ -215,6 +305,53 @@ class FrozenRequirement(object):
                     req = '%s@%s#egg=%s' % (svn_location, rev, cls.egg_name(dist))
         return cls(dist.project_name, req, editable, comments)
 
+    # Number of VCS checkouts from_dists() queries at the same time
+    max_workers = 8
+
+    @classmethod
+    def from_dists(cls, dists, dependency_links, find_tags=False):
+        """
+        Return the FrozenRequirement of each of dists, in the same order.
+
+        Finding the requirement of a distribution in a VCS checkout takes
+        a few VCS commands, so those are run for several checkouts at a
+        time.
+        """
+        from pip.vcs import vcs
+        results = [None] * len(dists)
+        pending_queue = Queue()
+        for i, dist in enumerate(dists):
+            location = os.path.normcase(os.path.abspath(dist.location))
+            if vcs.get_backend_name(location):
+                pending_queue.put(i)
+            else:
+                results[i] = cls.from_dist(dist, dependency_links, find_tags)
+        errors = []
+
+        def worker():
+            while not errors:
+                try:
+                    i = pending_queue.get(False)
+                except QueueEmpty:
+                    return
+                try:
+                    results[i] = cls.from_dist(dists[i], dependency_links,
+                                               find_tags)
+                except Exception:
+                    errors.append(sys.exc_info())
+
+        threads = []
+        for i in range(min(cls.max_workers, pending_queue.qsize())):
+            t = threading.Thread(target=worker)
+            t.setDaemon(True)
+            threads.append(t)
+            t.start()
+        for t in threads:
+            t.join()
+        if errors:
+            reraise(errors[0])
+        return results
+
     @staticmethod
     def egg_name(dist):
         name = dist.egg_name()
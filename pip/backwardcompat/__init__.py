@@ -9,6 +9,13 @@ __all__ = ['WindowsError']
 
 uses_pycache = hasattr(imp, 'cache_from_source')
 
+
+def cache_from_source(path):
+    """Return the path of the .pyc file the module at path compiles to."""
+    if uses_pycache:
+        return imp.cache_from_source(path)
+    return path + (__debug__ and 'c' or 'o')
+
 class NeverUsedException(Exception):
     """this exception should never be raised"""
 
@@ -70,6 +77,9 @@ if sys.version_info >= (3,):
     bytes = bytes
     string_types = (str,)
     raw_input = input
+
+    def reraise(exc_info):
+        raise exc_info[1].with_traceback(exc_info[2])
 else:
     from cStringIO import StringIO
     from urllib2 import URLError, HTTPError
@@ -108,6 +118,9 @@ else:
     raw_input = raw_input
     BytesIO = StringIO
 
+    exec('def reraise(exc_info):\n'
+         '    raise exc_info[0], exc_info[1], exc_info[2]\n')
+
 
 from distutils.sysconfig import get_python_lib, get_python_version
 
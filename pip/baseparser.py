@@ -15,7 +15,7 @@ class PrettyHelpFormatter(optparse.IndentedHelpFormatter):
     """A prettier/less verbose help formatter for optparse."""
 
     def __init__(self, *args, **kwargs):
-        # help position must be aligned with __init__.parseopts.description
+        # help position must be aligned with MainOptionParser.format_help
         kwargs['max_help_position'] = 30
         kwargs['indent_increment'] = 1
         kwargs['width'] = get_terminal_size()[0] - 2
@@ -226,6 +226,22 @@ except pkg_resources.DistributionNotFound:
     version = None
 
 
+class MainOptionParser(ConfigOptionParser):
+    """The parser of the general options, whose description lists the
+    commands."""
+
+    main = True  # so the help formatter knows
+
+    def format_help(self, formatter=None):
+        # listing the commands imports them, so it's only done when the
+        # help is shown
+        from pip.commands import get_summaries
+        description = [''] + ['%-27s %s' % (name, summary)
+                              for name, summary in get_summaries()]
+        self.description = '\n'.join(description)
+        return ConfigOptionParser.format_help(self, formatter)
+
+
 def create_main_parser():
     parser_kw = {
         'usage': '\n%prog <command> [options]',
@@ -235,7 +251,7 @@ def create_main_parser():
         'prog': get_prog(),
     }
 
-    parser = ConfigOptionParser(**parser_kw)
+    parser = MainOptionParser(**parser_kw)
     genopt = optparse.OptionGroup(parser, 'General Options')
     parser.disable_interspersed_args()
 
@@ -85,6 +85,49 @@ download_cache = make_option(
     default=None,
     help='Cache downloaded packages in <dir>.')
 
+download_cache_size = make_option(
+    '--download-cache-size',
+    dest='download_cache_size',
+    metavar='MB',
+    type='int',
+    default=None,
+    help='Evict the least recently used packages from the download cache '
+         'when it grows beyond <MB> megabytes.')
+
+download_workers = make_option(
+    '--download-workers',
+    dest='download_workers',
+    metavar='n',
+    type='int',
+    default=4,
+    help='Download up to <n> packages at the same time when their URLs are '
+         'already known (default %default). 1 disables this.')
+
+download_host_workers = make_option(
+    '--download-host-workers',
+    dest='download_host_workers',
+    metavar='n',
+    type='int',
+    default=2,
+    help='Download at most <n> packages from the same host at the same '
+         'time (default %default).')
+
+index_cache = make_option(
+    '--index-cache',
+    dest='index_cache',
+    metavar='dir',
+    default=None,
+    help='Cache index pages in <dir> and revalidate them on later runs.')
+
+cache_ttl = make_option(
+    '--cache-ttl',
+    dest='cache_ttl',
+    metavar='seconds',
+    type='int',
+    default=None,
+    help='Use pages from the --index-cache without revalidating them if '
+         'they were checked less than <seconds> ago.')
+
 no_deps = make_option(
     '--no-deps', '--no-dependencies',
     dest='ignore_dependencies',
@@ -138,6 +181,8 @@ index_group = {
         no_index,
         find_links,
         use_mirrors,
-        mirrors
+        mirrors,
+        index_cache,
+        cache_ttl,
         ]
     }
@@ -3,60 +3,94 @@ Package containing all pip commands
 """
 
 
-from pip.commands.bundle import BundleCommand
-from pip.commands.completion import CompletionCommand
-from pip.commands.freeze import FreezeCommand
-from pip.commands.help import HelpCommand
-from pip.commands.list import ListCommand
-from pip.commands.search import SearchCommand
-from pip.commands.show import ShowCommand
-from pip.commands.install import InstallCommand
-from pip.commands.uninstall import UninstallCommand
-from pip.commands.unzip import UnzipCommand
-from pip.commands.zip import ZipCommand
-from pip.commands.wheel import WheelCommand
-
-
-commands = {
-    BundleCommand.name: BundleCommand,
-    CompletionCommand.name: CompletionCommand,
-    FreezeCommand.name: FreezeCommand,
-    HelpCommand.name: HelpCommand,
-    SearchCommand.name: SearchCommand,
-    ShowCommand.name: ShowCommand,
-    InstallCommand.name: InstallCommand,
-    UninstallCommand.name: UninstallCommand,
-    UnzipCommand.name: UnzipCommand,
-    ZipCommand.name: ZipCommand,
-    ListCommand.name: ListCommand,
-    WheelCommand.name: WheelCommand,
-}
+class CommandRegistry(object):
+    """
+    Maps command names to command classes, importing the module of a
+    command only when its class is first looked up, so that running one
+    command doesn't import all the others.
+    """
+
+    def __init__(self, modules):
+        # name -> (module name, class name)
+        self._modules = modules
+        self._classes = {}
+
+    def __getitem__(self, name):
+        if name not in self._classes:
+            module_name, class_name = self._modules[name]
+            module = __import__(module_name, {}, {}, [class_name])
+            self._classes[name] = getattr(module, class_name)
+        return self._classes[name]
+
+    def get(self, name, default=None):
+        if name in self:
+            return self[name]
+        return default
+
+    def __contains__(self, name):
+        return name in self._modules
+
+    def __iter__(self):
+        return iter(self._modules)
+
+    def __len__(self):
+        return len(self._modules)
+
+    def keys(self):
+        return sorted(self._modules)
+
+    def values(self):
+        return [self[name] for name in self]
+
+    def items(self):
+        return [(name, self[name]) for name in self]
+
+
+commands = CommandRegistry({
+    'bundle': ('pip.commands.bundle', 'BundleCommand'),
+    'completion': ('pip.commands.completion', 'CompletionCommand'),
+    'freeze': ('pip.commands.freeze', 'FreezeCommand'),
+    'help': ('pip.commands.help', 'HelpCommand'),
+    'search': ('pip.commands.search', 'SearchCommand'),
+    'show': ('pip.commands.show', 'ShowCommand'),
+    'install': ('pip.commands.install', 'InstallCommand'),
+    'uninstall': ('pip.commands.uninstall', 'UninstallCommand'),
+    'unzip': ('pip.commands.unzip', 'UnzipCommand'),
+    'zip': ('pip.commands.zip', 'ZipCommand'),
+    'list': ('pip.commands.list', 'ListCommand'),
+    'wheel': ('pip.commands.wheel', 'WheelCommand'),
+})
+
 
 
 commands_order = [
-    InstallCommand,
-    UninstallCommand,
-    FreezeCommand,
-    ListCommand,
-    ShowCommand,
-    SearchCommand,
-    WheelCommand,
-    ZipCommand,
-    UnzipCommand,
-    BundleCommand,
-    HelpCommand,
+    'install',
+    'uninstall',
+    'freeze',
+    'list',
+    'show',
+    'search',
+    'wheel',
+    'zip',
+    'unzip',
+    'bundle',
+    'help',
 ]
 
 
 def get_summaries(ignore_hidden=True, ordered=True):
-    """Yields sorted (command name, command summary) tuples."""
+    """
+    Yields sorted (command name, command summary) tuples.  This imports
+    the commands, as the summaries are attributes of their classes.
+    """
 
     if ordered:
-        cmditems = _sort_commands(commands, commands_order)
+        names = _sort_commands(commands, commands_order)
     else:
-        cmditems = commands.items()
+        names = commands.keys()
 
-    for name, command_class in cmditems:
+    for name in names:
+        command_class = commands[name]
         if ignore_hidden and command_class.hidden:
             continue
 
@@ -80,9 +114,9 @@ def get_similar_commands(name):
 def _sort_commands(cmddict, order):
     def keyfn(key):
         try:
-            return order.index(key[1])
+            return order.index(key)
         except ValueError:
             # unordered items should come last
             return 0xff
 
-    return sorted(cmddict.items(), key=keyfn)
+    return sorted(cmddict.keys(), key=keyfn)
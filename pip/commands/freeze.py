@@ -1,11 +1,10 @@
 import re
 import sys
-import pkg_resources
 import pip
 from pip.req import InstallRequirement
 from pip.log import logger
 from pip.basecommand import Command
-from pip.util import get_installed_distributions
+from pip.util import installed_distributions
 
 
 class FreezeCommand(Command):
@@ -60,7 +59,8 @@ class FreezeCommand(Command):
 
         f = sys.stdout
 
-        for dist in pkg_resources.working_set:
+        installed = installed_distributions()
+        for dist in installed.dists:
             if dist.has_metadata('dependency_links.txt'):
                 dependency_links.extend(dist.get_metadata_lines('dependency_links.txt'))
         for link in find_links:
@@ -69,8 +69,9 @@ class FreezeCommand(Command):
         for link in find_links:
             f.write('-f %s\n' % link)
         installations = {}
-        for dist in get_installed_distributions(local_only=local_only):
-            req = pip.FrozenRequirement.from_dist(dist, dependency_links, find_tags=find_tags)
+        dists = installed.select(local_only=local_only)
+        for req in pip.FrozenRequirement.from_dists(dists, dependency_links,
+                                                    find_tags=find_tags):
             installations[req.name] = req
         if requirement:
             req_f = open(requirement)
@@ -70,6 +70,9 @@ class InstallCommand(Command):
             help="Download packages into <dir> instead of installing them, regardless of what's already installed.")
 
         cmd_opts.add_option(cmdoptions.download_cache)
+        cmd_opts.add_option(cmdoptions.download_cache_size)
+        cmd_opts.add_option(cmdoptions.download_workers)
+        cmd_opts.add_option(cmdoptions.download_host_workers)
 
         cmd_opts.add_option(
             '--src', '--source', '--source-dir', '--source-directory',
@@ -139,6 +142,15 @@ class InstallCommand(Command):
 
         cmd_opts.add_option(cmdoptions.use_wheel)
 
+        cmd_opts.add_option(
+            '--lazy-wheels',
+            dest='lazy_wheels',
+            action='store_true',
+            default=False,
+            help="Read only the metadata of remote wheels, with HTTP Range "
+            "requests, while finding the requirements, and download the "
+            "wheels just before installing them.")
+
         cmd_opts.add_option(
             '--pre',
             action='store_true',
@@ -162,6 +174,8 @@ class InstallCommand(Command):
                              index_urls=index_urls,
                              use_mirrors=options.use_mirrors,
                              mirrors=options.mirrors,
+                             index_cache=options.index_cache,
+                             index_cache_ttl=options.cache_ttl,
                              use_wheel=options.use_wheel)
 
     def run(self, options, args):
@@ -170,6 +184,10 @@ class InstallCommand(Command):
             options.ignore_installed = True
         options.build_dir = os.path.abspath(options.build_dir)
         options.src_dir = os.path.abspath(options.src_dir)
+        # wheels are only built and installed for plain installs
+        wheel_cache = (options.use_wheel and not options.download_dir
+                       and not (options.install_options or options.global_options
+                                or options.root_path or options.as_egg))
         install_options = options.install_options or []
         if options.use_user_site:
             if virtualenv_no_global():
@@ -198,6 +216,9 @@ class InstallCommand(Command):
             src_dir=options.src_dir,
             download_dir=options.download_dir,
             download_cache=options.download_cache,
+            download_cache_size=options.download_cache_size,
+            download_workers=options.download_workers,
+            download_host_workers=options.download_host_workers,
             upgrade=options.upgrade,
             as_egg=options.as_egg,
             ignore_installed=options.ignore_installed,
@@ -205,7 +226,10 @@ class InstallCommand(Command):
             force_reinstall=options.force_reinstall,
             use_user_site=options.use_user_site,
             target_dir=temp_target_dir,
-            skip_reqs=install_skip_reqs)
+            skip_reqs=install_skip_reqs,
+            wheel_cache=wheel_cache,
+            lazy_wheels=(options.lazy_wheels
+                         and not (options.no_install or self.bundle)))
         for name in args:
             requirement_set.add_requirement(
                 InstallRequirement.from_line(name, None, prereleases=options.pre))
@@ -1,9 +1,8 @@
 from pip.basecommand import Command
-from pip.exceptions import DistributionNotFound, BestVersionAlreadyInstalled
 from pip.index import PackageFinder
 from pip.log import logger
 from pip.req import InstallRequirement
-from pip.util import get_installed_distributions, dist_is_editable
+from pip.util import get_installed_distributions, installed_distributions
 from pip.cmdoptions import make_option_group, index_group
 
 
@@ -52,7 +51,9 @@ class ListCommand(Command):
         return PackageFinder(find_links=options.find_links,
                              index_urls=index_urls,
                              use_mirrors=options.use_mirrors,
-                             mirrors=options.mirrors)
+                             mirrors=options.mirrors,
+                             index_cache=options.index_cache,
+                             index_cache_ttl=options.cache_ttl)
 
     def run(self, options, args):
         if options.outdated:
@@ -87,25 +88,24 @@ class ListCommand(Command):
         finder.add_dependency_links(dependency_links)
 
         installed_packages = get_installed_distributions(local_only=options.local, include_editables=False)
+        reqs = []
+        dists = {}
         for dist in installed_packages:
             req = InstallRequirement.from_line(dist.key, None)
-            try:
-                link = finder.find_requirement(req, True)
-
-                # If link is None, means installed version is most up-to-date
-                if link is None:
-                    continue
-            except DistributionNotFound:
+            reqs.append(req)
+            dists[req] = dist
+        # the index pages are fetched concurrently, and each package is
+        # reported as soon as its pages are there
+        for req, link, error in finder.iter_find_requirements(reqs, True):
+            # If link is None, means installed version is most up-to-date
+            if link is None:
                 continue
-            except BestVersionAlreadyInstalled:
-                remote_version = req.installed_version
-            else:
-                # It might be a good idea that link or finder had a public method
-                # that returned version
-                remote_version = finder._link_package_versions(link, req.name)[0]
-                remote_version_raw = remote_version[2]
-                remote_version_parsed = remote_version[0]
-            yield dist, remote_version_raw, remote_version_parsed
+            # It might be a good idea that link or finder had a public method
+            # that returned version
+            remote_version = finder._link_package_versions(link, req.name)[0]
+            remote_version_raw = remote_version[2]
+            remote_version_parsed = remote_version[0]
+            yield dists[req], remote_version_raw, remote_version_parsed
 
     def run_listing(self, options):
         installed_packages = get_installed_distributions(local_only=options.local)
@@ -116,9 +116,10 @@ class ListCommand(Command):
         self.output_package_listing(installed_packages)
 
     def output_package_listing(self, installed_packages):
+        installed = installed_distributions()
         installed_packages = sorted(installed_packages, key=lambda dist: dist.project_name.lower())
         for dist in installed_packages:
-            if dist_is_editable(dist):
+            if installed.is_editable(dist):
                 line = '%s (%s, %s)' % (dist.project_name, dist.version, dist.location)
             else:
                 line = '%s (%s)' % (dist.project_name, dist.version)
@@ -1,9 +1,8 @@
 import sys
 import textwrap
-import pkg_resources
 import pip.download
 from pip.basecommand import Command, SUCCESS
-from pip.util import get_terminal_size
+from pip.util import get_terminal_size, installed_distributions
 from pip.log import logger
 from pip.backwardcompat import xmlrpclib, reduce, cmp
 from pip.exceptions import CommandError
@@ -84,7 +83,7 @@ def transform_hits(hits):
 
 
 def print_results(hits, name_column_width=25, terminal_width=None):
-    installed_packages = [p.project_name for p in pkg_resources.working_set]
+    installed = installed_distributions()
     for hit in hits:
         name = hit['name']
         summary = hit['summary'] or ''
@@ -95,8 +94,8 @@ def print_results(hits, name_column_width=25, terminal_width=None):
         line = '%s - %s' % (name.ljust(name_column_width), summary)
         try:
             logger.notify(line)
-            if name in installed_packages:
-                dist = pkg_resources.get_distribution(name)
+            dist = installed.get(name)
+            if dist is not None:
                 logger.indent += 2
                 try:
                     latest = highest_version(hit['versions'])
@@ -1,7 +1,7 @@
 import os
-import pkg_resources
 from pip.basecommand import Command
 from pip.log import logger
+from pip.util import installed_distributions
 
 
 class ShowCommand(Command):
@@ -39,12 +39,10 @@ def search_packages_info(query):
     pip generated 'installed-files.txt' in the distributions '.egg-info'
     directory.
     """
-    installed_packages = dict(
-        [(p.project_name.lower(), p) for p in pkg_resources.working_set])
+    installed = installed_distributions()
     for name in query:
-        normalized_name = name.lower()
-        if normalized_name in installed_packages:
-            dist = installed_packages[normalized_name]
+        dist = installed.get(name)
+        if dist is not None:
             package = {
                 'name': dist.project_name,
                 'version': dist.version,
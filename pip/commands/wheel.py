@@ -56,8 +56,19 @@ class WheelCommand(Command):
             metavar='options',
             action='append',
             help="Extra arguments to be supplied to 'setup.py bdist_wheel'.")
+        cmd_opts.add_option(
+            '-j', '--jobs',
+            dest='jobs',
+            metavar='n',
+            type='int',
+            default=1,
+            help="Run up to <n> 'setup.py bdist_wheel' processes at a time "
+            "(default %default). Their output is shown once they finish.")
         cmd_opts.add_option(cmdoptions.requirements)
         cmd_opts.add_option(cmdoptions.download_cache)
+        cmd_opts.add_option(cmdoptions.download_cache_size)
+        cmd_opts.add_option(cmdoptions.download_workers)
+        cmd_opts.add_option(cmdoptions.download_host_workers)
         cmd_opts.add_option(cmdoptions.no_deps)
         cmd_opts.add_option(cmdoptions.build_dir)
 
@@ -86,6 +97,9 @@ class WheelCommand(Command):
         if not wheel_distribute_support():
             raise CommandError("'pip wheel' requires %s." % distribute_requirement)
 
+        if options.jobs < 1:
+            raise CommandError('--jobs must be at least 1.')
+
         index_urls = [options.index_url] + options.extra_index_urls
         if options.no_index:
             logger.notify('Ignoring indexes: %s' % ','.join(index_urls))
@@ -95,7 +109,9 @@ class WheelCommand(Command):
                                index_urls=index_urls,
                                use_mirrors=options.use_mirrors,
                                mirrors=options.mirrors,
-                               use_wheel=options.use_wheel)
+                               use_wheel=options.use_wheel,
+                               index_cache=options.index_cache,
+                               index_cache_ttl=options.cache_ttl)
 
         options.build_dir = os.path.abspath(options.build_dir)
         requirement_set = RequirementSet(
@@ -103,6 +119,9 @@ class WheelCommand(Command):
             src_dir=None,
             download_dir=None,
             download_cache=options.download_cache,
+            download_cache_size=options.download_cache_size,
+            download_workers=options.download_workers,
+            download_host_workers=options.download_host_workers,
             ignore_dependencies=options.ignore_dependencies,
             ignore_installed=True,
             skip_reqs=wheel_skip_reqs)
@@ -137,7 +156,8 @@ class WheelCommand(Command):
                 finder,
                 options.wheel_dir,
                 build_options = options.build_options or [],
-                global_options = options.global_options or []
+                global_options = options.global_options or [],
+                jobs = options.jobs
                 )
             wb.build()
         finally:
@@ -10,16 +10,27 @@ import socket
 import ssl
 import sys
 import tempfile
+import time
+
+try:
+    import json
+except ImportError:
+    json = None
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
 
 import pip
 
 from pip.backwardcompat import (urllib, urllib2, httplib,
                                 urlparse, string_types, get_http_message_param,
-                                match_hostname, CertificateError)
-from pip.exceptions import InstallationError, HashMismatch
+                                match_hostname, CertificateError, b)
+from pip.exceptions import InstallationError, HashMismatch, IncompleteDownload
 from pip.util import (splitext, rmtree, format_size, display_path,
-                      backup_dir, ask_path_exists, unpack_file,
-                      create_download_cache_folder, cache_download)
+                      backup_dir, ask_path_exists, unpack_file, archive_format,
+                      create_download_cache_folder, write_atomic, replace_file)
 from pip.vcs import vcs
 from pip.log import logger
 from pip.locations import default_cert_path
@@ -27,7 +38,8 @@ from pip.locations import default_cert_path
 __all__ = ['get_file_content', 'urlopen',
            'is_url', 'url_to_path', 'path_to_url', 'path_to_url2',
            'geturl', 'is_archive_file', 'unpack_vcs_link',
-           'unpack_file_url', 'is_vcs_url', 'is_file_url', 'unpack_http_url']
+           'unpack_file_url', 'is_vcs_url', 'is_file_url', 'unpack_http_url',
+           'DownloadCache', 'prefetch_http_urls', 'HTTPRangeReader']
 
 
 def build_user_agent():
@@ -101,6 +113,36 @@ def get_file_content(url, comes_from=None):
 _scheme_re = re.compile(r'^(http|https|file):', re.I)
 _url_slash_drive_re = re.compile(r'/*([a-z])\|', re.I)
 
+_ssl_contexts = {}
+_ssl_sessions = {}
+_ssl_lock = threading.Lock()
+
+
+def _get_ssl_context(cert_path, key_file=None, cert_file=None):
+    """
+    Return a verifying SSLContext for the given CA bundle and client
+    certificate, building it only once per process since loading the CA
+    bundle is relatively expensive.  Returns None on Pythons without
+    ssl.SSLContext.
+    """
+    if not hasattr(ssl, 'SSLContext'):
+        return None
+    key = (cert_path, key_file, cert_file)
+    _ssl_lock.acquire()
+    try:
+        context = _ssl_contexts.get(key)
+        if context is None:
+            context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+            context.verify_mode = ssl.CERT_REQUIRED
+            context.load_verify_locations(cert_path)
+            if cert_file:
+                context.load_cert_chain(cert_file, key_file)
+            _ssl_contexts[key] = context
+        return context
+    finally:
+        _ssl_lock.release()
+
+
 class VerifiedHTTPSConnection(httplib.HTTPSConnection):
     """
     A connection that wraps connections with ssl certificate verification.
@@ -129,11 +171,25 @@ class VerifiedHTTPSConnection(httplib.HTTPSConnection):
         # get alternate bundle or use our included bundle
         cert_path = os.environ.get('PIP_CERT', '') or default_cert_path
 
-        self.sock = ssl.wrap_socket(sock,
-                                self.key_file,
-                                self.cert_file,
-                                cert_reqs=ssl.CERT_REQUIRED,
-                                ca_certs=cert_path)
+        context = _get_ssl_context(cert_path, self.key_file, self.cert_file)
+        if context is None:
+            self.sock = ssl.wrap_socket(sock,
+                                    self.key_file,
+                                    self.cert_file,
+                                    cert_reqs=ssl.CERT_REQUIRED,
+                                    ca_certs=cert_path)
+        else:
+            wrap_kwargs = {}
+            if getattr(ssl, 'HAS_SNI', False):
+                wrap_kwargs['server_hostname'] = self.host
+            # resume an earlier TLS session with this host (py3.6+)
+            session_key = (self.host, self.port)
+            session = _ssl_sessions.get(session_key)
+            if session is not None:
+                wrap_kwargs['session'] = session
+            self.sock = context.wrap_socket(sock, **wrap_kwargs)
+            if getattr(self.sock, 'session', None) is not None:
+                _ssl_sessions[session_key] = self.sock.session
 
         try:
             match_hostname(self.sock.getpeercert(), self.host)
@@ -143,15 +199,175 @@ class VerifiedHTTPSConnection(httplib.HTTPSConnection):
             raise
 
 
+class ConnectionPool(object):
+    """
+    Keeps HTTP(S) connections open between requests so that fetching
+    several index pages or archives from the same host doesn't pay for a
+    new TCP (and TLS) handshake each time.
+
+    A connection is handed out again once the body of its last response
+    has been read completely; connections whose response was abandoned
+    half-way, or which the server asked to close, are dropped.
+    """
+    max_per_host = 10
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections = {}
+
+    def get(self, key, factory):
+        """
+        Return a ``(connection, reused)`` tuple for the given key, creating
+        a new connection with ``factory`` if no idle one is available.
+        """
+        self._lock.acquire()
+        try:
+            connections = self._connections.setdefault(key, [])
+            for conn in connections:
+                response = conn._pip_response
+                if response is not None and self._is_reusable(response):
+                    # nothing is left to read (e.g. a 304), make sure
+                    # the connection doesn't consider it pending
+                    response.close()
+                    conn._pip_response = None
+                    return conn, True
+            # drop connections that can't be reused any more
+            for conn in list(connections):
+                response = conn._pip_response
+                if response is not None and response.isclosed():
+                    connections.remove(conn)
+                    conn.close()
+            conn = factory()
+            conn._pip_response = None
+            if len(connections) < self.max_per_host:
+                connections.append(conn)
+            return conn, False
+        finally:
+            self._lock.release()
+
+    def release(self, key, conn, response):
+        """
+        Record the response the connection is serving; the connection
+        becomes idle as soon as that response has been read.
+        """
+        conn._pip_response = response
+
+    def discard(self, key, conn):
+        self._lock.acquire()
+        try:
+            connections = self._connections.get(key, [])
+            if conn in connections:
+                connections.remove(conn)
+        finally:
+            self._lock.release()
+        conn.close()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            for connections in self._connections.values():
+                for conn in connections:
+                    conn.close()
+            self._connections = {}
+        finally:
+            self._lock.release()
+
+    def _is_reusable(self, response):
+        # only responses with a known length that has been fully consumed
+        # leave the connection in a clean state for the next request
+        return (not response.will_close
+                and not response.chunked
+                and response.length == 0)
+
+
+def _pooled_open(pool, http_class, req):
+    """
+    Like urllib2.AbstractHTTPHandler.do_open, but takes the connection
+    from ``pool`` and keeps it alive after the response has been read.
+    """
+    if sys.version_info >= (3,):
+        host, selector = req.host, req.selector
+    else:
+        host, selector = req.get_host(), req.get_selector()
+    if not host:
+        raise urllib2.URLError('no host given')
+    tunnel_host = getattr(req, '_tunnel_host', None)
+    key = (http_class, host, tunnel_host)
+
+    headers = dict(req.unredirected_hdrs)
+    headers.update(dict((k, v) for k, v in req.headers.items()
+                        if k not in headers))
+    headers['Connection'] = 'keep-alive'
+    headers = dict((name.title(), val) for name, val in headers.items())
+
+    tunnel_headers = {}
+    if tunnel_host:
+        proxy_auth_hdr = 'Proxy-Authorization'
+        if proxy_auth_hdr in headers:
+            tunnel_headers[proxy_auth_hdr] = headers[proxy_auth_hdr]
+            # Proxy-Authorization should not be sent to origin server.
+            del headers[proxy_auth_hdr]
+
+    def connect():
+        conn = http_class(host, timeout=req.timeout)
+        if tunnel_host:
+            conn.set_tunnel(tunnel_host, headers=tunnel_headers)
+        return conn
+
+    while True:
+        conn, reused = pool.get(key, connect)
+        try:
+            conn.request(req.get_method(), selector, req.data, headers)
+            response = conn.getresponse()
+        except (socket.error, httplib.HTTPException):
+            e = sys.exc_info()[1]
+            pool.discard(key, conn)
+            if reused:
+                # the server has probably closed the idle connection,
+                # try again on a fresh one
+                continue
+            if isinstance(e, socket.error):
+                raise urllib2.URLError(e)
+            raise
+        break
+    pool.release(key, conn, response)
+
+    if sys.version_info >= (3,):
+        response.url = req.get_full_url()
+        response.msg = response.reason
+        return response
+    response.recv = response.read
+    fp = socket._fileobject(response, close=True)
+    resp = urllib.addinfourl(fp, response.msg, req.get_full_url())
+    resp.code = response.status
+    resp.msg = response.reason
+    return resp
+
+
+class PooledHTTPHandler(urllib2.HTTPHandler):
+    """
+    A HTTPHandler that reuses connections from a ConnectionPool.
+    """
+    def __init__(self, pool):
+        self.pool = pool
+        urllib2.HTTPHandler.__init__(self)
+
+    def http_open(self, req):
+        return _pooled_open(self.pool, httplib.HTTPConnection, req)
+
 
 class VerifiedHTTPSHandler(urllib2.HTTPSHandler):
     """
-    A HTTPSHandler that uses our own VerifiedHTTPSConnection.
+    A HTTPSHandler that uses our own VerifiedHTTPSConnection, reusing
+    connections from the given ConnectionPool if there is one.
     """
-    def __init__(self, connection_class = VerifiedHTTPSConnection):
+    def __init__(self, connection_class = VerifiedHTTPSConnection, pool=None):
         self.specialized_conn_class = connection_class
+        self.pool = pool
         urllib2.HTTPSHandler.__init__(self)
     def https_open(self, req):
+        if self.pool is not None:
+            return _pooled_open(self.pool, self.specialized_conn_class, req)
         return self.do_open(self.specialized_conn_class, req)
 
 
@@ -162,6 +378,7 @@ class URLOpener(object):
     def __init__(self):
         self.passman = urllib2.HTTPPasswordMgrWithDefaultRealm()
         self.proxy_handler = None
+        self.pool = ConnectionPool()
 
     def __call__(self, url):
         """
@@ -197,8 +414,8 @@ class URLOpener(object):
         does the dirty work of actually getting the rsponse object using urllib2
         and its HTTP auth builtins.
         """
-        scheme, netloc, path, query, frag = urlparse.urlsplit(url)
         req = self.get_request(url)
+        scheme, netloc, path, query, frag = urlparse.urlsplit(req.get_full_url())
 
         stored_username, stored_password = self.passman.find_user_password(None, netloc)
         # see if we have a password stored
@@ -224,13 +441,14 @@ class URLOpener(object):
             args.extend([self.proxy_handler, urllib2.CacheFTPHandler])
 
         if kwargs.get('scheme') == 'https':
-            https_handler = VerifiedHTTPSHandler()
+            https_handler = VerifiedHTTPSHandler(pool=self.pool)
             director = urllib2.build_opener(https_handler, *args)
             #strip out HTTPHandler to prevent MITM spoof
             for handler in director.handlers:
                 if isinstance(handler, urllib2.HTTPHandler):
                     director.handlers.remove(handler)
         else:
+            args.append(PooledHTTPHandler(self.pool))
             director = urllib2.build_opener(*args)
 
         # Add our new headers to the opener
@@ -410,7 +628,7 @@ def unpack_vcs_link(link, location, only_download=False):
         vcs_backend.unpack(location)
 
 
-def unpack_file_url(link, location):
+def unpack_file_url(link, location, unpack=None):
     source = url_to_path(link.url)
     content_type = mimetypes.guess_type(source)[0]
     if os.path.isdir(source):
@@ -419,7 +637,7 @@ def unpack_file_url(link, location):
             rmtree(location)
         shutil.copytree(source, location)
     else:
-        unpack_file(source, location, content_type, link)
+        (unpack or unpack_file)(source, location, content_type, link)
 
 
 def _get_used_vcs_backend(link):
@@ -437,14 +655,25 @@ def is_file_url(link):
     return link.url.lower().startswith('file:')
 
 
-def _check_hash(download_hash, link):
+def _error_level(quiet):
+    """The level download errors are logged at; quiet is for downloads
+    that are only attempted in advance, whose errors are reported again
+    if they matter."""
+    if quiet:
+        return logger.INFO
+    return logger.FATAL
+
+
+def _check_hash(download_hash, link, quiet=False):
     if download_hash.digest_size != hashlib.new(link.hash_name).digest_size:
-        logger.fatal("Hash digest size of the package %d (%s) doesn't match the expected hash name %s!"
-                    % (download_hash.digest_size, link, link.hash_name))
+        logger.log(_error_level(quiet),
+                   "Hash digest size of the package %d (%s) doesn't match the expected hash name %s!"
+                   % (download_hash.digest_size, link, link.hash_name))
         raise HashMismatch('Hash name mismatch for package %s' % link)
     if download_hash.hexdigest() != link.hash:
-        logger.fatal("Hash of the package %s (%s) doesn't match the expected hash %s!"
-                     % (link, download_hash, link.hash))
+        logger.log(_error_level(quiet),
+                   "Hash of the package %s (%s) doesn't match the expected hash %s!"
+                   % (link, download_hash, link.hash))
         raise HashMismatch('Bad %s hash for package %s' % (link.hash_name, link))
 
 
@@ -465,20 +694,45 @@ def _get_hash_from_file(target_file, link):
     return download_hash
 
 
-def _download_url(resp, link, temp_location):
-    fp = open(temp_location, 'wb')
+def _download_url(resp, link, temp_location, cache_hash=None, progress=None,
+                  resume_from=0):
+    """
+    Download the response to temp_location, returning the hash of the
+    link's hash type.  ``cache_hash``, if given, is updated with the
+    contents as well.  If a DownloadProgress is given, progress is
+    reported to it instead of being shown for this download alone.
+
+    If ``resume_from`` is given, the response holds the rest of the file
+    after the first ``resume_from`` bytes already in temp_location.
+    """
     download_hash = None
     if link.hash and link.hash_name:
         try:
             download_hash = hashlib.new(link.hash_name)
         except ValueError:
             logger.warn("Unsupported hash name %s for package %s" % (link.hash_name, link))
+    if resume_from:
+        fp = open(temp_location, 'r+b')
+        # carry the hashes over what we already have
+        remaining = resume_from
+        while remaining:
+            chunk = fp.read(min(remaining, 4096))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            for h in (download_hash, cache_hash):
+                if h is not None:
+                    h.update(chunk)
+        fp.seek(resume_from)
+        fp.truncate()
+    else:
+        fp = open(temp_location, 'wb')
     try:
-        total_length = int(resp.info()['content-length'])
+        total_length = int(resp.info()['content-length']) + resume_from
     except (ValueError, KeyError, TypeError):
         total_length = 0
-    downloaded = 0
-    show_progress = total_length > 40 * 1000 or not total_length
+    downloaded = resume_from
+    show_progress = (total_length > 40 * 1000 or not total_length) and progress is None
     show_url = link.show_url
     try:
         if show_progress:
@@ -487,7 +741,7 @@ def _download_url(resp, link, temp_location):
                 logger.start_progress('Downloading %s (%s): ' % (show_url, format_size(total_length)))
             else:
                 logger.start_progress('Downloading %s (unknown size): ' % show_url)
-        else:
+        elif progress is None:
             logger.notify('Downloading %s' % show_url)
         logger.info('Downloading from URL %s' % link)
 
@@ -496,15 +750,23 @@ def _download_url(resp, link, temp_location):
             if not chunk:
                 break
             downloaded += len(chunk)
-            if show_progress:
+            if progress is not None:
+                progress.add(len(chunk))
+            elif show_progress:
                 if not total_length:
                     logger.show_progress('%s' % format_size(downloaded))
                 else:
                     logger.show_progress('%3i%%  %s' % (100 * downloaded / total_length, format_size(downloaded)))
             if download_hash is not None:
                 download_hash.update(chunk)
+            if cache_hash is not None:
+                cache_hash.update(chunk)
             fp.write(chunk)
         fp.close()
+        if total_length and downloaded < total_length:
+            raise IncompleteDownload(
+                'Connection closed after %s of %s of %s'
+                % (format_size(downloaded), format_size(total_length), link))
     finally:
         if show_progress:
             logger.end_progress('%s downloaded' % format_size(downloaded))
@@ -534,25 +796,43 @@ def _copy_file(filename, location, content_type, link):
         logger.notify('Saved %s' % display_path(download_location))
 
 
-def unpack_http_url(link, location, download_cache, download_dir=None):
+def _check_cached_hash(cache, url, cached, link):
+    """
+    Check the hash of a cached archive against the link, using the digest
+    recorded when it was stored if there is one.
+    """
+    hexdigest = cached['hashes'].get(link.hash_name)
+    if hexdigest is None:
+        download_hash = _get_hash_from_file(cached['path'], link)
+        if download_hash is None:
+            return
+        _check_hash(download_hash, link)
+        cache.add_hash(url, link.hash_name, download_hash.hexdigest())
+    elif hexdigest != link.hash:
+        logger.fatal("Hash of the package %s (%s) doesn't match the expected hash %s!"
+                     % (link, hexdigest, link.hash))
+        raise HashMismatch('Bad %s hash for package %s' % (link.hash_name, link))
+
+
+def unpack_http_url(link, location, download_cache, download_dir=None,
+                    unpack=None):
     temp_dir = tempfile.mkdtemp('-unpack', 'pip-')
     temp_location = None
     target_url = link.url.split('#', 1)[0]
 
-    already_cached = False
-    cache_file = None
-    cache_content_type_file = None
+    cache = None
+    cached = None
     download_hash = None
+    hashes = None
+    format = None
     if download_cache:
-        cache_file = os.path.join(download_cache,
-                                   urllib.quote(target_url, ''))
-        cache_content_type_file = cache_file + '.content-type'
-        already_cached = (
-            os.path.exists(cache_file) and
-            os.path.exists(cache_content_type_file)
-            )
-        if not os.path.isdir(download_cache):
-            create_download_cache_folder(download_cache)
+        if isinstance(download_cache, DownloadCache):
+            cache = download_cache
+        else:
+            cache = DownloadCache(download_cache)
+        if not os.path.isdir(cache.cache_dir):
+            create_download_cache_folder(cache.cache_dir)
+        cached = cache.get(target_url)
 
     already_downloaded = None
     if download_dir:
@@ -578,72 +858,723 @@ def unpack_http_url(link, location, download_cache, download_dir=None):
                 already_downloaded = None
 
     # We have a cached file, and we haven't already found a good downloaded copy
-    if already_cached and not temp_location:
-        with open(cache_content_type_file) as fp:
-            content_type = fp.read().strip()
-        temp_location = cache_file
-        logger.notify('Using download cache from %s' % cache_file)
+    if cached and not temp_location:
+        content_type = cached['content_type']
+        format = cached.get('format')
+        temp_location = cached['path']
+        logger.notify('Using download cache from %s' % temp_location)
         if link.hash and link.hash_name:
-            download_hash = _get_hash_from_file(cache_file, link)
             try:
-                _check_hash(download_hash, link)
+                _check_cached_hash(cache, target_url, cached, link)
             except HashMismatch:
                 logger.warn(
                     'Cached file %s has bad hash, '
                     're-downloading.' % temp_location
                     )
                 temp_location = None
-                os.unlink(cache_file)
-                os.unlink(cache_content_type_file)
-                already_cached = False
+                cache.remove(target_url)
+                cached = None
 
     # We don't have either a cached or a downloaded copy
     if not temp_location:
-        resp = _get_response_from_url(target_url, link)
-        content_type = resp.info().get('content-type', '')
-        filename = link.filename  # fallback
-        # Have a look at the Content-Disposition header for a better guess
-        content_disposition = resp.info().get('content-disposition')
-        if content_disposition:
-            type, params = cgi.parse_header(content_disposition)
-            # We use ``or`` here because we don't want to use an "empty" value
-            # from the filename param.
-            filename = params.get('filename') or filename
-        ext = splitext(filename)[1]
-        if not ext:
-            ext = mimetypes.guess_extension(content_type)
-            if ext:
-                filename += ext
-        if not ext and link.url != geturl(resp):
-            ext = os.path.splitext(geturl(resp))[1]
-            if ext:
-                filename += ext
-        temp_location = os.path.join(temp_dir, filename)
-        download_hash = _download_url(resp, link, temp_location)
-        if link.hash and link.hash_name:
-            _check_hash(download_hash, link)
+        temp_location, content_type, hashes = _download_http_url(
+            link, target_url, temp_dir, cache)
 
     if download_dir and not already_downloaded:
         _copy_file(temp_location, download_dir, content_type, link)
-    unpack_file(temp_location, location, content_type, link)
-    if cache_file and not already_cached:
-        cache_download(cache_file, temp_location, content_type)
-    if not (already_cached or already_downloaded):
+    if format is None:
+        format = archive_format(temp_location)
+    (unpack or unpack_file)(temp_location, location, content_type, link, format)
+    if cache and not cached:
+        path = cache.store(target_url, temp_location, content_type, hashes,
+                           format)
+        if path:
+            logger.notify('Stored download in cache at %s' % display_path(path))
+    if not (cached or already_downloaded):
         os.unlink(temp_location)
     os.rmdir(temp_dir)
 
 
-def _get_response_from_url(target_url, link):
+def _download_http_url(link, target_url, temp_dir, cache=None, progress=None,
+                       quiet=False):
+    """
+    Download target_url into temp_dir and check it against the link's
+    hash.  Returns (filename, content_type, hashes), where hashes maps
+    hash names to the hex digests computed on the way if a download
+    cache is going to store the file, else None.  Errors are only logged
+    at info level if quiet.
+    """
+    resp = None
+    partial_path = None
+    resume_from = 0
+    if cache:
+        resp, partial_path, resume_from = _resume_download(link, target_url, cache)
+    if resp is None:
+        resp = _get_response_from_url(target_url, link, quiet)
+    content_type = resp.info().get('content-type', '')
+    filename = link.filename  # fallback
+    # Have a look at the Content-Disposition header for a better guess
+    content_disposition = resp.info().get('content-disposition')
+    if content_disposition:
+        type, params = cgi.parse_header(content_disposition)
+        # We use ``or`` here because we don't want to use an "empty" value
+        # from the filename param.
+        filename = params.get('filename') or filename
+    ext = splitext(filename)[1]
+    if not ext:
+        ext = mimetypes.guess_extension(content_type)
+        if ext:
+            filename += ext
+    if not ext and link.url != geturl(resp):
+        ext = os.path.splitext(geturl(resp))[1]
+        if ext:
+            filename += ext
+    temp_location = os.path.join(temp_dir, filename)
+    cache_hash = None
+    if cache:
+        cache_hash = hashlib.new(DownloadCache.hash_name)
+        if partial_path is None:
+            partial_path = cache.start_partial(target_url, resp.info())
+    if partial_path is None:
+        download_hash = _download_url(resp, link, temp_location, cache_hash, progress)
+    else:
+        # download into the cache, so that what we got so far can be
+        # resumed if the transfer is interrupted
+        finished = False
+        try:
+            download_hash = _download_url(resp, link, partial_path, cache_hash,
+                                          progress, resume_from)
+            finished = True
+        finally:
+            if not finished:
+                cache.release_partial(target_url, partial_path)
+        shutil.move(partial_path, temp_location)
+        cache.remove_partial(target_url)
+    if link.hash and link.hash_name:
+        _check_hash(download_hash, link, quiet)
+    hashes = None
+    if cache_hash is not None:
+        hashes = {DownloadCache.hash_name: cache_hash.hexdigest()}
+        if download_hash is not None:
+            hashes[link.hash_name] = download_hash.hexdigest()
+    return temp_location, content_type, hashes
+
+
+class HTTPRangeReader(object):
+    """
+    A read-only, seekable file over HTTP Range requests, for reading the
+    few parts of a remote zip file that zipfile needs.  What has been
+    read is kept, and reads ahead at least ``block_size`` bytes.
+
+    Use HTTPRangeReader.open(url), which returns None if the server
+    doesn't support ranges.
+    """
+
+    block_size = 64 * 1024
+
+    def __init__(self, url, size, etag=None):
+        self.url = url
+        self.size = size
+        self.etag = etag
+        self.requests = 0
+        self._spans = []
+        self._pos = 0
+
+    @classmethod
+    def open(cls, url, tail_size=64 * 1024):
+        """
+        Fetch the last ``tail_size`` bytes of url, where the zip central
+        directory is, and return a reader for it or None.
+        """
+        resp = urlopen(urllib2.Request(url, headers={
+            'Accept-encoding': 'identity',
+            'Range': 'bytes=-%s' % tail_size,
+            }))
+        try:
+            content_range = resp.info().get('content-range', '')
+            match = re.match(r'bytes (\d+)-(\d+)/(\d+)$', content_range)
+            if getattr(resp, 'code', None) != 206 or not match:
+                return None
+            etag = resp.info().get('etag')
+            if etag and etag.startswith('W/'):
+                etag = None
+            start, size = int(match.group(1)), int(match.group(3))
+            reader = cls(url, size, etag)
+            reader._spans.append((start, resp.read()))
+            reader.requests = 1
+        finally:
+            resp.close()
+        return reader
+
+    def _fetch(self, pos, end):
+        fetch_end = min(self.size, max(end, pos + self.block_size))
+        for start, data in self._spans:
+            if pos < start < fetch_end:
+                fetch_end = start
+        headers = {
+            'Accept-encoding': 'identity',
+            'Range': 'bytes=%s-%s' % (pos, fetch_end - 1),
+            }
+        if self.etag:
+            headers['If-Range'] = self.etag
+        resp = urlopen(urllib2.Request(self.url, headers=headers))
+        try:
+            content_range = resp.info().get('content-range', '')
+            if (getattr(resp, 'code', None) != 206
+                or not content_range.startswith('bytes %s-' % pos)):
+                # the file has changed
+                raise IOError('Range request for %s failed' % self.url)
+            data = resp.read()
+        finally:
+            resp.close()
+        if len(data) != fetch_end - pos:
+            raise IOError('Range request for %s returned %s bytes instead of %s'
+                          % (self.url, len(data), fetch_end - pos))
+        self.requests += 1
+        self._spans.append((pos, data))
+        return data[:end - pos]
+
+    def read(self, n=-1):
+        end = self.size
+        if n is not None and n >= 0:
+            end = min(self._pos + n, self.size)
+        chunks = []
+        while self._pos < end:
+            for start, data in self._spans:
+                if start <= self._pos < start + len(data):
+                    chunk = data[self._pos - start:end - start]
+                    break
+            else:
+                chunk = self._fetch(self._pos, end)
+            chunks.append(chunk)
+            self._pos += len(chunk)
+        return b('').join(chunks)
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self.size
+        self._pos = max(0, offset)
+
+    def tell(self):
+        return self._pos
+
+    def seekable(self):
+        return True
+
+    def close(self):
+        self._spans = []
+
+
+def _resume_download(link, target_url, cache):
+    """
+    Try to resume an interrupted download of target_url from the partial
+    file kept in the download cache.  Returns (response, partial_path,
+    offset); the response is None if there is nothing to resume, and
+    partial_path is None if the response is the whole file after all.
+    """
+    partial = cache.get_partial(target_url)
+    if partial is None:
+        return None, None, 0
+    partial_path = cache.claim_partial(target_url)
+    if partial_path is None:
+        # someone else is resuming it
+        return None, None, 0
+    size = os.path.getsize(partial_path)
+    if not size:
+        cache.remove_partial(target_url, partial_path)
+        return None, None, 0
+    request = urllib2.Request(target_url, headers={
+        'Accept-encoding': 'identity',
+        'Range': 'bytes=%s-' % size,
+        'If-Range': partial['etag'] or partial['last_modified'],
+        })
+    try:
+        resp = urlopen(request)
+    except urllib2.HTTPError:
+        e = sys.exc_info()[1]
+        if e.code != 416:
+            cache.release_partial(target_url, partial_path)
+            raise
+        # Range Not Satisfiable: don't trust what we have
+        cache.remove_partial(target_url, partial_path)
+        return None, None, 0
+    except:
+        cache.release_partial(target_url, partial_path)
+        raise
+    content_range = resp.info().get('content-range', '')
+    if (getattr(resp, 'code', None) == 206
+        and content_range.startswith('bytes %s-' % size)):
+        logger.notify('Resuming download of %s at %s'
+                      % (link.show_url, format_size(size)))
+        return resp, partial_path, size
+    # the file has changed, or the server doesn't support ranges and sent
+    # all of it
+    cache.remove_partial(target_url, partial_path)
+    return resp, None, 0
+
+
+def prefetch_http_urls(links, cache, workers=4, per_host=2):
+    """
+    Download the archives of the given http(s) links into the
+    DownloadCache ``cache`` with up to ``workers`` threads, and at most
+    ``per_host`` of them talking to the same host.
+
+    Failures are only logged; they will show up again when the link is
+    unpacked.
+    """
+    pending = []
+    for link in links:
+        target_url = link.url.split('#', 1)[0]
+        cached = cache.get(target_url)
+        if cached is not None:
+            if not (link.hash and link.hash_name):
+                continue
+            try:
+                _check_cached_hash(cache, target_url, cached, link)
+                continue
+            except HashMismatch:
+                cache.remove(target_url)
+        pending.append(link)
+    if not pending:
+        return
+    if not os.path.isdir(cache.cache_dir):
+        create_download_cache_folder(cache.cache_dir)
+
+    condition = threading.Condition()
+    active = {}
+
+    def next_link():
+        # the first pending link whose host isn't busy, None when done
+        condition.acquire()
+        try:
+            while pending:
+                for i, link in enumerate(pending):
+                    host = urlparse.urlsplit(link.url)[1]
+                    if active.get(host, 0) < per_host:
+                        del pending[i]
+                        active[host] = active.get(host, 0) + 1
+                        return link, host
+                condition.wait()
+            return None, None
+        finally:
+            condition.release()
+
+    def worker():
+        while True:
+            link, host = next_link()
+            if link is None:
+                return
+            try:
+                _prefetch_http_url(link, cache, progress)
+            finally:
+                condition.acquire()
+                try:
+                    active[host] -= 1
+                    condition.notifyAll()
+                finally:
+                    condition.release()
+
+    progress = DownloadProgress(len(pending))
+    progress.start()
+    threads = []
+    try:
+        for i in range(min(workers, len(pending))):
+            t = threading.Thread(target=worker)
+            t.setDaemon(True)
+            threads.append(t)
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        progress.end()
+
+
+def _prefetch_http_url(link, cache, progress):
+    target_url = link.url.split('#', 1)[0]
+    temp_dir = tempfile.mkdtemp('-download', 'pip-')
+    try:
+        try:
+            temp_location, content_type, hashes = _download_http_url(
+                link, target_url, temp_dir, cache, progress, quiet=True)
+            cache.store(target_url, temp_location, content_type, hashes)
+        except (IOError, OSError, httplib.HTTPException, InstallationError):
+            e = sys.exc_info()[1]
+            logger.info('Could not download %s in advance: %s' % (link, e))
+    finally:
+        progress.file_done()
+        rmtree(temp_dir)
+
+
+class DownloadProgress(object):
+    """
+    Progress of several downloads running at the same time, shown as one
+    progress line.
+    """
+
+    def __init__(self, count):
+        self.count = count
+        self.done = 0
+        self.downloaded = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        logger.start_progress('Downloading %s files: ' % self.count)
+
+    def add(self, size):
+        self._lock.acquire()
+        try:
+            self.downloaded += size
+            self._show()
+        finally:
+            self._lock.release()
+
+    def file_done(self):
+        self._lock.acquire()
+        try:
+            self.done += 1
+            self._show()
+        finally:
+            self._lock.release()
+
+    def _show(self):
+        logger.show_progress('%s/%s  %s' % (self.done, self.count,
+                                             format_size(self.downloaded)))
+
+    def end(self):
+        logger.end_progress('%s downloaded' % format_size(self.downloaded))
+
+
+class DownloadCache(object):
+    """
+    Content-addressable cache of downloaded archives.
+
+    Each archive is stored once under ``objects/``, named after the sha256
+    of its contents (plus its extension), however many URLs it was
+    downloaded from.  ``urls/``
+    holds a small JSON record per URL with the digest, content type, size
+    and the hashes verified for the archive, so that a cache hit doesn't
+    need to hash the file again.  Interrupted downloads are kept under
+    ``partial/`` so they can be resumed.  If ``max_size`` (in bytes) is given, the
+    least recently used archives are evicted to stay below it.
+
+    Files in the old layout (the quoted URL plus a ``.content-type`` file)
+    are moved into the new one when they are first looked up.
+    """
+
+    hash_name = 'sha256'
+
+    def __init__(self, cache_dir, max_size=None):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._disk_usage = None
+        self._lock = threading.Lock()
+
+    def _record_path(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, 'urls', key + '.json')
+
+    def _object_path(self, digest, ext=''):
+        # the extension is kept, unpack_file() looks at it
+        return os.path.join(self.cache_dir, 'objects', digest[:2], digest + ext)
+
+    def _read_record(self, url):
+        if json is None:
+            return None
+        try:
+            fp = open(self._record_path(url))
+            try:
+                record = json.load(fp)
+            finally:
+                fp.close()
+        except (IOError, OSError, ValueError):
+            return None
+        if record.get('url') != url:
+            return None
+        return record
+
+    def _write_record(self, record):
+        if json is None:
+            return
+        path = self._record_path(record['url'])
+        _makedirs(os.path.dirname(path))
+        write_atomic(path, json.dumps(record), 'w')
+
+    def get(self, url):
+        """
+        Return the record for ``url`` as a dict with the keys ``path``,
+        ``digest``, ``content_type``, ``format`` (see archive_format()),
+        ``size`` and ``hashes`` (hash name -> hex digest), or None if it
+        isn't cached.
+        """
+        record = self._read_record(url)
+        if record is None:
+            return self._import_legacy(url)
+        path = self._object_path(record['digest'], record.get('ext', ''))
+        try:
+            # mark as recently used
+            os.utime(path, None)
+        except OSError:
+            # evicted
+            self.remove(url)
+            return None
+        record['path'] = path
+        return record
+
+    def add_hash(self, url, hash_name, hexdigest):
+        """Remember a verified hash of the archive cached for ``url``."""
+        record = self._read_record(url)
+        if record is not None:
+            record['hashes'][hash_name] = hexdigest
+            self._write_record(record)
+
+    def remove(self, url):
+        """Forget the archive cached for ``url``; the file itself stays
+        until it is evicted, it may be shared with other URLs."""
+        try:
+            os.remove(self._record_path(url))
+        except OSError:
+            pass
+
+    def store(self, url, filename, content_type, hashes=None, format=None):
+        """
+        Store the archive ``filename`` downloaded from ``url``.  ``hashes``
+        maps hash names to hex digests already computed for it; the
+        archive is only read again if the sha256 is missing.  ``format`` is
+        what archive_format() returns for it, if already known.  Returns
+        the path of the stored file, or None if it couldn't be stored.
+        """
+        hashes = dict(hashes or {})
+        if self.hash_name not in hashes:
+            hashes[self.hash_name] = _hash_file(filename, self.hash_name)
+        if format is None:
+            format = archive_format(filename)
+        digest = hashes[self.hash_name]
+        ext = splitext(os.path.basename(filename))[1]
+        path = self._object_path(digest, ext)
+        size = os.path.getsize(filename)
+        try:
+            if not os.path.exists(path):
+                _makedirs(os.path.dirname(path))
+                fd, temp_path = tempfile.mkstemp('.tmp', '', os.path.dirname(path))
+                os.close(fd)
+                shutil.copyfile(filename, temp_path)
+                replace_file(temp_path, path)
+                self._account(size)
+            self._write_record({
+                'url': url,
+                'digest': digest,
+                'ext': ext,
+                'content_type': content_type,
+                'format': format,
+                'size': size,
+                'hashes': hashes,
+                'stored': time.time(),
+            })
+        except (IOError, OSError):
+            e = sys.exc_info()[1]
+            logger.warn('Could not store %s in download cache: %s' % (url, e))
+            return None
+        return path
+
+    def _partial_path(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, 'partial', key)
+
+    def _read_partial_info(self, url):
+        if json is None:
+            return None
+        try:
+            fp = open(self._partial_path(url) + '.json')
+            try:
+                info = json.load(fp)
+            finally:
+                fp.close()
+        except (IOError, OSError, ValueError):
+            return None
+        if info.get('url') != url:
+            return None
+        return info
+
+    def get_partial(self, url):
+        """
+        Return a dict with the ``etag`` and ``last_modified`` validators of
+        an interrupted download of ``url`` that can be resumed, or None.
+        """
+        info = self._read_partial_info(url)
+        if info is None or not os.path.exists(self._partial_path(url)):
+            return None
+        return info
+
+    def _claimed_path(self, url):
+        # private to this process and thread
+        return '%s.%s-%s' % (self._partial_path(url), os.getpid(),
+                             threading.currentThread().ident)
+
+    def start_partial(self, url, headers):
+        """
+        Start keeping a download of ``url`` in the cache, if the response
+        headers allow resuming it later.  Returns the path to download
+        to, or None.
+        """
+        if json is None:
+            return None
+        etag = headers.get('ETag')
+        if etag and etag.startswith('W/'):
+            # weak validators can't be used with If-Range
+            etag = None
+        last_modified = headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return None
+        path = self._partial_path(url)
+        try:
+            _makedirs(os.path.dirname(path))
+            write_atomic(path + '.json', json.dumps({
+                'url': url,
+                'etag': etag,
+                'last_modified': last_modified,
+            }), 'w')
+        except (IOError, OSError):
+            return None
+        return self._claimed_path(url)
+
+    def claim_partial(self, url):
+        """
+        Take the partial download of ``url`` for resuming it, so that no
+        one else resumes it at the same time.  Returns the path to
+        continue downloading to, or None.
+        """
+        claimed_path = self._claimed_path(url)
+        try:
+            os.rename(self._partial_path(url), claimed_path)
+        except OSError:
+            return None
+        return claimed_path
+
+    def release_partial(self, url, claimed_path):
+        """Give back an interrupted download, to be resumed later."""
+        try:
+            replace_file(claimed_path, self._partial_path(url))
+        except OSError:
+            pass
+
+    def remove_partial(self, url, claimed_path=None):
+        """Forget about the partial download of ``url``."""
+        for path in (claimed_path, self._partial_path(url) + '.json'):
+            if path is None:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _import_legacy(self, url):
+        cache_file = os.path.join(self.cache_dir, urllib.quote(url, ''))
+        content_type_file = cache_file + '.content-type'
+        if not (os.path.exists(cache_file) and os.path.exists(content_type_file)):
+            return None
+        fp = open(content_type_file)
+        try:
+            content_type = fp.read().strip()
+        finally:
+            fp.close()
+        self.store(url, cache_file, content_type)
+        if self._read_record(url) is None:
+            return None
+        for path in (cache_file, content_type_file):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return self.get(url)
+
+    def _account(self, size):
+        if not self.max_size:
+            return
+        self._lock.acquire()
+        try:
+            if self._disk_usage is None:
+                self._disk_usage = sum(
+                    [size for path, size, mtime in self._objects()])
+            else:
+                self._disk_usage += size
+            if self._disk_usage > self.max_size:
+                self._evict()
+        finally:
+            self._lock.release()
+
+    def _objects(self):
+        objects = []
+        objects_dir = os.path.join(self.cache_dir, 'objects')
+        for dirpath, dirnames, filenames in os.walk(objects_dir):
+            for name in filenames:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                objects.append((path, st.st_size, st.st_mtime))
+        return objects
+
+    def _evict(self):
+        """Remove the least recently used archives until the cache uses at
+        most three quarters of max_size."""
+        objects = self._objects()
+        objects.sort(key=lambda item: item[2])
+        usage = sum([size for path, size, mtime in objects])
+        target = self.max_size * 3 // 4
+        for path, size, mtime in objects:
+            if usage <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            logger.info('Evicted %s from the download cache' % display_path(path))
+            usage -= size
+        self._disk_usage = usage
+
+
+def _makedirs(path):
+    """os.makedirs, but fine if another thread or process created the
+    directory in the meantime."""
+    try:
+        os.makedirs(path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+
+
+def _hash_file(filename, hash_name):
+    h = hashlib.new(hash_name)
+    fp = open(filename, 'rb')
+    try:
+        while True:
+            chunk = fp.read(4096)
+            if not chunk:
+                break
+            h.update(chunk)
+    finally:
+        fp.close()
+    return h.hexdigest()
+
+
+def _get_response_from_url(target_url, link, quiet=False):
     try:
         resp = urlopen(target_url)
     except urllib2.HTTPError:
         e = sys.exc_info()[1]
-        logger.fatal("HTTP error %s while getting %s" % (e.code, link))
+        logger.log(_error_level(quiet),
+                   "HTTP error %s while getting %s" % (e.code, link))
         raise
     except IOError:
         e = sys.exc_info()[1]
         # Typically an FTP error
-        logger.fatal("Error %s while getting %s" % (e, link))
+        logger.log(_error_level(quiet),
+                   "Error %s while getting %s" % (e, link))
         raise
     return resp
 
@@ -36,3 +36,7 @@ class PreviousBuildDirError(PipError):
 
 class HashMismatch(InstallationError):
     """Distribution file hash values don't match."""
+
+
+class IncompleteDownload(InstallationError):
+    """The connection was closed before the whole file was downloaded."""
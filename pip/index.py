@@ -3,7 +3,8 @@
 import sys
 import os
 import re
-import gzip
+import codecs
+import hashlib
 import mimetypes
 import posixpath
 import pkg_resources
@@ -11,21 +12,28 @@ import random
 import socket
 import ssl
 import string
+import tempfile
+import time
 import zlib
 
+try:
+    import json
+except ImportError:
+    json = None
+
 try:
     import threading
 except ImportError:
     import dummy_threading as threading
 
 from pip.log import logger
-from pip.util import Inf, normalize_name, splitext, is_prerelease
+from pip.util import Inf, normalize_name, splitext, is_prerelease, write_atomic
 from pip.exceptions import DistributionNotFound, BestVersionAlreadyInstalled,\
     InstallationError
-from pip.backwardcompat import (WindowsError, BytesIO,
+from pip.backwardcompat import (WindowsError, b,
                                 Queue, urlparse,
                                 URLError, HTTPError, u,
-                                product, url2pathname,
+                                product, url2pathname, urllib2,
                                 Empty as QueueEmpty)
 from pip.backwardcompat import CertificateError
 from pip.download import urlopen, path_to_url2, url_to_path, geturl, Urllib2HeadRequest
@@ -47,11 +55,11 @@ class PackageFinder(object):
 
     def __init__(self, find_links, index_urls,
             use_mirrors=False, mirrors=None, main_mirror_url=None,
-            use_wheel=False):
+            use_wheel=False, index_cache=None, index_cache_ttl=None):
         self.find_links = find_links
         self.index_urls = index_urls
         self.dependency_links = []
-        self.cache = PageCache()
+        self.cache = PageCache(index_cache, ttl=index_cache_ttl)
         # These are boring links that have already been logged somehow:
         self.logged_links = set()
         if use_mirrors:
@@ -153,36 +161,25 @@ class PackageFinder(object):
         """
         return sorted(applicable_versions, key=self._link_sort_key, reverse=True)
 
-    def find_requirement(self, req, upgrade):
-
-        def mkurl_pypi_url(url):
-            loc = posixpath.join(url, url_name)
-            # For maximum compatibility with easy_install, ensure the path
-            # ends in a trailing slash.  Although this isn't in the spec
-            # (and PyPI can handle it without the slash) some other index
-            # implementations might break if they relied on easy_install's behavior.
-            if not loc.endswith('/'):
-                loc = loc + '/'
-            return loc
-
-        url_name = req.url_name
-        # Only check main index if index URL is given:
-        main_index_url = None
-        if self.index_urls:
-            # Check that we have the url_name correctly spelled:
-            main_index_url = Link(mkurl_pypi_url(self.index_urls[0]))
-            # This will also cache the page, so it's okay that we get it again later:
-            page = self._get_page(main_index_url, req)
-            if page is None:
-                url_name = self._find_url_name(Link(self.index_urls[0]), url_name, req) or req.url_name
-
+    def _mkurl_pypi_url(self, url, url_name):
+        loc = posixpath.join(url, url_name)
+        # For maximum compatibility with easy_install, ensure the path
+        # ends in a trailing slash.  Although this isn't in the spec
+        # (and PyPI can handle it without the slash) some other index
+        # implementations might break if they relied on easy_install's behavior.
+        if not loc.endswith('/'):
+            loc = loc + '/'
+        return loc
+
+    def _find_locations(self, req, url_name, main_index_url):
+        """Return (file_locations, url_locations) to search for req"""
         # Combine index URLs with mirror URLs here to allow
         # adding more index URLs from requirements files
         all_index_urls = self.index_urls + self.mirror_urls
 
         if url_name is not None:
             locations = [
-                mkurl_pypi_url(url)
+                self._mkurl_pypi_url(url, url_name)
                 for url in all_index_urls] + self.find_links
         else:
             locations = list(self.find_links)
@@ -192,7 +189,139 @@ class PackageFinder(object):
                 locations = [
                     posixpath.join(main_index_url.url, version)] + locations
 
-        file_locations, url_locations = self._sort_locations(locations)
+        return self._sort_locations(locations)
+
+    def prefetch_pages(self, reqs):
+        """Fetch the pages that will be searched for all of ``reqs`` into
+        the page cache, using one shared pool of workers."""
+        items = []
+        for req in reqs:
+            items.extend(self._page_items(req))
+        logger.debug('Prefetching %s pages for %s requirements' % (len(items), len(reqs)))
+        self._fetch_pages(items, self.max_batch_page_workers)
+
+    def _page_items(self, req):
+        """The (location, req) items of the pages to fetch for req."""
+        url_name = req.url_name
+        main_index_url = None
+        if self.index_urls:
+            main_index_url = Link(self._mkurl_pypi_url(self.index_urls[0], url_name))
+        file_locations, url_locations = self._find_locations(req, url_name, main_index_url)
+        return [(Link(url), req) for url in url_locations]
+
+    def find_requirements(self, reqs, upgrade):
+        """Find links for several requirements at once.
+
+        The pages of all ``reqs`` are fetched concurrently first, so the
+        lookup of each requirement afterwards only hits the page cache.
+        Returns a list of (req, link, error) tuples in the order of
+        ``reqs``, where ``link`` is what find_requirement() returned and
+        ``error`` is the DistributionNotFound or
+        BestVersionAlreadyInstalled it raised, if any.
+        """
+        self.prefetch_pages(reqs)
+        results = []
+        for req in reqs:
+            try:
+                link = self.find_requirement(req, upgrade)
+            except (DistributionNotFound, BestVersionAlreadyInstalled):
+                results.append((req, None, sys.exc_info()[1]))
+            else:
+                results.append((req, link, None))
+        return results
+
+    def iter_find_requirements(self, reqs, upgrade):
+        """Like find_requirements(), but yield the (req, link, error)
+        tuples as soon as the pages of each requirement have been fetched.
+
+        One shared pool of workers fetches the pages of one requirement
+        at a time, so the results come in the order they complete; the
+        lookups themselves run in the calling thread.
+        """
+        pending_queue = Queue()
+        done_queue = Queue()
+        for req in reqs:
+            pending_queue.put(req)
+        # pages shared by requirements (e.g. --find-links) are fetched
+        # once: URL -> Event set when its fetch is over
+        in_flight = {}
+        lock = threading.Lock()
+        stopped = []
+
+        def fetch_pages(req):
+            pages = list(self._page_items(req))
+            seen = set()
+            while pages and not stopped:
+                location, page_req = pages.pop(0)
+                if location in seen:
+                    continue
+                seen.add(location)
+                lock.acquire()
+                try:
+                    event = in_flight.get(location.url)
+                    fetching = event is None
+                    if fetching:
+                        event = in_flight[location.url] = threading.Event()
+                finally:
+                    lock.release()
+                if fetching:
+                    try:
+                        page = self._get_page(location, page_req)
+                    finally:
+                        event.set()
+                else:
+                    # fetched by another worker, the page cache has it
+                    # once it's done
+                    event.wait()
+                    page = self._get_page(location, page_req)
+                if page is not None:
+                    pages.extend([(link, page_req) for link in page.rel_links()])
+
+        def fetch():
+            while not stopped:
+                try:
+                    req = pending_queue.get(False)
+                except QueueEmpty:
+                    return
+                try:
+                    fetch_pages(req)
+                finally:
+                    done_queue.put(req)
+
+        threads = []
+        for i in range(min(self.max_batch_page_workers, len(reqs))):
+            t = threading.Thread(target=fetch)
+            t.setDaemon(True)
+            threads.append(t)
+            t.start()
+        try:
+            for i in range(len(reqs)):
+                req = done_queue.get()
+                try:
+                    link = self.find_requirement(req, upgrade)
+                except (DistributionNotFound, BestVersionAlreadyInstalled):
+                    yield req, None, sys.exc_info()[1]
+                else:
+                    yield req, link, None
+        finally:
+            # the caller may stop early
+            stopped.append(True)
+            for t in threads:
+                t.join()
+
+    def find_requirement(self, req, upgrade):
+        url_name = req.url_name
+        # Only check main index if index URL is given:
+        main_index_url = None
+        if self.index_urls:
+            # Check that we have the url_name correctly spelled:
+            main_index_url = Link(self._mkurl_pypi_url(self.index_urls[0], url_name))
+            # This will also cache the page, so it's okay that we get it again later:
+            page = self._get_page(main_index_url, req)
+            if page is None:
+                url_name = self._find_url_name(Link(self.index_urls[0]), url_name, req) or req.url_name
+
+        file_locations, url_locations = self._find_locations(req, url_name, main_index_url)
 
         locations = [Link(url) for url in url_locations]
         logger.debug('URLs to search for versions for %s:' % req)
@@ -207,7 +336,7 @@ class PackageFinder(object):
             logger.debug('Analyzing links from page %s' % page.url)
             logger.indent += 2
             try:
-                page_versions.extend(self._package_versions(page.links, req.name.lower()))
+                page_versions.extend(self._page_versions(page, req.name.lower()))
             finally:
                 logger.indent -= 2
         dependency_versions = list(self._package_versions(
@@ -281,17 +410,29 @@ class PackageFinder(object):
                 return base
         return None
 
+    # Number of threads fetching pages for one requirement, and for a
+    # batch of requirements (see prefetch_pages)
+    max_page_workers = 10
+    max_batch_page_workers = 32
+
     def _get_pages(self, locations, req):
         """Yields (page, page_url) from the given locations, skipping
         locations that have errors, and adding download/homepage links"""
+        return self._fetch_pages([(location, req) for location in locations],
+                                 self.max_page_workers)
+
+    def _fetch_pages(self, items, max_workers):
+        """Fetch the pages of the given (location, req) items with up to
+        ``max_workers`` threads, following download/homepage links, and
+        return the pages that could be fetched."""
         pending_queue = Queue()
-        for location in locations:
-            pending_queue.put(location)
+        for item in items:
+            pending_queue.put(item)
         done = []
         seen = set()
         threads = []
-        for i in range(min(10, len(locations))):
-            t = threading.Thread(target=self._get_queued_page, args=(req, pending_queue, done, seen))
+        for i in range(min(max_workers, len(items))):
+            t = threading.Thread(target=self._get_queued_page, args=(pending_queue, done, seen))
             t.setDaemon(True)
             threads.append(t)
             t.start()
@@ -301,10 +442,10 @@ class PackageFinder(object):
 
     _log_lock = threading.Lock()
 
-    def _get_queued_page(self, req, pending_queue, done, seen):
+    def _get_queued_page(self, pending_queue, done, seen):
         while 1:
             try:
-                location = pending_queue.get(False)
+                location, req = pending_queue.get(False)
             except QueueEmpty:
                 return
             if location in seen:
@@ -315,7 +456,7 @@ class PackageFinder(object):
                 continue
             done.append(page)
             for link in page.rel_links():
-                pending_queue.put(link)
+                pending_queue.put((link, req))
 
     _egg_fragment_re = re.compile(r'#egg=([^&]*)')
     _egg_info_re = re.compile(r'([a-z0-9_.]+)-([a-z0-9_.-]+)', re.I)
@@ -354,50 +495,127 @@ class PackageFinder(object):
         Meant to be overridden by subclasses, not called by clients.
         """
         version = None
-        if link.egg_fragment:
-            egg_info = link.egg_fragment
-        else:
-            egg_info, ext = link.splitext()
-            if not ext:
-                if link not in self.logged_links:
-                    logger.debug('Skipping link %s; not a file' % link)
-                    self.logged_links.add(link)
-                return []
-            if egg_info.endswith('.tar'):
-                # Special double-extension case:
-                egg_info = egg_info[:-4]
-                ext = '.tar' + ext
-            if ext not in self._known_extensions():
-                if link not in self.logged_links:
-                    logger.debug('Skipping link %s; unknown archive format: %s' % (link, ext))
-                    self.logged_links.add(link)
-                return []
-            if "macosx10" in link.path and ext == '.zip':
-                if link not in self.logged_links:
-                    logger.debug('Skipping link %s; macosx10 one' % (link))
-                    self.logged_links.add(link)
+        egg_info = self._link_egg_info(link)
+        if egg_info is None:
+            return []
+        if link.wheel and link.wheel.name.lower() == search_name.lower():
+            version = link.wheel.version
+            if not link.wheel.supported():
+                logger.debug('Skipping %s because it is not compatible with this Python' % link)
                 return []
-            if link.wheel and link.wheel.name.lower() == search_name.lower():
-                version = link.wheel.version
-                if not link.wheel.supported():
-                    logger.debug('Skipping %s because it is not compatible with this Python' % link)
-                    return []
         if not version:
             version = self._egg_info_matches(egg_info, search_name, link)
         if version is None:
             logger.debug('Skipping link %s; wrong project name (not %s)' % (link, search_name))
             return []
+        version = self._strip_py_version(version, link)
+        if version is None:
+            return []
+        logger.debug('Found link %s, version: %s' % (link, version))
+        return [(_parse_version(version),
+               link,
+               version)]
+
+    def _link_egg_info(self, link):
+        """
+        Return the "name-version" part of the given link, or None if the
+        link can't be an installable archive at all.
+        """
+        if link.egg_fragment:
+            return link.egg_fragment
+        egg_info, ext = link.splitext()
+        if not ext:
+            if link not in self.logged_links:
+                logger.debug('Skipping link %s; not a file' % link)
+                self.logged_links.add(link)
+            return None
+        if egg_info.endswith('.tar'):
+            # Special double-extension case:
+            egg_info = egg_info[:-4]
+            ext = '.tar' + ext
+        if ext not in self._known_extensions():
+            if link not in self.logged_links:
+                logger.debug('Skipping link %s; unknown archive format: %s' % (link, ext))
+                self.logged_links.add(link)
+            return None
+        if "macosx10" in link.path and ext == '.zip':
+            if link not in self.logged_links:
+                logger.debug('Skipping link %s; macosx10 one' % (link))
+                self.logged_links.add(link)
+            return None
+        return egg_info
+
+    def _strip_py_version(self, version, link):
+        """
+        Strip a -pyX.Y suffix from version, returning None if it doesn't
+        match the running Python.
+        """
         match = self._py_version_re.search(version)
         if match:
             version = version[:match.start()]
             py_version = match.group(1)
             if py_version != sys.version[:3]:
                 logger.debug('Skipping %s because Python version is incorrect' % link)
-                return []
-        logger.debug('Found link %s, version: %s' % (link, version))
-        return [(pkg_resources.parse_version(version),
-               link,
-               version)]
+                return None
+        return version
+
+    def _page_versions(self, page, search_name):
+        """
+        Like self._package_versions(page.links, search_name), but using
+        an index of the page's links by project name that is built only
+        once per page, so looking up several requirements on the same page
+        (e.g. a big --find-links page, or again during --upgrade) doesn't
+        re-parse every link each time.
+        """
+        key = self._known_extensions()
+        index = page.version_indexes.get(key)
+        if index is None:
+            index = self._build_version_index(page.links)
+            page.version_indexes[key] = index
+        for parsed_version, link, version, wheel in index.get(search_name.lower(), ()):
+            if wheel is not None and not wheel.supported():
+                logger.debug('Skipping %s because it is not compatible with this Python' % link)
+                continue
+            logger.debug('Found link %s, version: %s' % (link, version))
+            yield parsed_version, link, version
+
+    def _build_version_index(self, links):
+        """
+        Map every project name a link could belong to (in the sense of
+        _link_package_versions) to a list of (pkg_resources_version_key,
+        link, version, wheel) tuples, in the order of _sort_links.
+        """
+        index = {}
+
+        def add(name, version, link, wheel=None):
+            version = self._strip_py_version(version, link)
+            if version is not None:
+                index.setdefault(name, []).append(
+                    (_parse_version(version), link, version, wheel))
+
+        for link in self._sort_links(links):
+            egg_info = self._link_egg_info(link)
+            if egg_info is None:
+                continue
+            wheel_name = None
+            if link.wheel and link.wheel.version:
+                wheel_name = link.wheel.name.lower()
+                add(wheel_name, link.wheel.version, link, link.wheel)
+            match = self._egg_info_re.search(egg_info)
+            if not match:
+                logger.debug('Could not parse version from link: %s' % link)
+                continue
+            egg_info = match.group(0)
+            # To match the "safe" name that pkg_resources creates:
+            name = egg_info.lower().replace('_', '-')
+            # project name and version are separated by a dash, but either
+            # may contain dashes too
+            pos = name.find('-')
+            while pos != -1:
+                if name[:pos] != wheel_name:
+                    add(name[:pos], egg_info[pos + 1:], link)
+                pos = name.find('-', pos + 1)
+        return index
 
     def _egg_info_matches(self, egg_info, search_name, link):
         match = self._egg_info_re.search(egg_info)
@@ -439,15 +657,47 @@ class PackageFinder(object):
         return list(mirror_urls)
 
 
+_parsed_versions = {}
+
+
+def _parse_version(version):
+    """pkg_resources.parse_version, remembering the results since the same
+    version strings show up over and over on index pages"""
+    try:
+        return _parsed_versions[version]
+    except KeyError:
+        parsed = _parsed_versions[version] = pkg_resources.parse_version(version)
+        return parsed
+
+
 class PageCache(object):
-    """Cache of HTML pages"""
+    """Cache of HTML pages
+
+    Pages are always kept in memory for the lifetime of the finder.  If a
+    ``cache_dir`` is given, the bodies of http(s) pages are also stored on
+    disk together with their ETag/Last-Modified validators, so that later
+    runs can revalidate them with a conditional request instead of
+    downloading them again.  The on-disk cache is bounded by ``max_size``
+    bytes; the least recently used pages are evicted first.  Stored pages
+    validated less than ``ttl`` seconds ago are used without asking the
+    server at all.
+    """
 
     failure_limit = 3
+    max_size = 50 * 1000 * 1000
 
-    def __init__(self):
+    def __init__(self, cache_dir=None, max_size=None, ttl=None):
         self._failures = {}
         self._pages = {}
         self._archives = {}
+        if cache_dir:
+            cache_dir = os.path.expanduser(cache_dir)
+        self.cache_dir = cache_dir
+        if max_size is not None:
+            self.max_size = max_size
+        self.ttl = ttl
+        self._disk_lock = threading.Lock()
+        self._disk_usage = None
 
     def too_many_failures(self, url):
         return self._failures.get(url, 0) >= self.failure_limit
@@ -468,22 +718,241 @@ class PageCache(object):
         for url in urls:
             self._pages[url] = page
 
+    def _is_storable(self, url):
+        return (self.cache_dir is not None and json is not None
+                and url.lower().startswith(('http:', 'https:')))
+
+    def _stored_page_path(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key)
+
+    def get_stored_page(self, url):
+        """Return the page stored on disk for ``url`` as a dict with the
+        keys ``url``, ``etag``, ``last_modified`` and ``content`` (bytes),
+        or None if there is no usable copy."""
+        if not self._is_storable(url):
+            return None
+        path = self._stored_page_path(url)
+        try:
+            fp = open(path + '.json')
+            try:
+                info = json.load(fp)
+            finally:
+                fp.close()
+            fp = open(path, 'rb')
+            try:
+                info['content'] = fp.read()
+            finally:
+                fp.close()
+        except (IOError, OSError, ValueError):
+            return None
+        if info.get('request_url') != url:
+            # hash collision or a stale entry
+            return None
+        return info
+
+    def touch_stored_page(self, url):
+        """Mark the stored copy of ``url`` as recently used."""
+        if not self._is_storable(url):
+            return
+        try:
+            os.utime(self._stored_page_path(url), None)
+        except OSError:
+            pass
+
+    def is_fresh(self, stored):
+        """Whether the stored page ``stored`` (from get_stored_page()) was
+        validated recently enough to be used without a request."""
+        if not self.ttl:
+            return False
+        validated = stored.get('validated', stored.get('stored', 0))
+        return 0 <= time.time() - validated < self.ttl
+
+    def set_validated(self, url, stored):
+        """Record that the server confirmed the stored copy of ``url``."""
+        if not self.ttl or not self._is_storable(url):
+            return
+        info = dict(stored)
+        del info['content']
+        info['validated'] = time.time()
+        try:
+            write_atomic(self._stored_page_path(url) + '.json',
+                         json.dumps(info), 'w')
+        except (IOError, OSError):
+            pass
+
+    def is_storable_response(self, url, headers):
+        """Whether a response for ``url`` with the given headers carries
+        validators that allow revalidating it later."""
+        return self._is_storable(url) and bool(
+            headers.get('ETag') or headers.get('Last-Modified'))
+
+    def store_page(self, url, real_url, headers, content):
+        """Store the raw ``content`` of ``url`` on disk if the response
+        carries validators that allow revalidating it later."""
+        if not self.is_storable_response(url, headers):
+            return
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        info = {
+            'request_url': url,
+            'url': real_url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored': time.time(),
+        }
+        path = self._stored_page_path(url)
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            write_atomic(path, content, 'wb')
+            write_atomic(path + '.json', json.dumps(info), 'w')
+        except (IOError, OSError):
+            e = sys.exc_info()[1]
+            logger.debug('Could not store page %s in cache: %s' % (url, e))
+            return
+        self._account(len(content))
+
+    def _account(self, size):
+        self._disk_lock.acquire()
+        try:
+            if self._disk_usage is None:
+                self._disk_usage = sum(
+                    [size for path, size, mtime in self._stored_files()])
+            else:
+                self._disk_usage += size
+            if self._disk_usage > self.max_size:
+                self._evict()
+        finally:
+            self._disk_lock.release()
+
+    def _stored_files(self):
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.json') or name.endswith('.tmp'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((path, st.st_size, st.st_mtime))
+        return files
+
+    def _evict(self):
+        """Remove the least recently used pages until the cache fits
+        into three quarters of its size limit."""
+        files = self._stored_files()
+        files.sort(key=lambda f: f[2])
+        usage = sum([size for path, size, mtime in files])
+        target = self.max_size * 3 // 4
+        for path, size, mtime in files:
+            if usage <= target:
+                break
+            for filename in (path, path + '.json'):
+                try:
+                    os.remove(filename)
+                except OSError:
+                    pass
+            usage -= size
+        self._disk_usage = usage
+
+
+def _text_decoder():
+    """Return a function decoding page bytes incrementally, the way
+    pip.backwardcompat.u decodes them in one go."""
+    if sys.version_info >= (3,):
+        return codecs.getincrementaldecoder('utf-8')().decode
+    return lambda data, final=False: data
+
+
+class LinkParser(object):
+    """
+    Collects everything pip needs from an index page -- hrefs, rel
+    attributes, the <base> URL and the targets of the setuptools
+    "<th>Home Page" hack -- in a single pass over its text.
+
+    Text can be fed in arbitrary chunks, e.g. straight from a response
+    while it is still downloading; only the raw hrefs are kept.
+    """
+
+    ## FIXME: the <th> part is a horrible hack for setuptools' pages
+    _token_re = re.compile(r'<th>\s*(home\s*page|download\s+url)|<[^<>]*>', re.I)
+    _href_re = re.compile('href=(?:"([^"]*)"|\'([^\']*)\'|([^>\\s\\n]*))', re.I|re.S)
+    _rel_re = re.compile(r"""\srel\s*=\s*['"]?([^'">]+)""", re.I)
+    _base_re = re.compile(r'<base\s', re.I)
+
+    def __init__(self):
+        self.base_url = None
+        # raw hrefs in page order
+        self.hrefs = []
+        # (rels, href) for tags with a rel attribute
+        self.rel_hrefs = []
+        # 'homepage'/'download' -> first href after the matching <th>
+        self.scraped_hrefs = {}
+        self._pending = []
+        self._buffer = ''
+
+    def feed(self, data):
+        data = self._buffer + data
+        # the text from the last '<' on may be an incomplete tag, keep it
+        # for the next chunk
+        end = data.rfind('<')
+        if end == -1:
+            self._buffer = ''
+            return
+        self._buffer = data[end:]
+        self._scan(data, end)
+
+    def close(self):
+        data, self._buffer = self._buffer, ''
+        self._scan(data, len(data))
+
+    def _scan(self, data, end):
+        for match in self._token_re.finditer(data, 0, end):
+            kind = match.group(1)
+            if kind is not None:
+                kind = kind[0] in 'hH' and 'homepage' or 'download'
+                if kind not in self.scraped_hrefs and kind not in self._pending:
+                    self._pending.append(kind)
+                continue
+            tag = match.group(0)
+            href_match = self._href_re.search(tag)
+            if href_match is None:
+                continue
+            href = href_match.group(1) or href_match.group(2) or href_match.group(3)
+            self.hrefs.append(href)
+            if self._pending:
+                for kind in self._pending:
+                    self.scraped_hrefs[kind] = href
+                self._pending = []
+            rel_match = self._rel_re.search(tag)
+            if rel_match is not None:
+                self.rel_hrefs.append((rel_match.group(1).lower().split(), href))
+            if self.base_url is None and self._base_re.match(tag):
+                self.base_url = href
+
 
 class HTMLPage(object):
     """Represents one page, along with its URL"""
 
-    ## FIXME: these regexes are horrible hacks:
-    _homepage_re = re.compile(r'<th>\s*home\s*page', re.I)
-    _download_re = re.compile(r'<th>\s*download\s+url', re.I)
-    ## These aren't so aweful:
-    _rel_re = re.compile("""<[^>]*\srel\s*=\s*['"]?([^'">]+)[^>]*>""", re.I)
-    _href_re = re.compile('href=(?:"([^"]*)"|\'([^\']*)\'|([^>\\s\\n]*))', re.I|re.S)
-    _base_re = re.compile(r"""<base\s+href\s*=\s*['"]?([^'">]+)""", re.I)
+    # size of the chunks read from the response while parsing it
+    chunk_size = 64 * 1024
 
-    def __init__(self, content, url, headers=None):
+    def __init__(self, content, url, headers=None, parser=None):
         self.content = content
         self.url = url
         self.headers = headers
+        if parser is None:
+            parser = LinkParser()
+            parser.feed(content)
+            parser.close()
+        self.parser = parser
+        self._urls = None
+        self._resolved = {}
+        # indexes of the links by project name, see
+        # PackageFinder._page_versions
+        self.version_indexes = {}
 
     def __str__(self):
         return self.url
@@ -533,19 +1002,31 @@ class HTMLPage(object):
                 url = urlparse.urljoin(url, 'index.html')
                 logger.debug(' file: URL is directory, getting %s' % url)
 
-            resp = urlopen(url)
-
-            real_url = geturl(resp)
-            headers = resp.info()
-            contents = resp.read()
-            encoding = headers.get('Content-Encoding', None)
-            #XXX need to handle exceptions and add testing for this
-            if encoding is not None:
-                if encoding == 'gzip':
-                    contents = gzip.GzipFile(fileobj=BytesIO(contents)).read()
-                if encoding == 'deflate':
-                    contents = zlib.decompress(contents)
-            inst = cls(u(contents), real_url, headers)
+            stored = None
+            if cache is not None:
+                stored = cache.get_stored_page(url)
+            try:
+                if stored is not None and cache.is_fresh(stored):
+                    logger.debug('Using cached copy of page %s' % url)
+                    cache.touch_stored_page(url)
+                    return cls._from_stored(url, stored, cache)
+                resp = urlopen(cls._get_request(url, stored))
+            except HTTPError:
+                e = sys.exc_info()[1]
+                if stored is None or e.code != 304:
+                    raise
+                logger.debug('Page %s not modified, using cached copy' % url)
+                cache.touch_stored_page(url)
+                cache.set_validated(url, stored)
+                return cls._from_stored(url, stored, cache)
+            else:
+                real_url = geturl(resp)
+                headers = resp.info()
+                keep = cache is not None and cache.is_storable_response(url, headers)
+                parser, contents = cls._parse_response(resp, headers, keep)
+                if keep:
+                    cache.store_page(url, real_url, headers, contents)
+            inst = cls(None, real_url, headers, parser=parser)
         except (HTTPError, URLError, socket.timeout, socket.error, OSError, WindowsError):
             e = sys.exc_info()[1]
             desc = str(e)
@@ -581,6 +1062,64 @@ class HTMLPage(object):
             cache.add_page([url, real_url], inst)
         return inst
 
+    @classmethod
+    def _from_stored(cls, url, stored, cache):
+        parser = LinkParser()
+        parser.feed(u(stored['content']))
+        parser.close()
+        inst = cls(None, stored['url'], {}, parser=parser)
+        cache.add_page([url, stored['url']], inst)
+        return inst
+
+    @classmethod
+    def _parse_response(cls, resp, headers, keep=False):
+        """Feed the body of ``resp`` to a LinkParser while it downloads,
+        decompressing and decoding it on the fly.  Returns the parser and,
+        if ``keep`` is true, the decompressed body (else None)."""
+        encoding = headers.get('Content-Encoding', None)
+        #XXX need to handle exceptions and add testing for this
+        if encoding == 'gzip':
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            decompressor = zlib.decompressobj()
+        else:
+            decompressor = None
+        decode = _text_decoder()
+        parser = LinkParser()
+        kept = []
+        while True:
+            chunk = resp.read(cls.chunk_size)
+            if not chunk:
+                break
+            if decompressor is not None:
+                chunk = decompressor.decompress(chunk)
+            if keep:
+                kept.append(chunk)
+            parser.feed(decode(chunk))
+        if decompressor is not None:
+            chunk = decompressor.flush()
+            if keep:
+                kept.append(chunk)
+            parser.feed(decode(chunk))
+        parser.feed(decode(b(''), True))
+        parser.close()
+        if not keep:
+            return parser, None
+        return parser, b('').join(kept)
+
+    @staticmethod
+    def _get_request(url, stored=None):
+        """Return the request for ``url``, made conditional on the
+        validators of the ``stored`` copy of the page, if any."""
+        if not stored:
+            return url
+        headers = {'Accept-encoding': 'identity'}
+        if stored.get('etag'):
+            headers['If-None-Match'] = stored['etag']
+        if stored.get('last_modified'):
+            headers['If-Modified-Since'] = stored['last_modified']
+        return urllib2.Request(url, headers=headers)
+
     @staticmethod
     def _get_content_type(url):
         """Get the Content-Type of the given url, using a HEAD request"""
@@ -601,20 +1140,16 @@ class HTMLPage(object):
 
     @property
     def base_url(self):
-        if not hasattr(self, "_base_url"):
-            match = self._base_re.search(self.content)
-            if match:
-                self._base_url = match.group(1)
-            else:
-                self._base_url = self.url
-        return self._base_url
+        return self.parser.base_url or self.url
 
     @property
     def links(self):
         """Yields all links in the page"""
-        for match in self._href_re.finditer(self.content):
-            url = match.group(1) or match.group(2) or match.group(3)
-            url = self.clean_link(urlparse.urljoin(self.base_url, url))
+        if self._urls is None:
+            # resolve every href once, the page is usually iterated over
+            # several times
+            self._urls = [self._resolve(href) for href in self.parser.hrefs]
+        for url in self._urls:
             yield Link(url, self)
 
     def rel_links(self):
@@ -625,33 +1160,27 @@ class HTMLPage(object):
 
     def explicit_rel_links(self, rels=('homepage', 'download')):
         """Yields all links with the given relations"""
-        for match in self._rel_re.finditer(self.content):
-            found_rels = match.group(1).lower().split()
+        for found_rels, href in self.parser.rel_hrefs:
             for rel in rels:
                 if rel in found_rels:
                     break
             else:
                 continue
-            match = self._href_re.search(match.group(0))
-            if not match:
-                continue
-            url = match.group(1) or match.group(2) or match.group(3)
-            url = self.clean_link(urlparse.urljoin(self.base_url, url))
-            yield Link(url, self)
+            yield Link(self._resolve(href), self)
 
     def scraped_rel_links(self):
-        for regex in (self._homepage_re, self._download_re):
-            match = regex.search(self.content)
-            if not match:
-                continue
-            href_match = self._href_re.search(self.content, pos=match.end())
-            if not href_match:
+        for kind in ('homepage', 'download'):
+            href = self.parser.scraped_hrefs.get(kind)
+            if not href:
                 continue
-            url = href_match.group(1) or href_match.group(2) or href_match.group(3)
-            if not url:
-                continue
-            url = self.clean_link(urlparse.urljoin(self.base_url, url))
-            yield Link(url, self)
+            yield Link(self._resolve(href), self)
+
+    def _resolve(self, href):
+        url = self._resolved.get(href)
+        if url is None:
+            url = self.clean_link(urlparse.urljoin(self.base_url, href))
+            self._resolved[href] = url
+        return url
 
     _clean_re = re.compile(r'[^a-z0-9$&+,/:;=?@.#%_\\|-]', re.I)
 
@@ -121,6 +121,21 @@ else:
         default_log_file = os.path.join(user_dir, 'Library/Logs/pip.log')
 
 
+def sys_path_mtimes():
+    """
+    Return the [path, mtime] of each directory on sys.path, which change
+    when distributions are installed or removed there.
+    """
+    mtimes = []
+    for path in sys.path:
+        path = os.path.abspath(path)
+        try:
+            mtimes.append([path, os.stat(path).st_mtime])
+        except OSError:
+            pass
+    return mtimes
+
+
 def distutils_scheme(dist_name, user=False, home=None):
     """
     Return a distutils install scheme
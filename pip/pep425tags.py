@@ -1,13 +1,19 @@
 """Generate and work with PEP 425 Compatibility Tags."""
 
+import hashlib
+import os
 import sys
 
+try:
+    import json
+except ImportError:  # pragma nocover
+    # Python < 2.6
+    json = None
 try:
     import sysconfig
 except ImportError:  # pragma nocover
     # Python < 2.7
     import distutils.sysconfig as sysconfig
-import distutils.util
 
 
 def get_abbr_impl():
@@ -34,6 +40,7 @@ def get_impl_ver():
 def get_platform():
     """Return our platform name 'win32', 'linux_x86_64'"""
     # XXX remove distutils dependency
+    import distutils.util
     return distutils.util.get_platform().replace('.', '_').replace('-', '_')
 
 
@@ -94,5 +101,122 @@ def get_supported(versions=None):
 
     return supported
 
-supported_tags = get_supported()
 
+def get_tag_priorities(tags):
+    """
+    Return a dict mapping each tag of the ``tags`` list to its position in
+    it, i.e. its priority (lower is better).
+    """
+    priorities = {}
+    for i, tag in enumerate(tags):
+        priorities.setdefault(tag, i)
+    return priorities
+
+
+def _cache_path():
+    from pip.locations import default_storage_dir
+    key = hashlib.sha1((sys.executable or sys.prefix).encode('utf-8'))
+    key = key.hexdigest()[:16]
+    return os.path.join(default_storage_dir, 'tags', key + '.json')
+
+
+def _interpreter_info():
+    """
+    What the supported tags of the running interpreter depend on: its
+    build, and the code computing them.
+    """
+    info = [sys.executable, sys.version, sys.platform, sys.maxsize]
+    for path in (sys.executable, os.path.abspath(__file__)):
+        try:
+            info.append(os.stat(path).st_mtime)
+        except OSError:
+            info.append(None)
+    return info
+
+
+def load_supported():
+    """
+    Return get_supported() for the running interpreter, kept in a file in
+    the storage directory so that it is computed once per interpreter
+    rather than once per run.
+    """
+    if json is None:
+        return get_supported()
+    path = _cache_path()
+    info = _interpreter_info()
+    try:
+        fp = open(path)
+        try:
+            data = json.load(fp)
+        finally:
+            fp.close()
+        if data['interpreter'] == info:
+            return [tuple(str(part) for part in tag) for tag in data['tags']]
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        pass
+    supported = get_supported()
+    from pip.util import write_atomic
+    try:
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        data = {'interpreter': info, 'tags': supported}
+        write_atomic(path, json.dumps(data), 'w')
+    except (IOError, OSError):
+        pass
+    return supported
+
+
+class _Computed(object):
+    """
+    A read-only list or dict, computed by calling ``compute`` when it is
+    first used.
+    """
+
+    # the methods of lists and dicts that don't modify them
+    _read_only = frozenset(['index', 'count', 'get', 'keys', 'values',
+                            'items', 'copy', 'has_key', 'iterkeys',
+                            'itervalues', 'iteritems'])
+
+    def __init__(self, compute):
+        self._compute = compute
+        self._value = None
+
+    def _get(self):
+        if self._value is None:
+            self._value = self._compute()
+        return self._value
+
+    def __getattr__(self, name):
+        if name not in self._read_only:
+            raise AttributeError(name)
+        return getattr(self._get(), name)
+
+    def __iter__(self):
+        return iter(self._get())
+
+    def __len__(self):
+        return len(self._get())
+
+    def __getitem__(self, key):
+        return self._get()[key]
+
+    def __contains__(self, item):
+        return item in self._get()
+
+    def __eq__(self, other):
+        return self._get() == other
+
+    def __ne__(self, other):
+        return self._get() != other
+
+    def __repr__(self):
+        return repr(self._get())
+
+
+# Both are only computed when a wheel is looked at, so that commands not
+# dealing with wheels don't have to.
+supported_tags = _Computed(load_supported)
+
+# So that checking and ranking wheels is a dict lookup per tag.
+supported_tags_priority = _Computed(
+    lambda: get_tag_priorities(supported_tags._get()))
@@ -8,6 +8,7 @@ import shutil
 import tempfile
 import textwrap
 import zipfile
+import posixpath
 
 from distutils.util import change_root
 from pip.locations import (bin_py, running_under_virtualenv,PIP_DELETE_MARKER_FILENAME,
@@ -21,18 +22,23 @@ from pip.util import (display_path, rmtree, ask, ask_path_exists, backup_dir,
                       is_installable_dir, is_local, dist_is_local,
                       dist_in_usersite, dist_in_site_packages, renames,
                       normalize_path, egg_link_path, make_path_relative,
-                      call_subprocess, is_prerelease)
+                      call_subprocess, is_prerelease, keep_wheel_file,
+                      unpack_file, read_packaged_egg_info, format_size,
+                      ByteCompiler, forget_installed_distributions)
 from pip.backwardcompat import (urlparse, urllib, uses_pycache,
                                 ConfigParser, string_types, HTTPError,
-                                get_python_version, b)
+                                get_python_version, httplib, b)
 from pip.index import Link
 from pip.locations import build_prefix
 from pip.download import (get_file_content, is_url, url_to_path,
                           path_to_url, is_archive_file,
                           unpack_vcs_link, is_vcs_url, is_file_url,
-                          unpack_file_url, unpack_http_url)
+                          unpack_file_url, unpack_http_url, DownloadCache,
+                          prefetch_http_urls, HTTPRangeReader)
 import pip.wheel
-from pip.wheel import move_wheel_files
+from pip.wheel import (move_wheel_files, install_wheel, wheel_distribution,
+                       bdist_wheel_support, Wheel, WheelBuilder, WheelCache,
+                       wheel_ext)
 
 class InstallRequirement(object):
 
@@ -65,6 +71,11 @@ class InstallRequirement(object):
         self.uninstalled = None
         self.use_user_site = False
         self.target_dir = None
+        # sha256 of the sdist, if a wheel built from it can be cached
+        self.wheel_cache_digest = None
+        # Link of a wheel whose metadata was read remotely, still to be
+        # downloaded before installing
+        self.download_link = None
 
         # True if pre-releases are acceptable
         if prereleases:
@@ -245,6 +256,20 @@ class InstallRequirement(object):
                 command_desc='python setup.py egg_info')
         finally:
             logger.indent -= 2
+        self._egg_info_ready()
+
+    def restore_egg_info(self, egg_info_dir):
+        """Use the egg-info metadata kept in egg_info_dir, instead of
+        running setup.py egg_info"""
+        assert self.source_dir
+        logger.notify('Using cached egg_info for package %s'
+                      % (self.name or 'from %s' % self.url))
+        dest = os.path.join(self.source_dir, 'pip-egg-info',
+                            os.path.basename(egg_info_dir))
+        shutil.copytree(egg_info_dir, dest)
+        self._egg_info_ready()
+
+    def _egg_info_ready(self):
         if not self.req:
             self.req = pkg_resources.Requirement.parse(
                 "%(Name)s==%(Version)s" % self.pkg_info())
@@ -510,10 +535,12 @@ exec(compile(open(__file__).read().replace('\\r\\n', '\\n'), __file__, 'exec'))
 
         paths_to_remove.remove(auto_confirm)
         self.uninstalled = paths_to_remove
+        forget_installed_distributions()
 
     def rollback_uninstall(self):
         if self.uninstalled:
             self.uninstalled.rollback()
+            forget_installed_distributions()
         else:
             logger.error("Can't rollback %s, nothing uninstalled."
                          % (self.project_name,))
@@ -521,6 +548,7 @@ exec(compile(open(__file__).read().replace('\\r\\n', '\\n'), __file__, 'exec'))
     def commit_uninstall(self):
         if self.uninstalled:
             self.uninstalled.commit()
+            forget_installed_distributions()
         else:
             logger.error("Can't commit %s, nothing uninstalled."
                          % (self.project_name,))
@@ -573,13 +601,29 @@ exec(compile(open(__file__).read().replace('\\r\\n', '\\n'), __file__, 'exec'))
         name = name.replace(os.path.sep, '/')
         return name
 
-    def install(self, install_options, global_options=(), root=None):
+    def install(self, install_options, global_options=(), root=None,
+                compiler=None):
+        """
+        Install the requirement; the installed modules are byte-compiled
+        with compiler (a ByteCompiler) if given, rather than by setup.py.
+        """
+        forget_installed_distributions()
         if self.editable:
             self.install_editable(install_options, global_options)
             return
         if self.is_wheel:
-            self.move_wheel_files(self.source_dir)
+            self.move_wheel_files(self.source_dir, compiler)
             return
+        compile_options = [option for option in install_options
+                           if option in ('--compile', '-c', '--no-compile')
+                           or option.startswith(('--optimize', '-O'))]
+        if self.as_egg or compile_options:
+            # setup.py compiles, and egg installs have no record we could
+            # add the .pyc files to
+            compiler = None
+        elif compiler is not None and not compiler.available():
+            # no pool of processes, setup.py compiles as fast
+            compiler = None
 
         temp_location = tempfile.mkdtemp('-record', 'pip-')
         record_filename = os.path.join(temp_location, 'install-record.txt')
@@ -595,6 +639,9 @@ exec(compile(open(__file__).read().replace('\\r\\n', '\\n'), __file__, 'exec'))
             if not self.as_egg:
                 install_args += ['--single-version-externally-managed']
 
+            if compiler is not None:
+                install_args += ['--no-compile']
+
             if root is not None:
                 install_args += ['--root', root]
 
@@ -627,25 +674,38 @@ exec(compile(open(__file__).read().replace('\\r\\n', '\\n'), __file__, 'exec'))
                     return change_root(root, path)
 
             f = open(record_filename)
-            for line in f:
-                line = line.strip()
+            record = [line.strip() for line in f]
+            f.close()
+            egg_info_dir = None
+            for line in record:
                 if line.endswith('.egg-info'):
                     egg_info_dir = prepend_root(line)
                     break
-            else:
+
+            compiled = []
+            if compiler is not None:
+                # the modules are those next to the .egg-info directory,
+                # not the scripts
+                modules = record
+                if egg_info_dir is not None:
+                    lib_dir = os.path.join(os.path.dirname(egg_info_dir), '')
+                    modules = [filename for filename in record
+                               if prepend_root(filename).startswith(lib_dir)]
+                compiled = compiler.compile(
+                    [prepend_root(filename) for filename in modules], modules)
+
+            if egg_info_dir is None:
                 logger.warn('Could not find .egg-info directory in install record for %s' % self)
                 ## FIXME: put the record somewhere
                 ## FIXME: should this be an error?
                 return
-            f.close()
             new_lines = []
-            f = open(record_filename)
-            for line in f:
-                filename = line.strip()
+            for filename in record:
                 if os.path.isdir(filename):
                     filename += os.path.sep
                 new_lines.append(make_path_relative(prepend_root(filename), egg_info_dir))
-            f.close()
+            for filename in compiled:
+                new_lines.append(make_path_relative(filename, egg_info_dir))
             f = open(os.path.join(egg_info_dir, 'installed-files.txt'), 'w')
             f.write('\n'.join(new_lines)+'\n')
             f.close()
@@ -789,8 +849,15 @@ exec(compile(open(__file__).read().replace('\\r\\n', '\\n'), __file__, 'exec'))
         self._bundle_build_dirs = bundle_build_dirs
         self._bundle_editable_dirs = bundle_editable_dirs
 
-    def move_wheel_files(self, wheeldir):
-        move_wheel_files(self.name, self.req, wheeldir, user=self.use_user_site, home=self.target_dir)
+    def move_wheel_files(self, wheeldir, compiler=None):
+        wheel_path = os.path.join(wheeldir, Link(self.url).filename)
+        if os.path.isfile(wheel_path):
+            install_wheel(self.name, self.req, wheel_path, user=self.use_user_site, home=self.target_dir,
+                          compiler=compiler)
+        else:
+            # unpacked by an older pip
+            move_wheel_files(self.name, self.req, wheeldir, user=self.use_user_site, home=self.target_dir,
+                             compiler=compiler)
 
     @property
     def delete_marker_filename(self):
@@ -826,16 +893,78 @@ class Requirements(object):
         return 'Requirements({%s})' % ', '.join(values)
 
 
+class EggInfoCache(object):
+    """
+    The egg-info metadata of sdists, kept by the sha256 of the sdist and
+    the Python version and platform, since setup.py can depend on those.
+    """
+
+    files = ('PKG-INFO', 'requires.txt', 'dependency_links.txt')
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def _key_dir(self, digest):
+        return os.path.join(self.cache_dir, digest[:2], digest,
+                            'py%s-%s' % (get_python_version(), sys.platform))
+
+    def get(self, digest):
+        """Return the cached .egg-info directory of the sdist with this
+        digest, or None"""
+        key_dir = self._key_dir(digest)
+        try:
+            names = os.listdir(key_dir)
+        except OSError:
+            return None
+        for name in names:
+            if (name.endswith('.egg-info')
+                and os.path.exists(os.path.join(key_dir, name, 'PKG-INFO'))):
+                return os.path.join(key_dir, name)
+        return None
+
+    def store(self, digest, egg_info_dir):
+        """Keep the metadata in egg_info_dir for the sdist with this digest"""
+        key_dir = self._key_dir(digest)
+        if os.path.exists(key_dir):
+            return
+        temp_dir = '%s.%s.tmp' % (key_dir, os.getpid())
+        dest = os.path.join(temp_dir, os.path.basename(egg_info_dir))
+        try:
+            os.makedirs(dest)
+            for name in self.files:
+                source = os.path.join(egg_info_dir, name)
+                if os.path.exists(source):
+                    shutil.copyfile(source, os.path.join(dest, name))
+            os.rename(temp_dir, key_dir)
+        except (IOError, OSError):
+            e = sys.exc_info()[1]
+            logger.info('Could not cache egg_info in %s: %s' % (key_dir, e))
+            rmtree(temp_dir, ignore_errors=True)
+
+
 class RequirementSet(object):
 
     def __init__(self, build_dir, src_dir, download_dir, download_cache=None,
                  upgrade=False, ignore_installed=False, as_egg=False, target_dir=None,
                  ignore_dependencies=False, force_reinstall=False, use_user_site=False,
-                 skip_reqs={}):
+                 skip_reqs={}, download_cache_size=None,
+                 download_workers=1, download_host_workers=2, wheel_cache=False,
+                 lazy_wheels=False):
         self.build_dir = build_dir
         self.src_dir = src_dir
         self.download_dir = download_dir
         self.download_cache = download_cache
+        # size limit of the download cache, in megabytes
+        self.download_cache_size = download_cache_size
+        self._download_cache = None
+        # archives fetched in advance are kept here if there's no
+        # download cache
+        self._temp_download_cache = None
+        self.download_workers = download_workers
+        self.download_host_workers = download_host_workers
+        # req -> (link, error, number of dependency links) found while
+        # prefetching
+        self._found_links = {}
         self.upgrade = upgrade
         self.ignore_installed = ignore_installed
         self.force_reinstall = force_reinstall
@@ -853,6 +982,13 @@ class RequirementSet(object):
         self.target_dir = target_dir
         # Requirements (by project name) to be skipped
         self.skip_reqs = skip_reqs
+        # Build wheels of sdists and keep them in the download cache
+        self.wheel_cache = wheel_cache
+        # build locations holding the egg-info packaged in the sdist
+        self._packaged_egg_info = set()
+        # Read the metadata of remote wheels with range requests and
+        # download them only when installing
+        self.lazy_wheels = lazy_wheels
 
     def __str__(self):
         reqs = [req for req in self.requirements.values()
@@ -969,10 +1105,17 @@ class RequirementSet(object):
         """Prepare process. Create temp directories, download and/or unpack files."""
         unnamed = list(self.unnamed_requirements)
         reqs = list(self.requirements.values())
+        prefetched = set()
         while reqs or unnamed:
             if unnamed:
                 req_to_install = unnamed.pop(0)
             else:
+                if reqs[0] not in prefetched:
+                    # Everything still queued is known at this point, so
+                    # look up the index pages (and download the archives)
+                    # for all of it at once
+                    prefetched.update(reqs)
+                    self._prefetch(finder, reqs)
                 req_to_install = reqs.pop(0)
             install = True
             best_installed = False
@@ -1063,12 +1206,24 @@ class RequirementSet(object):
                         if req_to_install.url is None:
                             if not_found:
                                 raise not_found
-                            url = finder.find_requirement(req_to_install, upgrade=self.upgrade)
+                            url = self._find_requirement(finder, req_to_install)
                         else:
                             ## FIXME: should req_to_install.url already be a link?
                             url = Link(req_to_install.url)
                             assert url
+                        cached_wheel = remote_dist = None
                         if url:
+                            cached_wheel = self.get_cached_wheel(url)
+                        if url and self._defer_wheel_download(url):
+                            remote_dist = self._remote_wheel_distribution(url)
+                        if cached_wheel:
+                            logger.notify('Using wheel built before from the same archive: %s'
+                                          % display_path(cached_wheel))
+                            keep_wheel_file(cached_wheel, location, os.path.basename(cached_wheel))
+                            url = Link(path_to_url(cached_wheel))
+                        elif remote_dist is not None:
+                            req_to_install.download_link = url
+                        elif url:
                             try:
                                 self.unpack_url(url, location, self.is_download)
                             except HTTPError:
@@ -1091,7 +1246,11 @@ class RequirementSet(object):
                         elif is_wheel:
                             req_to_install.source_dir = location
                             req_to_install.url = url.url
-                            dist = list(pkg_resources.find_distributions(location))[0]
+                            if remote_dist is not None:
+                                dist = remote_dist
+                            else:
+                                dist = wheel_distribution(
+                                    os.path.join(location, url.filename))
                             if not req_to_install.req:
                                 req_to_install.req = dist.as_requirement()
                                 self.add_requirement(req_to_install)
@@ -1105,12 +1264,14 @@ class RequirementSet(object):
                                         reqs.append(subreq)
                         elif self.is_download:
                             req_to_install.source_dir = location
-                            req_to_install.run_egg_info()
+                            self.run_egg_info(req_to_install, url)
                             if url and url.scheme in vcs.all_schemes:
                                 req_to_install.archive(self.download_dir)
                         else:
                             req_to_install.source_dir = location
-                            req_to_install.run_egg_info()
+                            self.run_egg_info(req_to_install, url)
+                            if url:
+                                req_to_install.wheel_cache_digest = self._wheel_cache_digest(url)
                             if force_root_egg_info:
                                 # We need to run this to make sure that the .egg-info/
                                 # directory is created for packing in the bundle
@@ -1166,6 +1327,132 @@ class RequirementSet(object):
             finally:
                 logger.indent -= 2
 
+    def _prefetch(self, finder, reqs):
+        """Fetch the index pages of those ``reqs`` that will have to be
+        looked up in the index concurrently, and if enabled, download the
+        archives that are known by then concurrently too."""
+        to_find = []
+        for req in reqs:
+            if req.editable or req.url is not None or req.req is None:
+                continue
+            if not (self.upgrade or self.ignore_installed):
+                if self._is_installed(req):
+                    # already satisfied, won't be looked up
+                    continue
+            to_find.append(req)
+        if self.download_workers <= 1:
+            if len(to_find) > 1:
+                finder.prefetch_pages(to_find)
+            return
+
+        links = []
+        for req in reqs:
+            if (not req.editable and req.url is not None
+                and req.url.lower().startswith(('http:', 'https:'))
+                and not self._defer_wheel_download(Link(req.url))):
+                links.append(Link(req.url))
+        for req, link, error in finder.find_requirements(to_find, self.upgrade):
+            self._found_links[req] = (link, error, len(finder.dependency_links))
+            if link is None or link.scheme not in ('http', 'https'):
+                continue
+            if not self.ignore_installed and self._is_installed(req):
+                # upgrading it may turn out to be unnecessary
+                continue
+            if self._defer_wheel_download(link):
+                # only its metadata is needed for now
+                continue
+            links.append(link)
+        self._prefetch_links(links)
+
+    def _prefetch_links(self, links):
+        if len(links) < 2 or self.download_workers <= 1:
+            return
+        cache = self.get_download_cache()
+        if cache is None:
+            if self._temp_download_cache is None:
+                self._temp_download_cache = DownloadCache(
+                    tempfile.mkdtemp('-download-cache', 'pip-'))
+            cache = self._temp_download_cache
+        prefetch_http_urls(links, cache, self.download_workers,
+                           self.download_host_workers)
+
+    def _defer_wheel_download(self, link):
+        """
+        Whether only the metadata of the wheel at link should be fetched
+        while collecting requirements, leaving the download for later.
+        """
+        if (not self.lazy_wheels or self.is_download
+            or link.scheme not in ('http', 'https')
+            or posixpath.splitext(link.filename)[1] != wheel_ext):
+            return False
+        cache = self.get_download_cache()
+        return not (cache and cache.get(link.url_without_fragment))
+
+    def _remote_wheel_distribution(self, link):
+        """
+        Read the distribution metadata of a remote wheel with HTTP range
+        requests, or return None if that's not possible.
+        """
+        try:
+            reader = HTTPRangeReader.open(link.url_without_fragment)
+            if reader is None:
+                logger.debug('%s does not support range requests'
+                             % link.url_without_fragment)
+                return None
+            dist = wheel_distribution(reader, link.filename,
+                                      ('METADATA',))
+        except (IOError, OSError, httplib.HTTPException,
+                zipfile.BadZipfile, InstallationError):
+            e = sys.exc_info()[1]
+            logger.info('Could not read the metadata of %s remotely: %s'
+                        % (link, e))
+            return None
+        logger.info('Read the metadata of %s (%s) with %s range request(s)'
+                    % (link.filename, format_size(reader.size), reader.requests))
+        return dist
+
+    def _download_deferred_wheels(self, reqs):
+        """Download the wheels whose metadata was read remotely."""
+        reqs = [req for req in reqs if req.download_link is not None]
+        self._prefetch_links([req.download_link for req in reqs])
+        for req in reqs:
+            logger.notify('Downloading %s' % req.download_link.filename)
+            logger.indent += 2
+            try:
+                self.unpack_url(req.download_link, req.source_dir)
+            except HTTPError:
+                e = sys.exc_info()[1]
+                logger.fatal('Could not install requirement %s because of error %s'
+                             % (req, e))
+                raise InstallationError(
+                    'Could not install requirement %s because of HTTP error %s for URL %s'
+                    % (req, e, req.download_link))
+            finally:
+                logger.indent -= 2
+            req.download_link = None
+
+    def _is_installed(self, req):
+        if req.req is None:
+            # not known until it's unpacked
+            return False
+        try:
+            pkg_resources.get_distribution(req.req)
+        except (pkg_resources.DistributionNotFound,
+                pkg_resources.VersionConflict):
+            return False
+        return True
+
+    def _find_requirement(self, finder, req):
+        """finder.find_requirement(), reusing the result found while
+        prefetching unless dependency links have been added since."""
+        found = self._found_links.pop(req, None)
+        if found is None or found[2] != len(finder.dependency_links):
+            return finder.find_requirement(req, upgrade=self.upgrade)
+        link, error, num_dependency_links = found
+        if error is not None:
+            raise error
+        return link
+
     def cleanup_files(self, bundle=False):
         """Clean up files, remove builds."""
         logger.notify('Cleaning up...')
@@ -1182,6 +1469,10 @@ class RequirementSet(object):
         if bundle:
             remove_dir.append(self.src_dir)
 
+        if self._temp_download_cache is not None:
+            remove_dir.append(self._temp_download_cache.cache_dir)
+            self._temp_download_cache = None
+
         for dir in remove_dir:
             if os.path.exists(dir):
                 logger.info('Removing temporary dir %s...' % dir)
@@ -1201,6 +1492,111 @@ class RequirementSet(object):
         call_subprocess(["python", "%s/setup.py" % dest, "clean"], cwd=dest,
                         command_desc='python setup.py clean')
 
+    def get_download_cache(self):
+        """The DownloadCache for the download cache directory, if any."""
+        if not self.download_cache:
+            return None
+        if self._download_cache is None:
+            self.download_cache = os.path.expanduser(self.download_cache)
+            max_size = None
+            if self.download_cache_size:
+                max_size = self.download_cache_size * 1000 * 1000
+            self._download_cache = DownloadCache(self.download_cache, max_size)
+        return self._download_cache
+
+    def get_wheel_cache(self):
+        """The WheelCache in the download cache, if wheels are cached."""
+        cache = self.get_download_cache()
+        if not self.wheel_cache or self.is_download or cache is None:
+            return None
+        return WheelCache(os.path.join(cache.cache_dir, 'wheels'))
+
+    def get_egg_info_cache(self):
+        """The EggInfoCache in the download cache, if any."""
+        cache = self.get_download_cache()
+        if cache is None:
+            return None
+        return EggInfoCache(os.path.join(cache.cache_dir, 'egg-info'))
+
+    def run_egg_info(self, req, link):
+        """
+        req.run_egg_info(), or reuse the metadata found by it for the same
+        archive before.
+        """
+        if req.source_dir in self._packaged_egg_info:
+            logger.notify('Using egg_info packaged with %s' % (req.name or req.url))
+            req._egg_info_ready()
+            return
+        cache = self.get_egg_info_cache()
+        digest = None
+        if cache is not None and link:
+            digest = self._archive_digest(link)
+        if digest is not None:
+            cached = cache.get(digest)
+            if cached is not None:
+                req.restore_egg_info(cached)
+                return
+        req.run_egg_info()
+        if digest is not None:
+            cache.store(digest, os.path.dirname(req.egg_info_path('PKG-INFO')))
+
+    def _wheel_cache_digest(self, link):
+        """
+        Return the sha256 of the sdist at link if it is in the download
+        cache and a wheel built from it can be cached, or None.
+        """
+        if self.get_wheel_cache() is None:
+            return None
+        return self._archive_digest(link)
+
+    def _archive_digest(self, link):
+        """
+        Return the sha256 of the sdist at link if it is in the download
+        cache and matches the hash given by link, or None.
+        """
+        if (self.get_download_cache() is None or is_vcs_url(link)
+            or link.splitext()[1] in (wheel_ext, '.pybundle')):
+            return None
+        cached = self.get_download_cache().get(link.url.split('#', 1)[0])
+        if cached is None:
+            return None
+        if link.hash and link.hash_name:
+            if (cached.get('hashes') or {}).get(link.hash_name) != link.hash:
+                return None
+        return cached['digest']
+
+    def get_cached_wheel(self, link):
+        """Return the path of a wheel built from the sdist at link, or None."""
+        digest = self._wheel_cache_digest(link)
+        if digest is None:
+            return None
+        return self.get_wheel_cache().get(digest)
+
+    def build_cached_wheel(self, req):
+        """
+        Build a wheel of req into the wheel cache, and have req installed
+        from it.  If it can't be built, req is installed from source.
+        """
+        if not bdist_wheel_support():
+            return
+        wheel_dir = tempfile.mkdtemp('-wheel', 'pip-')
+        try:
+            builder = WheelBuilder(self, None, wheel_dir)
+            if not builder.build_one(req):
+                logger.notify('Installing %s from source instead' % req.name)
+                return
+            built = [name for name in os.listdir(wheel_dir)
+                     if name.endswith(wheel_ext)]
+            if len(built) != 1 or not Wheel(built[0]).supported():
+                return
+            path = self.get_wheel_cache().store(
+                req.wheel_cache_digest, os.path.join(wheel_dir, built[0]))
+        finally:
+            rmtree(wheel_dir)
+        logger.info('Stored wheel in cache at %s' % display_path(path))
+        keep_wheel_file(path, req.source_dir, built[0])
+        req.url = path_to_url(path)
+
     def unpack_url(self, link, location, only_download=False):
         if only_download:
             loc = self.download_dir
@@ -1210,15 +1606,54 @@ class RequirementSet(object):
             return unpack_vcs_link(link, loc, only_download)
         # a local file:// index could have links with hashes
         elif not link.hash and is_file_url(link):
-            return unpack_file_url(link, loc)
+            return unpack_file_url(link, loc, self._unpack_archive)
         else:
-            if self.download_cache:
-                self.download_cache = os.path.expanduser(self.download_cache)
-            retval = unpack_http_url(link, location, self.download_cache, self.download_dir)
+            cache = self.get_download_cache()
+            if (cache is None and self._temp_download_cache is not None
+                and self._temp_download_cache.get(link.url.split('#', 1)[0])):
+                cache = self._temp_download_cache
+            unpack = self._unpack_archive
+            if only_download:
+                unpack = self._unpack_for_download
+            retval = unpack_http_url(link, location, cache, self.download_dir, unpack)
             if only_download:
                 write_delete_marker_file(location)
             return retval
 
+    def _unpack_archive(self, filename, location, content_type, link,
+                        format=None):
+        """
+        unpack_file() for requirements: wheels are installed straight from
+        the archive, so they are kept as is rather than unzipped.
+        """
+        if link.splitext()[1] == wheel_ext:
+            keep_wheel_file(filename, location, link.filename)
+        else:
+            unpack_file(filename, location, content_type, link, format)
+
+    def _unpack_for_download(self, filename, location, content_type, link,
+                             format=None):
+        """
+        _unpack_archive() for downloads, which are not built: if the sdist
+        has packaged egg-info that can be trusted, extract just that.
+        """
+        packaged = None
+        if link.splitext()[1] not in (wheel_ext, '.pybundle'):
+            packaged = read_packaged_egg_info(filename, EggInfoCache.files)
+        if packaged is None:
+            self._unpack_archive(filename, location, content_type, link, format)
+            return
+        name, files = packaged
+        egg_info_dir = os.path.join(location, 'pip-egg-info', name)
+        os.makedirs(egg_info_dir)
+        for filename, data in files.items():
+            fp = open(os.path.join(egg_info_dir, filename), 'wb')
+            try:
+                fp.write(data)
+            finally:
+                fp.close()
+        self._packaged_egg_info.add(location)
+
     def install(self, install_options, global_options=(), *args, **kwargs):
         """Install everything in this set (after having downloaded and unpacked the packages)"""
         to_install = [r for r in self.requirements.values()
@@ -1227,8 +1662,12 @@ class RequirementSet(object):
         if to_install:
             logger.notify('Installing collected packages: %s' % ', '.join([req.name for req in to_install]))
         logger.indent += 2
+        compiler = ByteCompiler()
         try:
+            self._download_deferred_wheels(to_install)
             for requirement in to_install:
+                if requirement.wheel_cache_digest and not requirement.is_wheel:
+                    self.build_cached_wheel(requirement)
                 if requirement.conflicts_with:
                     logger.notify('Found existing installation: %s'
                                   % requirement.conflicts_with)
@@ -1238,7 +1677,8 @@ class RequirementSet(object):
                     finally:
                         logger.indent -= 2
                 try:
-                    requirement.install(install_options, global_options, *args, **kwargs)
+                    requirement.install(install_options, global_options,
+                                        compiler=compiler, *args, **kwargs)
                 except:
                     # if install did not succeed, rollback previous uninstall
                     if requirement.conflicts_with and not requirement.install_succeeded:
@@ -1249,6 +1689,7 @@ class RequirementSet(object):
                         requirement.commit_uninstall()
                 requirement.remove_temporary_source()
         finally:
+            compiler.close()
             logger.indent -= 2
         self.successfully_installed = to_install
 
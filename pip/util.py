@@ -1,5 +1,6 @@
 import sys
 import shutil
+import tempfile
 import os
 import stat
 import re
@@ -8,13 +9,17 @@ import pkg_resources
 import zipfile
 import tarfile
 import subprocess
+import py_compile
 import textwrap
+from email.parser import Parser
+
 from pip.exceptions import InstallationError, BadCommand, PipError
 from pip.backwardcompat import(WindowsError, string_types, raw_input,
-                                console_to_str, user_site, PermissionError)
-from pip.locations import site_packages, running_under_virtualenv, virtualenv_no_global
+                                console_to_str, user_site, PermissionError, b,
+                                cache_from_source)
+from pip.locations import (site_packages, running_under_virtualenv,
+                           virtualenv_no_global)
 from pip.log import logger
-from pip.vendor.distlib import version
 
 __all__ = ['rmtree', 'display_path', 'backup_dir',
            'find_command', 'ask', 'Inf',
@@ -24,8 +29,11 @@ __all__ = ['rmtree', 'display_path', 'backup_dir',
            'split_leading_dir', 'has_leading_dir',
            'make_path_relative', 'normalize_path',
            'renames', 'get_terminal_size', 'get_prog',
-           'unzip_file', 'untar_file', 'create_download_cache_folder',
-           'cache_download', 'unpack_file', 'call_subprocess']
+           'unzip_file', 'untar_file', 'keep_wheel_file', 'archive_format',
+           'read_packaged_egg_info', 'InstalledDistributions',
+           'installed_distributions', 'forget_installed_distributions',
+           'create_download_cache_folder',
+           'write_atomic', 'unpack_file', 'call_subprocess', 'ByteCompiler']
 
 
 def get_prog():
@@ -366,27 +374,91 @@ def get_installed_distributions(local_only=True,
     If ``editables_only`` is True , only report editables.
 
     """
-    if local_only:
-        local_test = dist_is_local
-    else:
-        local_test = lambda d: True
+    return installed_distributions().select(local_only, skip,
+                                            include_editables, editables_only)
 
-    if include_editables:
-        editable_test = lambda d: True
-    else:
-        editable_test = lambda d: not dist_is_editable(d)
 
-    if editables_only:
-        editables_only_test = lambda d: dist_is_editable(d)
-    else:
-        editables_only_test = lambda d: True
+class InstalledDistributions(object):
+    """
+    A snapshot of the installed distributions, indexed by their lower-case
+    project names, which checks whether a distribution is local, editable
+    or in the user site at most once.
 
-    return [d for d in pkg_resources.working_set
-            if local_test(d)
-            and d.key not in skip
-            and editable_test(d)
-            and editables_only_test(d)
-            ]
+    The snapshot of pkg_resources.working_set is shared by everything in
+    the process, see installed_distributions().
+    """
+
+    def __init__(self, dists=None):
+        if dists is None:
+            dists = pkg_resources.working_set
+        self.working_set = dists
+        self.dists = list(dists)
+        self._by_key = {}
+        for dist in self.dists:
+            # the first one on sys.path is the one that's imported
+            self._by_key.setdefault(dist.key, dist)
+        self._local = {}
+        self._editable = {}
+        self._user = {}
+
+    def get(self, name):
+        """Return the installed distribution of project name, or None."""
+        return self._by_key.get(pkg_resources.safe_name(name).lower())
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def keys(self):
+        return [dist.key for dist in self.dists]
+
+    def is_local(self, dist):
+        if dist not in self._local:
+            self._local[dist] = dist_is_local(dist)
+        return self._local[dist]
+
+    def is_editable(self, dist):
+        if dist not in self._editable:
+            self._editable[dist] = dist_is_editable(dist)
+        return self._editable[dist]
+
+    def in_usersite(self, dist):
+        if dist not in self._user:
+            self._user[dist] = dist_in_usersite(dist)
+        return self._user[dist]
+
+    def select(self, local_only=True, skip=('setuptools', 'pip', 'python'),
+               include_editables=True, editables_only=False):
+        """The distributions get_installed_distributions() returns."""
+        return [d for d in self.dists
+                if (not local_only or self.is_local(d))
+                and d.key not in skip
+                and (include_editables or not self.is_editable(d))
+                and (not editables_only or self.is_editable(d))
+                ]
+
+
+_installed_distributions = None
+
+
+def installed_distributions():
+    """
+    Return the InstalledDistributions of pkg_resources.working_set,
+    which is only made once per process.
+    """
+    global _installed_distributions
+    if (_installed_distributions is None
+        or _installed_distributions.working_set is not pkg_resources.working_set):
+        _installed_distributions = InstalledDistributions()
+    return _installed_distributions
+
+
+def forget_installed_distributions():
+    """
+    Drop the snapshot installed_distributions() returns, once something
+    is installed or uninstalled; the next call makes a new one.
+    """
+    global _installed_distributions
+    _installed_distributions = None
 
 
 def egg_link_path(dist):
@@ -467,48 +539,60 @@ def get_terminal_size():
     return int(cr[1]), int(cr[0])
 
 
+def _make_dirs(path, created):
+    """
+    os.makedirs(path) unless it is one of the ``created`` set of
+    directories, which it is then added to.
+    """
+    if path not in created:
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        created.add(path)
+
+
+# The size of the chunks archive members are extracted in, so that large
+# members aren't read into memory at once.
+unpack_chunk_size = 64 * 1024
+
+
 def unzip_file(filename, location, flatten=True):
     """Unzip the file (zip file located at filename) to the destination
     location"""
-    if not os.path.exists(location):
-        os.makedirs(location)
+    created = set()
+    _make_dirs(location, created)
     zipfp = open(filename, 'rb')
     try:
         zip = zipfile.ZipFile(zipfp)
         leading = has_leading_dir(zip.namelist()) and flatten
         for info in zip.infolist():
             name = info.filename
-            data = zip.read(name)
             fn = name
             if leading:
                 fn = split_leading_dir(name)[1]
             fn = os.path.join(location, fn)
-            dir = os.path.dirname(fn)
-            if not os.path.exists(dir):
-                os.makedirs(dir)
             if fn.endswith('/') or fn.endswith('\\'):
                 # A directory
-                if not os.path.exists(fn):
-                    os.makedirs(fn)
-            else:
+                _make_dirs(fn.rstrip('/\\'), created)
+                continue
+            _make_dirs(os.path.dirname(fn), created)
+            src = zip.open(info)
+            try:
                 fp = open(fn, 'wb')
                 try:
-                    fp.write(data)
+                    shutil.copyfileobj(src, fp, unpack_chunk_size)
                 finally:
                     fp.close()
-                    unix_attributes = info.external_attr >> 16
-                    if unix_attributes:
-                        os.chmod(fn, unix_attributes)
-
-
+            finally:
+                src.close()
+            unix_attributes = info.external_attr >> 16
+            if unix_attributes:
+                os.chmod(fn, unix_attributes)
     finally:
         zipfp.close()
 
 
 def untar_file(filename, location):
     """Untar the file (tar file located at filename) to the destination location"""
-    if not os.path.exists(location):
-        os.makedirs(location)
     if filename.lower().endswith('.gz') or filename.lower().endswith('.tgz'):
         mode = 'r:gz'
     elif filename.lower().endswith('.bz2') or filename.lower().endswith('.tbz'):
@@ -516,25 +600,40 @@ def untar_file(filename, location):
     elif filename.lower().endswith('.tar'):
         mode = 'r'
     else:
-        logger.warn('Cannot determine compression type for file %s' % filename)
-        mode = 'r:*'
+        mode = {'gzip': 'r:gz', 'bzip2': 'r:bz2',
+                'tar': 'r'}.get(archive_format(filename))
+        if mode is None:
+            logger.warn('Cannot determine compression type for file %s' % filename)
+            mode = 'r:*'
+    created = set()
+    _make_dirs(location, created)
     tar = tarfile.open(filename, mode)
     try:
+        # The members are extracted as they are read, and without the
+        # leading directory of the first one, as long as all of them are
+        # in it.
+        leading = None
+        top_names = set()
         # note: python<=2.5 doesnt seem to know about pax headers, filter them
-        leading = has_leading_dir([
-            member.name for member in tar.getmembers()
-            if member.name != 'pax_global_header'
-        ])
-        for member in tar.getmembers():
+        for member in tar:
             fn = member.name
             if fn == 'pax_global_header':
                 continue
+            prefix, rest = split_leading_dir(fn)
+            if leading is None:
+                leading = prefix and (rest or member.isdir()) and prefix
+            top_name = None
             if leading:
-                fn = split_leading_dir(fn)[1]
+                if prefix == leading and (rest or member.isdir()):
+                    fn = rest
+                    top_name = split_leading_dir(rest)[0]
+                else:
+                    _restore_leading_dir(location, leading, top_names)
+                    created = set([location])
+                    leading = False
             path = os.path.join(location, fn)
             if member.isdir():
-                if not os.path.exists(path):
-                    os.makedirs(path)
+                _make_dirs(path.rstrip('/\\'), created)
             elif member.issym():
                 try:
                     tar._extract_member(member, path)
@@ -557,18 +656,33 @@ def untar_file(filename, location):
                         'In the tar file %s the member %s is invalid: %s'
                         % (filename, member.name, e))
                     continue
-                if not os.path.exists(os.path.dirname(path)):
-                    os.makedirs(os.path.dirname(path))
+                _make_dirs(os.path.dirname(path), created)
                 destfp = open(path, 'wb')
                 try:
-                    shutil.copyfileobj(fp, destfp)
+                    shutil.copyfileobj(fp, destfp, unpack_chunk_size)
                 finally:
                     destfp.close()
                 fp.close()
+            if top_name:
+                # only once it is on disk, invalid members are skipped
+                top_names.add(top_name)
     finally:
         tar.close()
 
 
+def _restore_leading_dir(location, leading, names):
+    """
+    Move the ``names`` extracted to ``location`` back into their
+    ``leading`` directory, once a member outside of it shows up.
+    """
+    temp_dir = tempfile.mkdtemp(dir=location)
+    for name in names:
+        if name:
+            os.rename(os.path.join(location, name),
+                      os.path.join(temp_dir, name))
+    os.rename(temp_dir, os.path.join(location, leading))
+
+
 def create_download_cache_folder(folder):
     logger.indent -= 2
     logger.notify('Creating supposed download cache at %s' % folder)
@@ -576,23 +690,189 @@ def create_download_cache_folder(folder):
     os.makedirs(folder)
 
 
-def cache_download(target_file, temp_location, content_type):
-    logger.notify('Storing download in cache at %s' % display_path(target_file))
-    shutil.copyfile(temp_location, target_file)
-    fp = open(target_file+'.content-type', 'w')
-    fp.write(content_type)
-    fp.close()
+def write_atomic(path, data, mode='wb'):
+    """Write ``data`` to ``path`` so that concurrent readers never see a
+    partially written file."""
+    fd, temp_path = tempfile.mkstemp('.tmp', '', os.path.dirname(path))
+    fp = os.fdopen(fd, mode)
+    try:
+        fp.write(data)
+    finally:
+        fp.close()
+    replace_file(temp_path, path)
+
+
+def replace_file(src, dst):
+    """Rename ``src`` to ``dst``, replacing ``dst`` if it exists."""
+    if os.path.exists(dst):
+        # os.rename() doesn't overwrite on Windows
+        try:
+            os.remove(dst)
+        except OSError:
+            pass
+    os.rename(src, dst)
+
 
+# setup.py scripts that pick their requirements depending on these don't
+# have them right in the egg-info packaged on the author's machine
+_setup_py_conditions_re = re.compile(b(
+    r'sys\.version|sys\.platform|platform\.|os\.name|python_version'))
+_setup_py_requires_re = re.compile(b(r'install_requires|extras_require'))
 
-def unpack_file(filename, location, content_type, link):
+
+def read_packaged_egg_info(filename, names=('PKG-INFO', 'requires.txt',
+                                            'dependency_links.txt')):
+    """
+    Read the egg-info metadata packaged in the sdist at filename, along
+    with its setup.py, without extracting anything else.
+
+    Returns (name of the .egg-info directory, {file name: contents}) for
+    the given file names, or None if the sdist has no egg-info that can be
+    trusted to be what setup.py egg_info would write here.
+    """
+    members = {}
+
+    def wanted(path):
+        parts = path.split('/')
+        if len(parts) == 2:
+            return parts[1] == 'setup.py'
+        # <project>/<name>.egg-info/ or <project>/<src dir>/<name>.egg-info/
+        return (len(parts) in (3, 4) and parts[-2].endswith('.egg-info')
+                and parts[-1] in names)
+
+    try:
+        format = archive_format(filename)
+        if format == 'zip':
+            zip = zipfile.ZipFile(filename)
+            try:
+                for name in zip.namelist():
+                    if wanted(name):
+                        members[name] = zip.read(name)
+            finally:
+                zip.close()
+        elif format in ('gzip', 'bzip2', 'tar'):
+            tar = tarfile.open(filename)
+            try:
+                for member in tar:
+                    name = member.name
+                    if name.startswith('./'):
+                        name = name[2:]
+                    if member.isfile() and wanted(name):
+                        fp = tar.extractfile(member)
+                        try:
+                            members[name] = fp.read()
+                        finally:
+                            fp.close()
+            finally:
+                tar.close()
+        else:
+            return None
+    except (IOError, OSError, EOFError, zipfile.BadZipfile, tarfile.TarError):
+        return None
+
+    setup_pys = [path for path in members if path.count('/') == 1]
+    if len(setup_pys) != 1:
+        return None
+    top = setup_pys[0].split('/')[0]
+    egg_info_dirs = set(path.rsplit('/', 1)[0] for path in members
+                        if path.count('/') > 1 and path.startswith(top + '/'))
+    if len(egg_info_dirs) != 1:
+        return None
+    egg_info_dir = egg_info_dirs.pop()
+    files = dict((path.rsplit('/', 1)[1], members[path]) for path in members
+                 if path.rsplit('/', 1)[0] == egg_info_dir)
+    if 'PKG-INFO' not in files:
+        return None
+
+    pkg_info = files['PKG-INFO']
+    if not isinstance(pkg_info, str):
+        pkg_info = pkg_info.decode('utf-8', 'replace')
+    pkg_info = Parser().parsestr(pkg_info)
+    if not pkg_info.get('Name') or not pkg_info.get('Version'):
+        return None
+    # it has to be the egg-info of this very release, not a stale one
+    normalize = lambda s: re.sub(r'[-_.]+', '-', s).lower()
+    if normalize(top) != normalize('%s-%s' % (pkg_info['Name'], pkg_info['Version'])):
+        return None
+    setup_py = members[setup_pys[0]]
+    if 'requires.txt' not in files and _setup_py_requires_re.search(setup_py):
+        return None
+    if _setup_py_conditions_re.search(setup_py):
+        return None
+    return egg_info_dir.rsplit('/', 1)[-1], files
+
+
+def keep_wheel_file(filename, location, name):
+    """
+    Put the wheel archive at filename into location as name, without
+    unpacking it: wheels are installed straight from the archive.
+    """
+    if not os.path.exists(location):
+        os.makedirs(location)
+    dest = os.path.join(location, name)
+    try:
+        os.link(filename, dest)
+    except (AttributeError, OSError):
+        # no hard links on this platform or across filesystems
+        shutil.copyfile(filename, dest)
+
+
+# The first bytes of the compressed and zip archives
+_archive_magic = [
+    ('zip', bytearray([0x50, 0x4b, 0x03, 0x04])),
+    # an empty zip file
+    ('zip', bytearray([0x50, 0x4b, 0x05, 0x06])),
+    ('gzip', bytearray([0x1f, 0x8b])),
+    ('bzip2', bytearray([0x42, 0x5a, 0x68])),
+]
+
+
+def archive_format(filename):
+    """
+    Return the format of the archive at filename according to its first
+    bytes: 'zip', 'gzip', 'bzip2' or 'tar', or None if it is none of them.
+    """
+    fp = open(filename, 'rb')
+    try:
+        head = bytearray(fp.read(512))
+    finally:
+        fp.close()
+    for format, magic in _archive_magic:
+        if head[:len(magic)] == magic:
+            return format
+    if head[257:262] == bytearray(b('ustar')):
+        return 'tar'
+    if len(head) == 512 and _is_tar_header(head):
+        return 'tar'
+    return None
+
+
+def _is_tar_header(head):
+    # pre-POSIX tar headers have no magic, only a checksum of themselves
+    # computed with the checksum field as spaces
+    field = bytes(head[148:156]).replace(b('\0'), b('')).strip()
+    try:
+        checksum = int(field, 8)
+    except ValueError:
+        return False
+    return checksum == sum(head[:148]) + 8 * 32 + sum(head[156:])
+
+
+def unpack_file(filename, location, content_type, link, format=None):
+    """
+    Unpack the archive at filename into location.  ``format`` is what
+    archive_format() returns for it, found out here if not given.
+    """
     filename = os.path.realpath(filename)
+    if format is None:
+        format = archive_format(filename)
     if (content_type == 'application/zip'
         or filename.endswith('.zip')
         or filename.endswith('.pybundle')
-        or zipfile.is_zipfile(filename)):
+        or format == 'zip'):
         unzip_file(filename, location, flatten=not filename.endswith('.pybundle'))
     elif (content_type == 'application/x-gzip'
-          or tarfile.is_tarfile(filename)
+          or format in ('gzip', 'bzip2', 'tar')
           or splitext(filename)[1].lower() in ('.tar', '.tar.gz', '.tar.bz2', '.tgz', '.tbz')):
         untar_file(filename, location)
     elif (content_type and content_type.startswith('text/html')
@@ -602,12 +882,93 @@ def unpack_file(filename, location, content_type, link):
         Subversion('svn+' + link.url).unpack(location)
     else:
         ## FIXME: handle?
-        ## FIXME: magic signatures?
         logger.fatal('Cannot unpack file %s (downloaded from %s, content-type: %s); cannot detect archive format'
                      % (filename, location, content_type))
         raise InstallationError('Cannot determine archive format of %s' % location)
 
 
+def _compile_module(args):
+    """
+    Byte-compile the module at path, as found at dfile once installed.
+    Return (path of the .pyc file or None, error message or None).
+    """
+    path, dfile = args
+    cfile = cache_from_source(path)
+    try:
+        py_compile.compile(path, cfile, dfile, doraise=True)
+    except (py_compile.PyCompileError, IOError, OSError):
+        return None, str(sys.exc_info()[1])
+    return cfile, None
+
+
+class ByteCompiler(object):
+    """
+    Byte-compiles the modules installed by pip, across a pool of up to
+    ``processes`` processes (one per CPU by default) which is started when
+    there is more than one module to compile.
+    """
+
+    def __init__(self, processes=None):
+        if processes is None:
+            try:
+                import multiprocessing
+                processes = multiprocessing.cpu_count()
+            except (ImportError, NotImplementedError):
+                processes = 1
+        self.processes = processes
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = False
+            try:
+                import multiprocessing
+                self._pool = multiprocessing.Pool(self.processes)
+            except (ImportError, OSError, NotImplementedError):
+                # no working semaphores on this platform
+                e = sys.exc_info()[1]
+                logger.info('Byte-compiling in this process: %s' % e)
+        return self._pool
+
+    def available(self):
+        """
+        Whether modules can be compiled here: False if the pool can't be
+        started on this platform, which is tried if it's needed.
+        """
+        return self.processes <= 1 or bool(self._get_pool())
+
+    def compile(self, paths, dfiles=None):
+        """
+        Byte-compile the .py files among paths, which are installed as the
+        dfiles paths if given (when installing with --root), and return the
+        paths of the .pyc files written.
+        """
+        if dfiles is None:
+            dfiles = paths
+        modules = [(path, dfile) for path, dfile in zip(paths, dfiles)
+                   if path.endswith('.py')]
+        pool = None
+        if len(modules) > 1 and self.processes > 1:
+            pool = self._get_pool()
+        if pool:
+            results = pool.map(_compile_module, modules)
+        else:
+            results = [_compile_module(module) for module in modules]
+        compiled = []
+        for (path, dfile), (cfile, error) in zip(modules, results):
+            if cfile is None:
+                logger.info('Could not byte-compile %s: %s' % (path, error))
+            else:
+                compiled.append(cfile)
+        return compiled
+
+    def close(self):
+        if self._pool:
+            self._pool.close()
+            self._pool.join()
+        self._pool = None
+
+
 def call_subprocess(cmd, show_stdout=True,
                     filter_stdout=None, cwd=None,
                     raise_on_returncode=True,
@@ -682,6 +1043,8 @@ def is_prerelease(vers):
     Will return True if it is a pre-release and False if not. Versions are
     assumed to be a pre-release if they cannot be parsed.
     """
+    # not imported at the top, it isn't needed by most pip runs
+    from pip.vendor.distlib import version
     normalized = version.suggest_normalized_version(vers)
 
     if normalized is None:
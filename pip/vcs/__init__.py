@@ -15,6 +15,11 @@ __all__ = ['vcs', 'get_src_requirement']
 class VcsSupport(object):
     _registry = {}
     schemes = ['ssh', 'git', 'hg', 'bzr', 'sftp', 'svn']
+    # The modules of the backends that come with pip, which register
+    # them when imported.  They're only imported once a backend is needed.
+    builtin_backends = ['pip.vcs.bazaar', 'pip.vcs.git',
+                        'pip.vcs.mercurial', 'pip.vcs.subversion']
+    _builtins_loaded = False
 
     def __init__(self):
         # Register more schemes with urlparse for various version control systems
@@ -24,11 +29,20 @@ class VcsSupport(object):
             urlparse.uses_fragment.extend(self.schemes)
         super(VcsSupport, self).__init__()
 
+    def _load_builtins(self):
+        if VcsSupport._builtins_loaded:
+            return
+        VcsSupport._builtins_loaded = True
+        for module_name in self.builtin_backends:
+            __import__(module_name)
+
     def __iter__(self):
+        self._load_builtins()
         return self._registry.__iter__()
 
     @property
     def backends(self):
+        self._load_builtins()
         return list(self._registry.values())
 
     @property
@@ -50,6 +64,7 @@ class VcsSupport(object):
             self._registry[cls.name] = cls
 
     def unregister(self, cls=None, name=None):
+        self._load_builtins()
         if name in self._registry:
             del self._registry[name]
         elif cls in self._registry.values():
@@ -62,6 +77,7 @@ class VcsSupport(object):
         Return the name of the version control backend if found at given
         location, e.g. vcs.get_backend_name('/path/to/vcs/checkout')
         """
+        self._load_builtins()
         for vc_type in self._registry.values():
             path = os.path.join(location, vc_type.dirname)
             if os.path.exists(path):
@@ -69,6 +85,7 @@ class VcsSupport(object):
         return None
 
     def get_backend(self, name):
+        self._load_builtins()
         name = name.lower()
         if name in self._registry:
             return self._registry[name]
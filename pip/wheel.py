@@ -1,7 +1,7 @@
 """
 Support for installing and building the "wheel" binary package format.
 """
-from __future__ import with_statement
+from __future__ import absolute_import, with_statement
 
 import csv
 import functools
@@ -10,13 +10,23 @@ import os
 import pkg_resources
 import re
 import shutil
+import subprocess
 import sys
+import zipfile
 from base64 import urlsafe_b64encode
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
 
+from pip.backwardcompat import console_to_str
+from pip.exceptions import InstallationError
 from pip.locations import distutils_scheme
 from pip.log import logger
+from pip import pep425tags
 from pip.pep425tags import supported_tags
-from pip.util import call_subprocess, normalize_path, make_path_relative
+from pip.util import (call_subprocess, normalize_path, make_path_relative,
+                      replace_file)
 
 wheel_ext = '.whl'
 distribute_requirement = pkg_resources.Requirement.parse("distribute>=0.6.34")
@@ -37,18 +47,31 @@ def wheel_distribute_support(distribute_req=distribute_requirement):
     return supported
 
 
+def bdist_wheel_support():
+    """Return True if the wheel package's bdist_wheel can be used."""
+    try:
+        import wheel.bdist_wheel
+    except ImportError:
+        return False
+    return True
+
+
 def rehash(path, algo='sha256', blocksize=1<<20):
     """Return (hash, length) for path using hashlib.new(algo)"""
     h = hashlib.new(algo)
     length = 0
-    with open(path) as f:
+    with open(path, 'rb') as f:
         block = f.read(blocksize)
         while block:
             length += len(block)
             h.update(block)
             block = f.read(blocksize)
-    digest = 'sha256='+urlsafe_b64encode(h.digest()).decode('latin1').rstrip('=')
-    return (digest, length)
+    return (record_digest(h), length)
+
+
+def record_digest(h):
+    """Format the digest of the hash object h for a RECORD file"""
+    return h.name + '=' + urlsafe_b64encode(h.digest()).decode('latin1').rstrip('=')
 
 try:
     unicode
@@ -93,8 +116,9 @@ def fix_script(path):
             script.close()
         return True
 
-def move_wheel_files(name, req, wheeldir, user=False, home=None):
-    """Install a wheel"""
+def move_wheel_files(name, req, wheeldir, user=False, home=None,
+                     compiler=None):
+    """Install a wheel, byte-compiling its modules with compiler if given"""
 
     scheme = distutils_scheme(name, user=user, home=home)
 
@@ -164,6 +188,12 @@ def move_wheel_files(name, req, wheeldir, user=False, home=None):
             dest = scheme[subdir]
             clobber(source, dest, False, fixer=fixer)
 
+    compiled = []
+    if compiler is not None:
+        compiled = compiler.compile(
+            [os.path.join(location, path) for path in installed.values()
+             if not path.startswith('../')])
+
     record = os.path.join(info_dir[0], 'RECORD')
     temp_record = os.path.join(info_dir[0], 'RECORD.pip')
     with open_for_csv(record, 'r') as record_in:
@@ -177,8 +207,193 @@ def move_wheel_files(name, req, wheeldir, user=False, home=None):
                 writer.writerow(row)
             for f in installed:
                 writer.writerow((installed[f], '', ''))
+            for path in compiled:
+                writer.writerow((normpath(path, location), '', ''))
     shutil.move(temp_record, record)
 
+def _wheel_info_dir(names, project_name=None):
+    """
+    Return the name of the .dist-info directory among the archive member
+    names, the one of project_name if given.
+    """
+    info_dirs = set()
+    for name in names:
+        top = name.split('/', 1)[0]
+        if '/' in name and top.endswith('.dist-info'):
+            if (project_name is None
+                # is self.req.project_name case preserving?
+                or top.lower().startswith(project_name.replace('-', '_').lower())):
+                info_dirs.add(top)
+    if len(info_dirs) != 1:
+        raise InstallationError('Expected one .dist-info directory, found %s'
+                                % (', '.join(sorted(info_dirs)) or 'none'))
+    return info_dirs.pop()
+
+
+class WheelMetadata(pkg_resources.EmptyProvider):
+    """
+    Metadata provider for the .dist-info directory of a wheel archive,
+    whose files have been read into memory.
+    """
+
+    def __init__(self, info_dir, files):
+        self.egg_info = info_dir
+        self.files = files
+
+    def _key(self, path):
+        return path.replace(os.path.sep, '/')
+
+    def _has(self, path):
+        return self._key(path) in self.files
+
+    def _get(self, path):
+        return self.files[self._key(path)]
+
+    def _isdir(self, path):
+        prefix = self._key(path).rstrip('/') + '/'
+        for name in self.files:
+            if name.startswith(prefix):
+                return True
+        return False
+
+    def _listdir(self, path):
+        prefix = self._key(path).rstrip('/') + '/'
+        return sorted(set(name[len(prefix):].split('/', 1)[0]
+                          for name in self.files if name.startswith(prefix)))
+
+
+def wheel_distribution(wheel, location=None, metadata_files=None):
+    """
+    Return the pkg_resources distribution of a wheel archive, reading its
+    metadata from the archive instead of unpacking it.
+
+    wheel is the path of the archive or a file object for it, in which
+    case location is the location the distribution gets.  Only the
+    .dist-info files named in metadata_files are read, if given.
+    """
+    if location is None:
+        location = wheel
+    zip = zipfile.ZipFile(wheel)
+    try:
+        names = zip.namelist()
+        info_dir = _wheel_info_dir(names)
+        files = {}
+        for name in names:
+            if not name.startswith(info_dir + '/') or name.endswith('/'):
+                continue
+            if (metadata_files is not None
+                and name[len(info_dir) + 1:] not in metadata_files):
+                continue
+            files[name] = zip.read(name)
+    finally:
+        zip.close()
+    return pkg_resources.Distribution.from_location(
+        location, info_dir, WheelMetadata(info_dir, files))
+
+
+def _extract_member(zip, info, destfile, is_script=False, blocksize=1<<20):
+    """
+    Write the archive member info to destfile, replacing #!python in
+    scripts on the way.  Return (hash, length) of what was written.
+    """
+    h = hashlib.new('sha256')
+    length = 0
+    source = zip.open(info)
+    try:
+        dest = open(destfile, 'wb')
+        try:
+            if is_script:
+                block = source.readline()
+                if block.startswith(binary('#!python')):
+                    exename = sys.executable.encode(sys.getfilesystemencoding())
+                    block = binary('#!') + exename + binary(os.linesep)
+            else:
+                block = source.read(blocksize)
+            while block:
+                length += len(block)
+                h.update(block)
+                dest.write(block)
+                block = source.read(blocksize)
+        finally:
+            dest.close()
+    finally:
+        source.close()
+    unix_attributes = info.external_attr >> 16
+    if unix_attributes:
+        os.chmod(destfile, unix_attributes)
+    return (record_digest(h), length)
+
+
+def install_wheel(name, req, wheel_path, user=False, home=None,
+                  compiler=None):
+    """
+    Install a wheel straight from its archive: every member is written
+    once, to its final location, and RECORD is built from the hashes
+    computed on the way.  The modules installed to site-packages are
+    byte-compiled with compiler, if given.
+    """
+
+    scheme = distutils_scheme(name, user=user, home=home)
+
+    if scheme['purelib'] != scheme['platlib']:
+        # XXX check *.dist-info/WHEEL to deal with this obscurity
+        raise NotImplemented("purelib != platlib")
+
+    location = scheme['platlib']
+    zip = zipfile.ZipFile(wheel_path)
+    try:
+        infos = zip.infolist()
+        info_dir = _wheel_info_dir([info.filename for info in infos],
+                                   req.project_name)
+        record = info_dir + '/RECORD'
+        installed = []
+        for info in infos:
+            member = info.filename
+            if member == record:
+                continue
+            parts = member.split('/')
+            is_script = False
+            if parts[0].endswith('.data'):
+                if len(parts) < 3:
+                    # the .data directory itself
+                    continue
+                dest = scheme[parts[1]]
+                is_script = parts[1] == 'scripts'
+                parts = parts[2:]
+            else:
+                dest = location
+            destfile = os.path.join(dest, *parts)
+            if member.endswith('/'):
+                if not os.path.exists(destfile):
+                    os.makedirs(destfile)
+                continue
+            destdir = os.path.dirname(destfile)
+            if not os.path.exists(destdir):
+                os.makedirs(destdir)
+            digest, length = _extract_member(zip, info, destfile, is_script)
+            installed.append((destfile, digest, length))
+    finally:
+        zip.close()
+
+    compiled = []
+    if compiler is not None:
+        compiled = compiler.compile(
+            [destfile for destfile, digest, length in installed
+             if destfile.startswith(os.path.join(location, ''))])
+
+    def normpath(path):
+        return make_path_relative(path, location).replace(os.path.sep, '/')
+
+    record = os.path.join(location, info_dir, 'RECORD')
+    with open_for_csv(record, 'w') as record_out:
+        writer = csv.writer(record_out)
+        for destfile, digest, length in installed:
+            writer.writerow((normpath(destfile), digest, length))
+        for path in compiled:
+            writer.writerow((normpath(path), '', ''))
+        writer.writerow((normpath(record), '', ''))
+
+
 def _unique(fn):
     @functools.wraps(fn)
     def unique(*args, **kw):
@@ -212,6 +427,16 @@ def uninstallation_paths(dist):
             yield path
 
 
+def _supported_tag_priorities():
+    """
+    Return the tag -> priority mapping for supported_tags, using the one
+    precomputed by pep425tags unless supported_tags has been replaced.
+    """
+    if supported_tags is pep425tags.supported_tags:
+        return pep425tags.supported_tags_priority
+    return pep425tags.get_tag_priorities(supported_tags)
+
+
 class Wheel(object):
     """A wheel file"""
 
@@ -235,6 +460,7 @@ class Wheel(object):
         # All the tag combinations from this file
         self.file_tags = set((x, y, z) for x in self.pyversions for y
                             in self.abis for z in self.plats)
+        self._support_index_min = None
 
     def support_index_min(self):
         """
@@ -242,36 +468,98 @@ class Wheel(object):
         e.g. if there are 8 supported tags, and one of the file tags is first in the
         list, then return 0.
         """
-        indexes = [supported_tags.index(c) for c in self.file_tags if c in supported_tags]
-        return min(indexes) if indexes else None
+        priorities = _supported_tag_priorities()
+        cached = self._support_index_min
+        if cached is not None and cached[0] is priorities:
+            return cached[1]
+        indexes = [priorities[c] for c in self.file_tags if c in priorities]
+        result = min(indexes) if indexes else None
+        self._support_index_min = (priorities, result)
+        return result
 
     def supported(self):
         """Is this wheel supported on this system?"""
-        return bool(set(supported_tags).intersection(self.file_tags))
+        return self.support_index_min() is not None
+
+
+class WheelCache(object):
+    """
+    Wheels built from sdists, kept in <cache_dir>/<sha256 of the sdist>/.
+    A wheel is only used by the interpreters its tags are supported by.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def _wheel_dir(self, digest):
+        return os.path.join(self.cache_dir, digest[:2], digest)
+
+    def get(self, digest):
+        """
+        Return the path of the wheel built from the sdist with this
+        digest that suits this interpreter best, or None.
+        """
+        wheel_dir = self._wheel_dir(digest)
+        try:
+            names = os.listdir(wheel_dir)
+        except OSError:
+            return None
+        best = None
+        for name in names:
+            if not Wheel.wheel_file_re.match(name) or not name.endswith(wheel_ext):
+                continue
+            index = Wheel(name).support_index_min()
+            if index is not None and (best is None or index < best[0]):
+                best = (index, name)
+        if best is None:
+            return None
+        return os.path.join(wheel_dir, best[1])
+
+    def store(self, digest, wheel_path):
+        """
+        Move the wheel at wheel_path, built from the sdist with this
+        digest, into the cache.  Returns its new path.
+        """
+        wheel_dir = self._wheel_dir(digest)
+        if not os.path.exists(wheel_dir):
+            try:
+                os.makedirs(wheel_dir)
+            except OSError:
+                if not os.path.isdir(wheel_dir):
+                    raise
+        dest = os.path.join(wheel_dir, os.path.basename(wheel_path))
+        temp = '%s.%s.tmp' % (dest, os.getpid())
+        shutil.move(wheel_path, temp)
+        replace_file(temp, dest)
+        return dest
 
 
 class WheelBuilder(object):
     """Build wheels from a RequirementSet."""
 
-    def __init__(self, requirement_set, finder, wheel_dir, build_options=[], global_options=[]):
+    def __init__(self, requirement_set, finder, wheel_dir, build_options=[], global_options=[], jobs=1):
         self.requirement_set = requirement_set
         self.finder = finder
         self.wheel_dir = normalize_path(wheel_dir)
         self.build_options = build_options
         self.global_options = global_options
+        self.jobs = jobs
 
-    def _build_one(self, req):
-        """Build one wheel."""
-
+    def _wheel_args(self, req):
         base_args = [
             sys.executable, '-c',
             "import setuptools;__file__=%r;"\
             "exec(compile(open(__file__).read().replace('\\r\\n', '\\n'), __file__, 'exec'))" % req.setup_py] + \
             list(self.global_options)
+        return base_args + ['bdist_wheel', '-d', self.wheel_dir] + self.build_options
+
+    def build_one(self, req):
+        """Build the wheel of req into wheel_dir; return whether it
+        was built."""
 
         logger.notify('Running setup.py bdist_wheel for %s' % req.name)
         logger.notify('Destination directory: %s' % self.wheel_dir)
-        wheel_args = base_args + ['bdist_wheel', '-d', self.wheel_dir] + self.build_options
+        wheel_args = self._wheel_args(req)
         try:
             call_subprocess(wheel_args, cwd=req.source_dir, show_stdout=False)
             return True
@@ -279,6 +567,100 @@ class WheelBuilder(object):
             logger.error('Failed building wheel for %s' % req.name)
             return False
 
+    def _build_captured(self, req):
+        """
+        Build one wheel, keeping the output of setup.py to itself.
+        Return (success, output).
+        """
+        try:
+            proc = subprocess.Popen(
+                self._wheel_args(req), stdin=None, stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT, cwd=req.source_dir)
+            output = console_to_str(proc.communicate()[0])
+        except (OSError, ValueError):
+            e = sys.exc_info()[1]
+            return False, 'Error %s while running setup.py bdist_wheel' % e
+        return proc.returncode == 0, output
+
+    def _dependencies(self, reqs):
+        """
+        Map each requirement to the ones among reqs it depends on, i.e.
+        the ones it brought in, which are built first.
+        """
+        deps = dict((req, set()) for req in reqs)
+        for req in reqs:
+            parent = req.comes_from
+            if parent in deps and parent is not req:
+                deps[parent].add(req)
+        return deps
+
+    def _build_parallel(self, reqs):
+        """
+        Build the wheels for reqs with up to self.jobs setup.py processes
+        at a time, once the requirements they depend on are built.
+        Return the set of requirements that built successfully.
+        """
+        deps = self._dependencies(reqs)
+        pending = list(reqs)
+        done = set()
+        succeeded = set()
+        running = [0]
+        condition = threading.Condition()
+
+        def next_req():
+            while pending:
+                for req in pending:
+                    if not deps[req] - done:
+                        break
+                else:
+                    if running[0]:
+                        condition.wait()
+                        continue
+                    # circular dependencies; just go in order
+                    req = pending[0]
+                pending.remove(req)
+                running[0] += 1
+                return req
+            return None
+
+        def worker():
+            while True:
+                condition.acquire()
+                try:
+                    req = next_req()
+                    if req is None:
+                        return
+                    logger.notify('Running setup.py bdist_wheel for %s' % req.name)
+                finally:
+                    condition.release()
+                success, output = self._build_captured(req)
+                condition.acquire()
+                try:
+                    running[0] -= 1
+                    done.add(req)
+                    if success:
+                        succeeded.add(req)
+                        logger.info('Output of setup.py bdist_wheel for %s:\n%s'
+                                    % (req.name, output.rstrip()))
+                    else:
+                        logger.error('Failed building wheel for %s' % req.name)
+                        logger.notify('Complete output of setup.py bdist_wheel for %s:' % req.name)
+                        logger.notify(output.rstrip() + '\n----------------------------------------')
+                    condition.notifyAll()
+                finally:
+                    condition.release()
+
+        logger.notify('Destination directory: %s' % self.wheel_dir)
+        threads = []
+        for i in range(min(self.jobs, len(reqs))):
+            thread = threading.Thread(target=worker)
+            thread.setDaemon(True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        return succeeded
+
     def build(self):
         """Build wheels."""
 
@@ -295,14 +677,25 @@ class WheelBuilder(object):
         logger.notify('Building wheels for collected packages: %s' % ', '.join([req.name for req in reqset]))
         logger.indent += 2
         build_success, build_failure = [], []
+        to_build = []
         for req in reqset:
             if req.is_wheel:
                 logger.notify("Skipping existing wheel: %s", req.url)
                 continue
-            if self._build_one(req):
-                build_success.append(req)
-            else:
-                build_failure.append(req)
+            to_build.append(req)
+        if self.jobs > 1 and len(to_build) > 1:
+            succeeded = self._build_parallel(to_build)
+            for req in to_build:
+                if req in succeeded:
+                    build_success.append(req)
+                else:
+                    build_failure.append(req)
+        else:
+            for req in to_build:
+                if self.build_one(req):
+                    build_success.append(req)
+                else:
+                    build_failure.append(req)
         logger.indent -= 2
 
         #notify sucess/failure
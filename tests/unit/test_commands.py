@@ -0,0 +1,31 @@
+import sys
+
+from pip.commands import commands, get_summaries
+
+
+def test_registry_names_match_command_classes():
+    for name, command_class in commands.items():
+        assert command_class.name == name
+
+
+def test_get_summaries_come_from_command_classes():
+    summaries = dict(get_summaries(ignore_hidden=False))
+    for name, command_class in commands.items():
+        assert summaries[name] == command_class.summary
+    assert 'completion' not in dict(get_summaries())
+
+
+def test_parseopts_imports_only_the_command_run():
+    from pip import parseopts
+    saved = dict(sys.modules)
+    commands._classes.clear()
+    try:
+        sys.modules.pop('pip.commands.zip', None)
+        sys.modules.pop('pip.commands.unzip', None)
+        command, options, args, parser = parseopts(['freeze'])
+        assert command == 'freeze'
+        assert 'pip.commands.unzip' not in sys.modules
+        assert 'unzip' in parser.format_help()
+        assert 'pip.commands.unzip' in sys.modules
+    finally:
+        sys.modules.update(saved)
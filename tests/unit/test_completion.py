@@ -0,0 +1,43 @@
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from mock import patch
+import pip
+
+
+class Tests_completion_data:
+    """test pip.completion_data"""
+
+    def setup(self):
+        self.tempdir = mkdtemp()
+        self.path = os.path.join(self.tempdir, 'completion', 'data.json')
+        self.patcher = patch('pip._completion_data_path',
+                             lambda: self.path)
+        self.patcher.start()
+
+    def teardown(self):
+        self.patcher.stop()
+        rmtree(self.tempdir)
+
+    def test_kept_between_runs(self):
+        data = pip.completion_data()
+        assert 'install' in data['commands']
+        assert 'completion' not in data['commands']
+        assert ['--version', None] in data['main_options']
+        assert ['--user', None] in data['command_options']['install']
+        assert ['--requirement', 1] in data['command_options']['install']
+        with patch('pip._make_completion_options') as make_options:
+            with patch('pip.util.get_installed_distributions') as installed:
+                assert pip.completion_data() == data
+        assert not make_options.called
+        assert not installed.called
+
+    def test_installed_refreshed_when_sys_path_changes(self):
+        pip.completion_data()
+        with patch('pip.locations.sys_path_mtimes', lambda: []):
+            with patch('pip.util.get_installed_distributions') as installed:
+                installed.return_value = []
+                data = pip.completion_data()
+        assert installed.called
+        assert data['installed'] == []
@@ -1,14 +1,19 @@
 import hashlib
 import os
+import threading
+import time
 from shutil import rmtree
 from tempfile import mkdtemp
 
 from mock import patch
 import pip
-from pip.backwardcompat import urllib, BytesIO, b
+from pip.backwardcompat import urllib, urllib2, BytesIO, b
 from pip.download import (_get_response_from_url as _get_response_from_url_original,
-                          path_to_url2, unpack_http_url, URLOpener)
+                          path_to_url2, unpack_http_url, URLOpener,
+                          ConnectionPool, DownloadCache, prefetch_http_urls,
+                          HTTPRangeReader)
 from pip.index import Link
+from pip.wheel import wheel_distribution
 from tests.lib import tests_data
 
 
@@ -75,10 +80,13 @@ def test_unpack_http_url_bad_cache_checksum(mock_get_response, mock_unpack_file)
         unpack_http_url(link, 'location', download_cache=cache_dir)
 
         # despite existence of cached file with bad hash, downloaded again
-        mock_get_response.assert_called_once_with(base_url, link)
+        mock_get_response.assert_called_once_with(base_url, link, False)
         # cached file is replaced with newly downloaded file
-        with open(cache_file) as fh:
+        with open(DownloadCache(cache_dir).get(base_url)['path']) as fh:
             assert fh.read() == 'downloaded'
+        # and the old cache layout is gone
+        assert not os.path.exists(cache_file)
+        assert not os.path.exists(cache_ct_file)
 
     finally:
         rmtree(cache_dir)
@@ -106,10 +114,341 @@ def test_unpack_http_url_bad_downloaded_checksum(mock_get_response, mock_unpack_
         unpack_http_url(link, 'location', download_cache=None, download_dir=download_dir)
 
         # despite existence of downloaded file with bad hash, downloaded again
-        mock_get_response.assert_called_once_with(base_url, link)
+        mock_get_response.assert_called_once_with(base_url, link, False)
         # cached file is replaced with newly downloaded file
         with open(downloaded_file) as fh:
             assert fh.read() == 'downloaded'
 
     finally:
         rmtree(download_dir)
+
+
+
+@patch('pip.download.unpack_file')
+@patch('pip.download._get_response_from_url')
+def test_unpack_http_url_cache_hit_uses_stored_hash(mock_get_response, mock_unpack_file):
+    """
+    A cached download is verified against the hash recorded when it was
+    stored, without reading it again.
+    """
+    base_url = 'http://www.example.com/somepackage.tgz'
+    contents = b('downloaded')
+    link = Link(base_url + '#md5=' + hashlib.md5(contents).hexdigest())
+    response = mock_get_response.return_value = MockResponse(contents)
+    response.info = lambda: {'content-type': 'application/x-tar'}
+    response.geturl = lambda: base_url
+
+    cache_dir = mkdtemp()
+    try:
+        unpack_http_url(link, 'location', download_cache=cache_dir)
+        cached = DownloadCache(cache_dir).get(base_url)
+        assert cached['hashes'] == {
+            'md5': hashlib.md5(contents).hexdigest(),
+            'sha256': hashlib.sha256(contents).hexdigest()}
+        assert cached['content_type'] == 'application/x-tar'
+
+        with patch('pip.download._get_hash_from_file') as mock_get_hash:
+            unpack_http_url(link, 'location', download_cache=cache_dir)
+        assert not mock_get_hash.called
+        assert mock_get_response.call_count == 1
+    finally:
+        rmtree(cache_dir)
+
+
+@patch('pip.download.unpack_file')
+@patch('pip.download._get_response_from_url')
+def test_unpack_http_url_cache_hit_uses_stored_format(mock_get_response,
+                                                      mock_unpack_file):
+    """
+    The archive format found out when a download is stored in the cache is
+    used on cache hits, without looking at the file again.
+    """
+    base_url = 'http://www.example.com/somepackage'
+    fp = open(os.path.join(tests_data, 'packages', 'simple-1.0.tar.gz'), 'rb')
+    try:
+        contents = fp.read()
+    finally:
+        fp.close()
+    link = Link(base_url)
+    response = mock_get_response.return_value = MockResponse(contents)
+    response.info = lambda: {'content-type': 'application/octet-stream'}
+    response.geturl = lambda: base_url
+
+    cache_dir = mkdtemp()
+    try:
+        unpack_http_url(link, 'location', download_cache=cache_dir)
+        assert DownloadCache(cache_dir).get(base_url)['format'] == 'gzip'
+
+        with patch('pip.download.archive_format') as mock_archive_format:
+            unpack_http_url(link, 'location', download_cache=cache_dir)
+        assert not mock_archive_format.called
+        assert mock_unpack_file.call_args[0][4] == 'gzip'
+    finally:
+        rmtree(cache_dir)
+
+
+@patch('pip.download.unpack_file')
+@patch('pip.download.urlopen')
+@patch('pip.download._get_response_from_url')
+def test_unpack_http_url_resumes_partial_download(mock_get_response,
+                                                 mock_urlopen,
+                                                 mock_unpack_file):
+    """
+    An interrupted download kept in the cache is resumed with a Range
+    request, and the result is checked against the full file's hash.
+    """
+    base_url = 'http://www.example.com/somepackage.tgz'
+    contents = b('downloaded')
+    link = Link(base_url + '#md5=' + hashlib.md5(contents).hexdigest())
+    response = mock_urlopen.return_value = MockResponse(contents[4:])
+    response.code = 206
+    response.info = lambda: {'content-type': 'application/x-tar',
+                             'content-length': str(len(contents) - 4),
+                             'content-range': 'bytes 4-9/10'}
+    response.geturl = lambda: base_url
+
+    cache_dir = mkdtemp()
+    try:
+        cache = DownloadCache(cache_dir)
+        claimed = cache.start_partial(base_url, {'ETag': '"v1"'})
+        _write_file(claimed, 'down')
+        cache.release_partial(base_url, claimed)
+
+        unpack_http_url(link, 'location', download_cache=cache_dir)
+
+        assert not mock_get_response.called
+        request = mock_urlopen.call_args[0][0]
+        assert request.get_header('Range') == 'bytes=4-'
+        assert request.get_header('If-range') == '"v1"'
+        with open(cache.get(base_url)['path']) as fh:
+            assert fh.read() == 'downloaded'
+        assert cache.get_partial(base_url) is None
+    finally:
+        rmtree(cache_dir)
+
+
+def test_download_cache_stores_identical_files_once():
+    """
+    The same archive downloaded from two URLs is stored once.
+    """
+    cache_dir = mkdtemp()
+    try:
+        filename = os.path.join(cache_dir, 'somepackage.tgz')
+        _write_file(filename, 'contents')
+        cache = DownloadCache(cache_dir)
+        cache.store('http://a.example.com/somepackage.tgz', filename, 'application/x-tar')
+        cache.store('http://b.example.com/somepackage.tgz', filename, 'application/x-tar')
+        first = cache.get('http://a.example.com/somepackage.tgz')
+        second = cache.get('http://b.example.com/somepackage.tgz')
+        assert first['path'] == second['path']
+        assert first['size'] == len('contents')
+        assert cache.get('http://c.example.com/somepackage.tgz') is None
+    finally:
+        rmtree(cache_dir)
+
+
+def test_download_cache_evicts_least_recently_used():
+    """
+    The download cache is kept under its size limit.
+    """
+    cache_dir = mkdtemp()
+    try:
+        cache = DownloadCache(cache_dir, max_size=100)
+        urls = []
+        for i in range(3):
+            filename = os.path.join(cache_dir, 'file%s' % i)
+            _write_file(filename, str(i) * 40)
+            url = 'http://example.com/file%s.tgz' % i
+            cache.store(url, filename, 'application/x-tar')
+            path = cache.get(url)['path']
+            os.utime(path, (i, i))
+            urls.append(url)
+        assert cache.get(urls[0]) is None
+        assert cache.get(urls[2]) is not None
+    finally:
+        rmtree(cache_dir)
+
+
+
+@patch('pip.download.urlopen')
+def test_prefetch_http_urls_failures_are_not_fatal(mock_urlopen):
+    """
+    A download that fails in advance is only logged at info level, it is
+    reported when the requirement is unpacked if it still fails then.
+    """
+    mock_urlopen.side_effect = urllib2.HTTPError(
+        'http://a.example.com/pkg.tar.gz', 404, 'Not Found', {}, None)
+    cache_dir = mkdtemp()
+    try:
+        cache = DownloadCache(cache_dir)
+        with patch.object(pip.download.logger, 'log') as mock_log:
+            prefetch_http_urls([Link('http://a.example.com/pkg.tar.gz')],
+                               cache)
+        levels = [call[0][0] for call in mock_log.call_args_list]
+        assert levels and pip.download.logger.FATAL not in levels
+        assert cache.get('http://a.example.com/pkg.tar.gz') is None
+    finally:
+        rmtree(cache_dir)
+
+
+@patch('pip.download._get_response_from_url')
+def test_prefetch_http_urls_respects_host_limit(mock_get_response):
+    """
+    prefetch_http_urls downloads all links into the cache, with no more
+    than per_host downloads from one host at a time.
+    """
+    lock = threading.Lock()
+    active = {}
+    most_active = {}
+
+    def get_response(target_url, link, quiet=False):
+        host = target_url.split('/')[2]
+        with lock:
+            active[host] = active.get(host, 0) + 1
+            most_active[host] = max(most_active.get(host, 0), active[host])
+        time.sleep(0.01)
+        with lock:
+            active[host] -= 1
+        response = MockResponse(b(target_url))
+        response.info = lambda: {'content-type': 'application/x-tar'}
+        response.geturl = lambda: target_url
+        return response
+    mock_get_response.side_effect = get_response
+
+    links = [Link('http://%s.example.com/pkg%s.tar.gz' % (host, i))
+             for host in ('a', 'b') for i in range(4)]
+    cache_dir = mkdtemp()
+    try:
+        cache = DownloadCache(cache_dir)
+        prefetch_http_urls(links, cache, workers=4, per_host=2)
+        for link in links:
+            with open(cache.get(link.url)['path']) as fh:
+                assert fh.read() == link.url
+        assert max(most_active.values()) <= 2
+        assert mock_get_response.call_count == len(links)
+
+        # everything is cached now
+        prefetch_http_urls(links, cache, workers=4, per_host=2)
+        assert mock_get_response.call_count == len(links)
+    finally:
+        rmtree(cache_dir)
+
+
+class MockConnection(object):
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class MockHTTPResponse(object):
+    def __init__(self, length=0, will_close=False, chunked=False):
+        self.length = length
+        self.will_close = will_close
+        self.chunked = chunked
+        self.closed = False
+
+    def isclosed(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+
+def test_connection_pool_reuses_finished_connection():
+    """
+    A connection is reused once its previous response has been read.
+    """
+    pool = ConnectionPool()
+    conn, reused = pool.get('key', MockConnection)
+    assert not reused
+    response = MockHTTPResponse(length=10)
+    pool.release('key', conn, response)
+    # the body hasn't been read yet, so a second connection is needed
+    other, reused = pool.get('key', MockConnection)
+    assert other is not conn and not reused
+    response.length = 0
+    again, reused = pool.get('key', MockConnection)
+    assert again is conn and reused
+    assert response.closed
+
+
+def test_connection_pool_drops_closing_connection():
+    """
+    Connections the server wants to close are not handed out again.
+    """
+    pool = ConnectionPool()
+    conn, reused = pool.get('key', MockConnection)
+    response = MockHTTPResponse(will_close=True)
+    response.closed = True
+    pool.release('key', conn, response)
+    other, reused = pool.get('key', MockConnection)
+    assert other is not conn and not reused
+    assert conn.closed
+
+
+def test_connection_pool_discard():
+    pool = ConnectionPool()
+    conn, reused = pool.get('key', MockConnection)
+    pool.release('key', conn, MockHTTPResponse())
+    pool.discard('key', conn)
+    assert conn.closed
+    other, reused = pool.get('key', MockConnection)
+    assert other is not conn and not reused
+
+
+class MockRangeResponse(MockResponse):
+    def __init__(self, contents, code=200, headers=None):
+        super(MockRangeResponse, self).__init__(contents)
+        self.code = code
+        self.headers = headers or {}
+
+    def info(self):
+        return self.headers
+
+    def close(self):
+        pass
+
+
+def _range_urlopen(data, requests, ranges=True):
+    def urlopen(request):
+        requests.append(request.get_header('Range'))
+        range = request.get_header('Range')
+        if not ranges or range is None:
+            return MockRangeResponse(data)
+        start, end = range[len('bytes='):].split('-')
+        if not start:
+            start, end = len(data) - int(end), len(data) - 1
+        start, end = int(start), min(int(end), len(data) - 1)
+        return MockRangeResponse(data[start:end + 1], 206, {
+            'content-range': 'bytes %s-%s/%s' % (start, end, len(data))})
+    return urlopen
+
+
+def test_http_range_reader_reads_wheel_metadata():
+    """
+    The metadata of a remote wheel is read without fetching all of it.
+    """
+    filename = os.path.join(tests_data, 'packages',
+                            'complex_dist-0.1-py2.py3-none-any.whl')
+    with open(filename, 'rb') as fp:
+        data = fp.read()
+    requests = []
+    with patch('pip.download.urlopen', _range_urlopen(data, requests)):
+        with patch.object(HTTPRangeReader, 'block_size', 100):
+            reader = HTTPRangeReader.open('http://example.com/x.whl',
+                                          tail_size=512)
+            dist = wheel_distribution(reader, 'x.whl', ('METADATA',))
+    assert dist.project_name == 'complex-dist'
+    assert [r.project_name for r in dist.requires(('simple',))] == ['simple.dist']
+    assert requests[0] == 'bytes=-512'
+    assert reader.requests == len(requests) > 1
+    assert sum([len(d) for s, d in reader._spans]) < len(data)
+
+
+def test_http_range_reader_needs_range_support():
+    requests = []
+    urlopen = _range_urlopen(b('data'), requests, ranges=False)
+    with patch('pip.download.urlopen', urlopen):
+        assert HTTPRangeReader.open('http://example.com/x.whl') is None
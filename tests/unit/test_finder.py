@@ -259,3 +259,93 @@ def test_link_sorting():
     results2 = finder._sort_versions(sorted(links, reverse=True))
 
     assert links == results == results2, results2
+
+
+def test_find_requirements_batch():
+    """Test PackageFinder.find_requirements looks up several requirements"""
+    index_url = path_to_url(os.path.join(tests_data, 'indexes', 'simple'))
+    finder = PackageFinder([], [index_url])
+    reqs = [InstallRequirement.from_line('simple', None),
+            InstallRequirement.from_line('nonexistent', None)]
+    results = finder.find_requirements(reqs, False)
+
+    assert [req for req, link, error in results] == reqs
+    req, link, error = results[0]
+    assert link.filename == 'simple-1.0.tar.gz' and error is None
+    req, link, error = results[1]
+    assert link is None and isinstance(error, DistributionNotFound)
+
+
+def test_iter_find_requirements():
+    """Test PackageFinder.iter_find_requirements yields a result per req"""
+    index_url = path_to_url(os.path.join(tests_data, 'indexes', 'simple'))
+    finder = PackageFinder([], [index_url])
+    reqs = [InstallRequirement.from_line('simple', None),
+            InstallRequirement.from_line('nonexistent', None)]
+    results = dict([(req, (link, error)) for req, link, error
+                    in finder.iter_find_requirements(reqs, False)])
+
+    link, error = results[reqs[0]]
+    assert link.filename == 'simple-1.0.tar.gz' and error is None
+    link, error = results[reqs[1]]
+    assert link is None and isinstance(error, DistributionNotFound)
+
+
+def test_iter_find_requirements_waits_for_shared_pages():
+    """Test a requirement is only looked up once a page it shares with
+    another one being fetched is there, and the workers are joined"""
+    import threading
+    import time
+    finder = PackageFinder([], [])
+    finder.max_batch_page_workers = 2
+    shared = Link('http://example.com/shared/')
+    fetched = []
+    lookups = []
+
+    def get_page(link, req):
+        time.sleep(0.05)
+        fetched.append(link)
+
+    def find_requirement(req, upgrade):
+        lookups.append(len(fetched))
+
+    threads = threading.active_count()
+    with patch.object(finder, '_page_items', lambda req: [(shared, req)]):
+        with patch.object(finder, '_get_page', get_page):
+            with patch.object(finder, 'find_requirement', find_requirement):
+                results = list(finder.iter_find_requirements(['a', 'b'], False))
+    assert len(results) == 2
+    assert lookups and min(lookups) > 0
+    assert threading.active_count() == threads
+
+
+def test_prefetch_pages_fills_page_cache():
+    """Test PackageFinder.prefetch_pages caches the index pages of all reqs"""
+    index_url = path_to_url(os.path.join(tests_data, 'indexes', 'simple'))
+    finder = PackageFinder([], [index_url])
+    finder.prefetch_pages([InstallRequirement.from_line('simple', None)])
+    assert finder.cache.get_page(index_url + '/simple/index.html') is not None
+
+
+def test_page_versions_match_link_versions():
+    """Test the per-page version index finds the same links as a plain scan"""
+    from pip.index import HTMLPage
+    page = HTMLPage(''.join(['<a href="%s">' % name for name in (
+        'foo-1.0.tar.gz', 'foo-bar-2.0.tar.gz', 'Foo_Bar-2.1.zip', 'foo-1.1.txt',
+        'bar#egg=foo-3.0', 'foo-bar-baz-1.0.tar.gz')]), 'http://example.com/')
+    finder = PackageFinder([], [])
+    for name in ('foo', 'foo-bar', 'foo-bar-baz', 'bar'):
+        expected = list(finder._package_versions(page.links, name))
+        assert list(finder._page_versions(page, name)) == expected
+    assert [version for parsed, link, version in finder._page_versions(page, 'foo-bar')] == ['2.0', '2.1', 'baz-1.0']
+
+
+def test_page_versions_index_built_once():
+    """Test the per-page version index is only built once per page"""
+    from pip.index import HTMLPage
+    page = HTMLPage('<a href="foo-1.0.tar.gz"><a href="bar-1.0.tar.gz">', 'http://example.com/')
+    finder = PackageFinder([], [])
+    with patch.object(finder, '_link_egg_info', wraps=finder._link_egg_info) as mock_egg_info:
+        assert len(list(finder._page_versions(page, 'foo'))) == 1
+        assert len(list(finder._page_versions(page, 'bar'))) == 1
+        assert mock_egg_info.call_count == 2
@@ -1,8 +1,11 @@
+import gzip
 import os
-from pip.backwardcompat import urllib
+from shutil import rmtree
+from tempfile import mkdtemp
+from pip.backwardcompat import urllib, HTTPError, b, BytesIO
 from tests.lib.path import Path
 from pip.index import package_to_requirement, HTMLPage, get_mirrors, DEFAULT_MIRROR_HOSTNAME
-from pip.index import PackageFinder, Link, InfLink
+from pip.index import PackageFinder, Link, InfLink, PageCache, LinkParser
 from tests.lib import reset_env, run_pip, pyversion, tests_data, path_to_url, find_links
 from string import ascii_lowercase
 from mock import patch
@@ -33,6 +36,42 @@ def test_html_page_should_be_able_to_scrap_rel_links():
     assert len(links) == 1
     assert links[0].url == 'http://supervisord.org/'
 
+def test_link_parser_handles_chunked_input():
+    """
+    Test the link parser gives the same result however the page is split
+    """
+    content = ('<html><head><base href="http://example.com/base/"></head>'
+               '<th>Home Page</th><a href="http://home.example.com/">home</a>'
+               '<a href=\'foo-1.0.tar.gz#md5=abc\' rel="download">foo</a>'
+               '<a href=foo-1.1.zip>foo</a></html>')
+    whole = LinkParser()
+    whole.feed(content)
+    whole.close()
+    assert whole.base_url == 'http://example.com/base/'
+    assert whole.hrefs == ['http://example.com/base/', 'http://home.example.com/',
+                           'foo-1.0.tar.gz#md5=abc', 'foo-1.1.zip']
+    assert whole.rel_hrefs == [(['download'], 'foo-1.0.tar.gz#md5=abc')]
+    assert whole.scraped_hrefs == {'homepage': 'http://home.example.com/'}
+    for size in (1, 3, 10):
+        parser = LinkParser()
+        for i in range(0, len(content), size):
+            parser.feed(content[i:i + size])
+        parser.close()
+        assert parser.hrefs == whole.hrefs
+        assert parser.rel_hrefs == whole.rel_hrefs
+        assert parser.scraped_hrefs == whole.scraped_hrefs
+        assert parser.base_url == whole.base_url
+
+
+def test_html_page_resolves_links_against_base():
+    page = HTMLPage('<base href="http://example.com/base/">'
+                    '<a href="../foo 1.0.tar.gz" rel="homepage">', 'http://other/')
+    assert [link.url for link in page.links] == [
+        'http://example.com/base/', 'http://example.com/foo%201.0.tar.gz']
+    assert [link.url for link in page.explicit_rel_links()] == [
+        'http://example.com/foo%201.0.tar.gz']
+
+
 @patch('socket.gethostbyname_ex')
 def test_get_mirrors(mock_gethostbyname_ex):
     # Test when the expected result comes back
@@ -103,3 +142,126 @@ def test_mirror_url_formats():
 
 
 
+
+
+def test_page_cache_stores_page_with_validators():
+    """
+    Test pages with an ETag are stored on disk and read back
+    """
+    cache_dir = mkdtemp()
+    try:
+        cache = PageCache(cache_dir)
+        url = 'http://pypi.example.com/simple/foo/'
+        cache.store_page(url, url, {'ETag': '"abc"'}, b('<a href="foo-1.0.tar.gz">'))
+        stored = PageCache(cache_dir).get_stored_page(url)
+        assert stored['etag'] == '"abc"'
+        assert stored['content'] == b('<a href="foo-1.0.tar.gz">')
+        assert PageCache(cache_dir).get_stored_page(url + 'bar/') is None
+    finally:
+        rmtree(cache_dir)
+
+
+def test_page_cache_skips_pages_without_validators():
+    """
+    Test pages that can't be revalidated are not stored on disk
+    """
+    cache_dir = mkdtemp()
+    try:
+        cache = PageCache(cache_dir)
+        url = 'http://pypi.example.com/simple/foo/'
+        cache.store_page(url, url, {}, b('<a href="foo-1.0.tar.gz">'))
+        assert cache.get_stored_page(url) is None
+    finally:
+        rmtree(cache_dir)
+
+
+def test_page_cache_evicts_least_recently_used():
+    """
+    Test the on-disk page cache is kept under its size limit
+    """
+    cache_dir = mkdtemp()
+    try:
+        cache = PageCache(cache_dir, max_size=100)
+        urls = ['http://pypi.example.com/simple/%s/' % name
+                for name in ('a', 'b', 'c')]
+        for i, url in enumerate(urls):
+            cache.store_page(url, url, {'ETag': 'x'}, b('x') * 40)
+            path = cache._stored_page_path(url)
+            os.utime(path, (i, i))
+        assert cache.get_stored_page(urls[0]) is None
+        assert cache.get_stored_page(urls[2]) is not None
+    finally:
+        rmtree(cache_dir)
+
+
+@patch('pip.index.urlopen')
+def test_get_page_reuses_stored_page_when_not_modified(mock_urlopen):
+    """
+    Test a 304 response to a conditional request reuses the stored page
+    """
+    cache_dir = mkdtemp()
+    try:
+        url = 'http://pypi.example.com/simple/foo/'
+        PageCache(cache_dir).store_page(
+            url, url, {'Last-Modified': 'Sat, 01 Jun 2013 00:00:00 GMT'},
+            b('<a href="foo-1.0.tar.gz">foo</a>'))
+        mock_urlopen.side_effect = HTTPError(url, 304, 'Not Modified', {}, None)
+
+        page = HTMLPage.get_page(Link(url), None, cache=PageCache(cache_dir))
+
+        request = mock_urlopen.call_args[0][0]
+        assert request.get_header('If-modified-since') == 'Sat, 01 Jun 2013 00:00:00 GMT'
+        assert [link.url for link in page.links] == [url + 'foo-1.0.tar.gz']
+    finally:
+        rmtree(cache_dir)
+
+
+@patch('pip.index.urlopen')
+def test_get_page_uses_fresh_stored_page_without_request(mock_urlopen):
+    """
+    Test a stored page validated less than the cache ttl ago is used as is
+    """
+    cache_dir = mkdtemp()
+    try:
+        url = 'http://pypi.example.com/simple/foo/'
+        PageCache(cache_dir).store_page(
+            url, url, {'ETag': '"abc"'}, b('<a href="foo-1.0.tar.gz">foo</a>'))
+
+        page = HTMLPage.get_page(Link(url), None,
+                                 cache=PageCache(cache_dir, ttl=60))
+        assert not mock_urlopen.called
+        assert [link.url for link in page.links] == [url + 'foo-1.0.tar.gz']
+
+        mock_urlopen.side_effect = HTTPError(url, 304, 'Not Modified', {}, None)
+        cache = PageCache(cache_dir, ttl=60)
+        with patch('time.time', lambda: 2e9):
+            HTMLPage.get_page(Link(url), None, cache=cache)
+            assert mock_urlopen.called
+            assert cache.is_fresh(cache.get_stored_page(url))
+    finally:
+        rmtree(cache_dir)
+
+
+class MockPageResponse(object):
+    def __init__(self, content):
+        self.fp = BytesIO(content)
+
+    def read(self, size=-1):
+        return self.fp.read(size)
+
+
+def test_parse_response_decompresses_gzip_stream():
+    """
+    Test gzipped pages are decompressed while being parsed
+    """
+    content = b('<a href="foo-1.0.tar.gz">foo</a>') * 1000
+    fp = BytesIO()
+    gz = gzip.GzipFile(fileobj=fp, mode='wb')
+    gz.write(content)
+    gz.close()
+    resp = MockPageResponse(fp.getvalue())
+    with patch.object(HTMLPage, 'chunk_size', 100):
+        parser, body = HTMLPage._parse_response(
+            resp, {'Content-Encoding': 'gzip'}, keep=True)
+    assert body == content
+    assert parser.hrefs == ['foo-1.0.tar.gz'] * 1000
@@ -4,11 +4,13 @@ import tempfile
 
 from mock import Mock, patch
 from nose.tools import assert_equal, assert_raises
+from pip.backwardcompat import cache_from_source
 from pip.exceptions import PreviousBuildDirError
 from pip.index import PackageFinder
 from pip.log import logger
+from pip.util import ByteCompiler
 from pip.req import (InstallRequirement, RequirementSet, parse_editable,
-                     Requirements, parse_requirements)
+                     Requirements, parse_requirements, EggInfoCache)
 from tests.lib import path_to_url, assert_raises_regexp, find_links
 
 
@@ -49,6 +51,83 @@ class TestRequirementSet(object):
             finder
             )
 
+    def test_wheel_cache_needs_verified_sdist(self):
+        """Test wheels are only cached for sdists in the download cache
+        whose hashes match the link"""
+
+        from pip.download import DownloadCache
+        from pip.index import Link
+        reqset = self.basic_reqset()
+        reqset.wheel_cache = True
+        url = 'http://example.com/simple-1.0.tar.gz'
+        sdist = os.path.join(self.tempdir, 'simple-1.0.tar.gz')
+        open(sdist, 'w').write('sdist')
+        DownloadCache(reqset.download_cache).store(
+            url, sdist, 'application/x-tar', {'md5': 'abc'})
+
+        digest = reqset._wheel_cache_digest(Link(url + '#md5=abc'))
+        assert len(digest) == 64
+        assert reqset._wheel_cache_digest(Link(url)) == digest
+        assert reqset._wheel_cache_digest(Link(url + '#md5=def')) is None
+        assert reqset._wheel_cache_digest(Link(url + '#sha1=abc')) is None
+        assert reqset._wheel_cache_digest(
+            Link('http://example.com/other-1.0.tar.gz')) is None
+        reqset.wheel_cache = False
+        assert reqset._wheel_cache_digest(Link(url)) is None
+
+    def test_egg_info_reused_for_same_archive(self):
+        """Test egg_info only runs once for the same archive"""
+
+        from pip.index import Link
+        reqset = self.basic_reqset()
+        digest = 'ab' * 32
+        reqset._archive_digest = lambda link: digest
+        link = Link('http://example.com/simple-1.0.tar.gz')
+        runs = []
+
+        def run_egg_info(req):
+            runs.append(req)
+            egg_info = os.path.join(req.source_dir, 'pip-egg-info', 'simple.egg-info')
+            os.makedirs(egg_info)
+            open(os.path.join(egg_info, 'PKG-INFO'), 'w').write(
+                'Metadata-Version: 1.0\nName: simple\nVersion: 1.0\n')
+            open(os.path.join(egg_info, 'SOURCES.txt'), 'w').write('setup.py\n')
+            req._egg_info_ready()
+
+        for i in range(2):
+            req = InstallRequirement.from_line(link.url)
+            req.source_dir = os.path.join(self.tempdir, 'build%s' % i)
+            with patch.object(req, 'run_egg_info', lambda: run_egg_info(req)):
+                reqset.run_egg_info(req, link)
+            assert req.name == 'simple'
+            assert req.installed_version == '1.0'
+        assert len(runs) == 1
+
+        cached = reqset.get_egg_info_cache().get(digest)
+        assert sorted(os.listdir(cached)) == ['PKG-INFO']
+        assert os.path.exists(os.path.join(self.tempdir, 'build1', 'pip-egg-info',
+                                           'simple.egg-info', 'PKG-INFO'))
+        assert EggInfoCache(self.tempdir).get(digest) is None
+
+    def test_unpack_url_keeps_wheels(self):
+        """Test wheels are kept as is in the build directory, while other
+        archives are unpacked"""
+
+        import zipfile
+        from pip.index import Link
+        reqset = self.basic_reqset()
+        for name in ('simple-1.0-py2.py3-none-any.whl', 'simple-1.0.zip'):
+            path = os.path.join(self.tempdir, name)
+            zip = zipfile.ZipFile(path, 'w')
+            zip.writestr('simple/__init__.py', '')
+            zip.close()
+            location = os.path.join(self.tempdir, 'build', name)
+            reqset.unpack_url(Link(path_to_url(path)), location)
+            if name.endswith('.whl'):
+                assert os.listdir(location) == [name]
+            else:
+                assert os.listdir(location) == ['__init__.py']
+
     def test_skip_reqs(self):
         """Test the skip_reqs list works"""
 
@@ -70,6 +149,85 @@ class TestRequirementSet(object):
         assert False == reqset.add_requirement(req)
 
 
+class TestInstallByteCompile(object):
+    """InstallRequirement.install() byte-compiling for setup.py install"""
+
+    def setup(self):
+        logger.consumers = [(logger.NOTIFY, Mock())]
+        self.tempdir = tempfile.mkdtemp()
+        self.lib = os.path.join(self.tempdir, 'lib')
+        self.egg_info = os.path.join(self.lib, 'simple-1.0-py.egg-info')
+        os.makedirs(self.egg_info)
+        self.module = os.path.join(self.lib, 'simple.py')
+        self.script = os.path.join(self.tempdir, 'bin', 'simple.py')
+        os.makedirs(os.path.dirname(self.script))
+        for path in (self.module, self.script):
+            fp = open(path, 'w')
+            fp.write('x = 1\n')
+            fp.close()
+
+    def teardown(self):
+        logger.consumers = []
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+    def install(self, install_options, compiler=None):
+        """
+        Install with a fake setup.py install, and return its arguments and
+        the lines of installed-files.txt
+        """
+        args = []
+
+        def call_subprocess(cmd, **kwargs):
+            args.extend(cmd)
+            record = cmd[cmd.index('--record') + 1]
+            fp = open(record, 'w')
+            fp.write('\n'.join([self.module, self.script, self.egg_info]))
+            fp.close()
+
+        req = InstallRequirement.from_line('simple')
+        req.source_dir = self.tempdir
+        with patch('pip.req.call_subprocess', call_subprocess):
+            req.install(install_options,
+                        compiler=compiler or ByteCompiler(processes=1))
+        fp = open(os.path.join(self.egg_info, 'installed-files.txt'))
+        try:
+            return args, fp.read().splitlines()
+        finally:
+            fp.close()
+
+    def test_compiled_by_pip(self):
+        """
+        Test setup.py install doesn't compile, and the modules pip compiles
+        instead, but not the scripts, are in installed-files.txt
+        """
+        args, installed = self.install([])
+        assert '--no-compile' in args
+        pyc = cache_from_source(self.module)
+        assert os.path.isfile(pyc)
+        assert os.path.relpath(pyc, self.egg_info) in installed
+        assert not os.path.exists(cache_from_source(self.script))
+
+    def test_compile_option_left_to_setup_py(self):
+        """
+        Test pip doesn't compile when install_options sets how to
+        """
+        args, installed = self.install(['--compile'])
+        assert '--no-compile' not in args
+        assert not os.path.exists(cache_from_source(self.module))
+        assert len(installed) == 3
+
+    def test_compiled_by_setup_py_without_pool(self):
+        """
+        Test setup.py compiles if pip can't start its pool of processes
+        """
+        compiler = ByteCompiler(processes=2)
+        with patch('multiprocessing.Pool', side_effect=OSError('no sem_open')):
+            args, installed = self.install([], compiler)
+        assert '--no-compile' not in args
+        assert not os.path.exists(cache_from_source(self.module))
+        assert len(installed) == 3
+
+
 def test_url_with_query():
     """InstallRequirement should strip the fragment, but not the query."""
     url = 'http://foo.com/?p=bar.git;a=snapshot;h=v0.1;sf=tgz'
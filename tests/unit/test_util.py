@@ -4,11 +4,21 @@ util tests
 """
 import os
 import sys
+import tarfile
+import zipfile
+import multiprocessing.pool
+import pkg_resources
+from shutil import rmtree
+from tempfile import mkdtemp
 
 from mock import Mock, patch
 from nose.tools import eq_, assert_raises
 from pip.exceptions import BadCommand
-from pip.util import egg_link_path, Inf, get_installed_distributions, find_command
+from pip.backwardcompat import BytesIO, b, cache_from_source
+from pip.util import (egg_link_path, Inf, get_installed_distributions, find_command,
+                      read_packaged_egg_info, InstalledDistributions,
+                      installed_distributions, forget_installed_distributions,
+                      unzip_file, untar_file, archive_format, ByteCompiler)
 from tests.lib import reset_env, mkdir, write_file
 
 
@@ -198,6 +208,46 @@ class Tests_get_installed_distributions:
         assert len(dists) == 3
 
 
+class Tests_InstalledDistributions:
+    """test util.InstalledDistributions"""
+
+    def setup(self):
+        self.tempdir = mkdtemp()
+        self.site = os.path.join(self.tempdir, 'site')
+        os.mkdir(self.site)
+        self.dists = [
+            pkg_resources.Distribution(self.site, project_name='Foo_Bar',
+                                       version='1.0'),
+            pkg_resources.Distribution(self.site, project_name='baz',
+                                       version='2.0'),
+            ]
+
+    def teardown(self):
+        rmtree(self.tempdir)
+
+    def test_get_by_normalized_name(self):
+        installed = InstalledDistributions(self.dists)
+        assert installed.get('foo-bar') is self.dists[0]
+        assert installed.get('FOO_BAR') is self.dists[0]
+        assert 'Baz' in installed
+        assert installed.get('qux') is None
+
+    @patch('pip.util.dist_is_local')
+    def test_checks_each_dist_once(self, mock_dist_is_local):
+        mock_dist_is_local.side_effect = lambda dist: dist.key == 'baz'
+        installed = InstalledDistributions(self.dists)
+        for i in range(3):
+            dists = installed.select(local_only=True, include_editables=True)
+            assert dists == [self.dists[1]]
+        assert mock_dist_is_local.call_count == 2
+
+    def test_snapshot_forgotten(self):
+        installed = installed_distributions()
+        assert installed_distributions() is installed
+        forget_installed_distributions()
+        assert installed_distributions() is not installed
+
+
 def test_find_command_folder_in_path():
     """
     If a folder named e.g. 'git' is in PATH, and find_command is looking for
@@ -276,3 +326,232 @@ def test_find_command_trys_supplied_pathext(mock_isfile, getpath_mock):
 
 
 
+
+
+class Tests_read_packaged_egg_info:
+    "util.read_packaged_egg_info() tests"
+
+    pkg_info = 'Metadata-Version: 1.0\nName: foo\nVersion: 1.0\n'
+
+    def setup(self):
+        self.tempdir = mkdtemp()
+
+    def teardown(self):
+        rmtree(self.tempdir)
+
+    def make_sdist(self, files, top='foo-1.0'):
+        filename = os.path.join(self.tempdir, top + '.tar.gz')
+        tar = tarfile.open(filename, 'w:gz')
+        for name, data in files.items():
+            info = tarfile.TarInfo('%s/%s' % (top, name))
+            info.size = len(data)
+            tar.addfile(info, BytesIO(b(data)))
+        tar.close()
+        return filename
+
+    def test_packaged_egg_info(self):
+        filename = self.make_sdist({
+            'setup.py': 'setup(install_requires=["bar"])',
+            'foo.py': '',
+            'foo.egg-info/PKG-INFO': self.pkg_info,
+            'foo.egg-info/requires.txt': 'bar\n',
+            'foo.egg-info/SOURCES.txt': 'foo.py\n',
+            })
+        name, files = read_packaged_egg_info(filename)
+        assert name == 'foo.egg-info'
+        assert files == {'PKG-INFO': b(self.pkg_info), 'requires.txt': b('bar\n')}
+
+    def test_egg_info_of_another_version(self):
+        filename = self.make_sdist({
+            'setup.py': 'setup()',
+            'foo.egg-info/PKG-INFO': self.pkg_info,
+            }, top='foo-1.1')
+        assert read_packaged_egg_info(filename) is None
+
+    def test_requirements_missing(self):
+        filename = self.make_sdist({
+            'setup.py': 'setup(install_requires=["bar"])',
+            'foo.egg-info/PKG-INFO': self.pkg_info,
+            })
+        assert read_packaged_egg_info(filename) is None
+
+    def test_conditional_requirements(self):
+        filename = self.make_sdist({
+            'setup.py': 'if sys.version_info < (2, 7): requires = ["argparse"]',
+            'foo.egg-info/PKG-INFO': self.pkg_info,
+            'foo.egg-info/requires.txt': '',
+            })
+        assert read_packaged_egg_info(filename) is None
+
+    def test_no_egg_info(self):
+        filename = self.make_sdist({'setup.py': 'setup()'})
+        assert read_packaged_egg_info(filename) is None
+
+
+class Tests_unpack:
+    "util.unzip_file() and util.untar_file() tests"
+
+    def setup(self):
+        self.tempdir = mkdtemp()
+        self.location = os.path.join(self.tempdir, 'out')
+
+    def teardown(self):
+        rmtree(self.tempdir)
+
+    def read(self, name):
+        fp = open(os.path.join(self.location, name), 'rb')
+        try:
+            return fp.read()
+        finally:
+            fp.close()
+
+    def test_unzip_file_streams_members(self):
+        """
+        Test members are extracted without reading them whole, with their
+        modes and without the leading directory
+        """
+        filename = os.path.join(self.tempdir, 'foo-1.0.zip')
+        zip = zipfile.ZipFile(filename, 'w')
+        zip.writestr('foo-1.0/', '')
+        info = zipfile.ZipInfo('foo-1.0/bin/script')
+        info.external_attr = int('755', 8) << 16
+        zip.writestr(info, '#!/bin/sh\n')
+        zip.writestr('foo-1.0/pkg/sub/module.py', 'x' * 100000)
+        zip.close()
+        with patch.object(zipfile.ZipFile, 'read') as read:
+            unzip_file(filename, self.location)
+        assert not read.called
+        assert self.read('bin/script') == b('#!/bin/sh\n')
+        assert os.stat(os.path.join(self.location, 'bin/script')).st_mode & 0x1ff == int('755', 8)
+        assert self.read('pkg/sub/module.py') == b('x' * 100000)
+
+    def make_tar(self, names):
+        filename = os.path.join(self.tempdir, 'foo-1.0.tar.gz')
+        tar = tarfile.open(filename, 'w:gz')
+        for name in names:
+            info = tarfile.TarInfo(name)
+            if name.endswith('/'):
+                info.type = tarfile.DIRTYPE
+                tar.addfile(info)
+            else:
+                info.size = len(name)
+                tar.addfile(info, BytesIO(b(name)))
+        tar.close()
+        return filename
+
+    def test_untar_file_strips_leading_dir(self):
+        """
+        Test the members are extracted in one pass without the leading
+        directory
+        """
+        filename = self.make_tar(['foo-1.0/', 'foo-1.0/setup.py',
+                                  'foo-1.0/foo/__init__.py'])
+        with patch.object(tarfile.TarFile, 'getmembers') as getmembers:
+            untar_file(filename, self.location)
+        assert not getmembers.called
+        assert sorted(os.listdir(self.location)) == ['foo', 'setup.py']
+        assert self.read('foo/__init__.py') == b('foo-1.0/foo/__init__.py')
+
+    def test_untar_file_member_outside_leading_dir(self):
+        """
+        Test the members already extracted are moved back into their
+        directory when a later member is not in it
+        """
+        filename = self.make_tar(['foo-1.0/setup.py', 'foo-1.0/foo-1.0/x',
+                                  'README'])
+        untar_file(filename, self.location)
+        assert sorted(os.listdir(self.location)) == ['README', 'foo-1.0']
+        assert self.read('foo-1.0/setup.py') == b('foo-1.0/setup.py')
+        assert self.read('foo-1.0/foo-1.0/x') == b('foo-1.0/foo-1.0/x')
+        assert self.read('README') == b('README')
+
+    def test_untar_file_invalid_member_before_outside_member(self):
+        """
+        Test a member that couldn't be extracted isn't moved back into the
+        leading directory
+        """
+        filename = os.path.join(self.tempdir, 'foo-1.0.tar.gz')
+        tar = tarfile.open(filename, 'w:gz')
+        info = tarfile.TarInfo('foo-1.0/setup.py')
+        info.size = 5
+        tar.addfile(info, BytesIO(b('setup')))
+        info = tarfile.TarInfo('foo-1.0/broken')
+        info.type = tarfile.LNKTYPE
+        info.linkname = 'foo-1.0/missing'
+        tar.addfile(info)
+        info = tarfile.TarInfo('README')
+        info.size = 6
+        tar.addfile(info, BytesIO(b('readme')))
+        tar.close()
+        untar_file(filename, self.location)
+        assert sorted(os.listdir(self.location)) == ['README', 'foo-1.0']
+        assert os.listdir(os.path.join(self.location, 'foo-1.0')) == ['setup.py']
+
+    def test_archive_format(self):
+        """
+        Test archives are told apart by their first bytes, whatever their
+        name
+        """
+        zip_name = os.path.join(self.tempdir, 'archive')
+        zip = zipfile.ZipFile(zip_name, 'w')
+        zip.writestr('setup.py', '')
+        zip.close()
+        assert archive_format(zip_name) == 'zip'
+        for mode, format in [('w:gz', 'gzip'), ('w:bz2', 'bzip2'), ('w', 'tar')]:
+            name = os.path.join(self.tempdir, format)
+            tar = tarfile.open(name, mode)
+            tar.addfile(tarfile.TarInfo('setup.py'), BytesIO(b('')))
+            tar.close()
+            assert archive_format(name) == format
+        text = os.path.join(self.tempdir, 'text')
+        fp = open(text, 'w')
+        fp.write('not an archive')
+        fp.close()
+        assert archive_format(text) is None
+
+
+def test_byte_compiler_skips_what_does_not_compile():
+    """
+    Test ByteCompiler.compile() only returns the .pyc files it wrote
+    """
+    tempdir = mkdtemp()
+    try:
+        paths = []
+        for name, source in [('good.py', 'x = 1\n'), ('bad.py', 'def (\n'),
+                             ('data.txt', 'x = 1\n')]:
+            paths.append(os.path.join(tempdir, name))
+            fp = open(paths[-1], 'w')
+            fp.write(source)
+            fp.close()
+        compiler = ByteCompiler(processes=1)
+        compiled = compiler.compile(paths)
+        compiler.close()
+        assert compiled == [cache_from_source(paths[0])]
+        assert os.path.isfile(compiled[0])
+    finally:
+        rmtree(tempdir)
+
+
+def test_byte_compiler_pool():
+    """
+    Test ByteCompiler.compile() compiles several modules in its pool
+    """
+    tempdir = mkdtemp()
+    compiler = ByteCompiler(processes=2)
+    try:
+        paths = []
+        for i in range(4):
+            paths.append(os.path.join(tempdir, 'module%s.py' % i))
+            fp = open(paths[-1], 'w')
+            fp.write('x = %s\n' % i)
+            fp.close()
+        with patch('multiprocessing.pool.Pool.map', autospec=True,
+                   side_effect=multiprocessing.pool.Pool.map) as pool_map:
+            compiled = compiler.compile(paths)
+        assert pool_map.called
+        assert compiled == [cache_from_source(path) for path in paths]
+        for path in compiled:
+            assert os.path.isfile(path)
+    finally:
+        compiler.close()
+        rmtree(tempdir)
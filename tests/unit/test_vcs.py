@@ -1,3 +1,5 @@
+import sys
+
 from tests.lib import pyversion
 from pip.vcs.bazaar import Bazaar
 
@@ -27,3 +29,62 @@ def test_bazaar_simple_urls():
     assert sftp_bzr_repo.get_url_rev() == ('sftp://bzr.myproject.org/MyProject/trunk/', None)
     assert launchpad_bzr_repo.get_url_rev() == ('lp:MyLaunchpadProject', None)
 
+
+
+def test_frozen_requirements_of_checkouts_found_concurrently():
+    """
+    FrozenRequirement.from_dists() queries VCS checkouts at the same time
+    and keeps the order of the distributions.
+    """
+    import threading
+    from mock import Mock, patch
+    from pip import FrozenRequirement
+
+    dists = [Mock(location='/src/%s' % name, project_name=name)
+             for name in ('a', 'b', 'c', 'd')]
+    checkouts = ('/src/b', '/src/c', '/src/d')
+    started = []
+    all_started = threading.Event()
+
+    def from_dist(cls, dist, dependency_links, find_tags=False):
+        if dist.location in checkouts:
+            # only returns once all checkouts are being queried
+            started.append(dist)
+            if len(started) == len(checkouts):
+                all_started.set()
+            all_started.wait(5)
+            assert all_started.isSet()
+        return FrozenRequirement(dist.project_name, dist.project_name, False)
+
+    def get_backend_name(location):
+        return location.replace('\\', '/').endswith(('b', 'c', 'd')) and 'git' or None
+
+    with patch.object(FrozenRequirement, 'from_dist', classmethod(from_dist)):
+        with patch('pip.vcs.vcs.get_backend_name', get_backend_name):
+            reqs = FrozenRequirement.from_dists(dists, [])
+    assert [req.name for req in reqs] == ['a', 'b', 'c', 'd']
+
+
+def test_frozen_requirements_reraise_checkout_errors():
+    """
+    An error raised while querying a checkout in a worker thread is raised
+    again by from_dists() with its original traceback.
+    """
+    import traceback
+    from mock import Mock, patch
+    from pip import FrozenRequirement
+
+    dists = [Mock(location='/src/a', project_name='a')]
+
+    def from_dist(cls, dist, dependency_links, find_tags=False):
+        raise ValueError('broken checkout')
+
+    with patch.object(FrozenRequirement, 'from_dist', classmethod(from_dist)):
+        with patch('pip.vcs.vcs.get_backend_name', lambda location: 'git'):
+            try:
+                FrozenRequirement.from_dists(dists, [])
+            except ValueError:
+                tb = traceback.extract_tb(sys.exc_info()[2])
+            else:
+                assert False, 'ValueError not raised'
+    assert tb[-1][2] == 'from_dist'
@@ -1,10 +1,17 @@
 """Tests for wheel binary packages and .dist-info."""
+import csv
+import os
 import pkg_resources
+from shutil import rmtree
+from tempfile import mkdtemp
 from mock import patch
-from pip import wheel
+from pip import wheel, pep425tags
+from pip.backwardcompat import cache_from_source
 from pip.exceptions import InstallationError
 from pip.index import PackageFinder
-from tests.lib import assert_raises_regexp
+from pip.util import ByteCompiler
+from nose.tools import assert_raises
+from tests.lib import assert_raises_regexp, tests_data
 
 
 def test_uninstallation_paths():
@@ -34,6 +41,82 @@ def test_uninstallation_paths():
     assert paths2 == paths
 
 
+def test_wheel_distribution_reads_archive_metadata():
+    """
+    Test the distribution of a wheel is read from the archive.
+    """
+    path = os.path.join(tests_data, 'packages',
+                        'complex_dist-0.1-py2.py3-none-any.whl')
+    dist = wheel.wheel_distribution(path)
+    assert dist.project_name == 'complex-dist'
+    assert dist.version == '0.1'
+    assert dist.location == path
+    assert [r.project_name for r in dist.requires(['simple'])] == ['simple.dist']
+    assert 'complex-dist' in dist.get_entry_map('console_scripts')
+
+
+@patch('pip.wheel.distutils_scheme')
+def test_install_wheel_from_archive(mock_scheme):
+    """
+    Test install_wheel() writes the members to the scheme directories and
+    records their hashes.
+    """
+    root = mkdtemp()
+    try:
+        scheme = mock_scheme.return_value = dict(
+            (key, os.path.join(root, key))
+            for key in ('purelib', 'platlib', 'headers', 'scripts', 'data'))
+        scheme['purelib'] = scheme['platlib'] = os.path.join(root, 'lib')
+        path = os.path.join(tests_data, 'packages',
+                            'complex_dist-0.1-py2.py3-none-any.whl')
+        req = pkg_resources.Requirement.parse('complex-dist')
+        wheel.install_wheel('complex-dist', req, path)
+
+        lib = scheme['platlib']
+        script = os.path.join(scheme['scripts'], 'complex-dist')
+        assert os.path.isfile(os.path.join(lib, 'complexdist', '__init__.py'))
+        assert not os.path.exists(os.path.join(lib, 'complex_dist-0.1.data'))
+        assert not open(script, 'rb').read().startswith(wheel.binary('#!python'))
+
+        record = os.path.join(lib, 'complex_dist-0.1.dist-info', 'RECORD')
+        rows = list(csv.reader(wheel.open_for_csv(record, 'r')))
+        paths = dict((row[0], row[1:]) for row in rows)
+        assert paths['complex_dist-0.1.dist-info/RECORD'] == ['', '']
+        assert paths['../scripts/complex-dist'] == list(map(str, wheel.rehash(script)))
+        assert len(rows) == 6
+    finally:
+        rmtree(root)
+
+
+@patch('pip.wheel.distutils_scheme')
+def test_install_wheel_byte_compiles_modules(mock_scheme):
+    """
+    Test install_wheel() byte-compiles the modules, but not the scripts,
+    and records the .pyc files.
+    """
+    root = mkdtemp()
+    try:
+        scheme = mock_scheme.return_value = dict(
+            (key, os.path.join(root, key))
+            for key in ('purelib', 'platlib', 'headers', 'scripts', 'data'))
+        scheme['purelib'] = scheme['platlib'] = os.path.join(root, 'lib')
+        path = os.path.join(tests_data, 'packages',
+                            'complex_dist-0.1-py2.py3-none-any.whl')
+        req = pkg_resources.Requirement.parse('complex-dist')
+        wheel.install_wheel('complex-dist', req, path,
+                            compiler=ByteCompiler(processes=1))
+
+        lib = scheme['platlib']
+        pyc = cache_from_source(os.path.join(lib, 'complexdist', '__init__.py'))
+        assert os.path.isfile(pyc)
+        record = os.path.join(lib, 'complex_dist-0.1.dist-info', 'RECORD')
+        rows = list(csv.reader(wheel.open_for_csv(record, 'r')))
+        compiled = [row[0] for row in rows if row[0].endswith('.pyc')]
+        assert compiled == [os.path.relpath(pyc, lib).replace(os.path.sep, '/')]
+    finally:
+        rmtree(root)
+
+
 class TestWheelSupported(object):
 
     def raise_not_found(self, dist):
@@ -129,6 +212,36 @@ class TestWheelFile(object):
         w = wheel.Wheel('simple-0.1-py2-none-TEST.whl')
         assert w.support_index_min() == 0
 
+    def test_support_index_min_default_tags(self):
+        """
+        Test `support_index_min` with the precomputed priorities of the
+        real supported tags
+        """
+        tags = pep425tags.supported_tags
+        tag = [t for t in tags if '-' not in ''.join(t)][0]
+        w = wheel.Wheel('simple-0.1-%s-%s-%s.whl' % tag)
+        assert w.support_index_min() == tags.index(tag)
+        assert w.supported()
+        assert pep425tags.supported_tags_priority[tag] == tags.index(tag)
+        w = wheel.Wheel('simple-0.1-py1-none-TEST.whl')
+        assert w.support_index_min() is None
+        assert not w.supported()
+
+    def test_supported_tags_read_only(self):
+        """
+        Test the shared supported tags and priorities can't be modified
+        """
+        priorities = pep425tags.supported_tags_priority
+        tag = ('py1', 'none', 'TEST')
+
+        def set_priority():
+            priorities[tag] = 0
+
+        assert_raises(TypeError, set_priority)
+        assert_raises(AttributeError, getattr, priorities, 'update')
+        assert_raises(AttributeError, getattr, pep425tags.supported_tags, 'append')
+        assert priorities.get(tag) is None
+
     @patch('pip.wheel.supported_tags', [])
     def test_support_index_min_none(self):
         """
@@ -137,3 +250,106 @@ class TestWheelFile(object):
         w = wheel.Wheel('simple-0.1-py2-none-any.whl')
         assert w.support_index_min() == None
 
+
+class TestSupportedTagsCache(object):
+
+    def setup(self):
+        self.tempdir = mkdtemp()
+        self.path = os.path.join(self.tempdir, 'tags', 'key.json')
+
+    def teardown(self):
+        rmtree(self.tempdir)
+
+    def test_computed_once_per_interpreter(self):
+        """
+        Test the supported tags are computed on first use, then read from
+        the cache until the interpreter changes
+        """
+        calls = []
+
+        def get_supported():
+            calls.append(1)
+            return [('py9', 'none', 'any')]
+
+        with patch('pip.pep425tags._cache_path', lambda: self.path):
+            with patch('pip.pep425tags.get_supported', get_supported):
+                tags = pep425tags._Computed(pep425tags.load_supported)
+                assert calls == []
+                assert tags == [('py9', 'none', 'any')]
+                assert ('py9', 'none', 'any') in tags
+                assert len(calls) == 1
+                other = pep425tags._Computed(pep425tags.load_supported)
+                assert other.index(('py9', 'none', 'any')) == 0
+                assert len(calls) == 1
+                info = pep425tags._interpreter_info() + ['rebuilt']
+                with patch('pip.pep425tags._interpreter_info', lambda: info):
+                    assert len(pep425tags.load_supported()) == 1
+                assert len(calls) == 2
+
+
+class TestWheelBuilderJobs(object):
+
+    class Req(object):
+        is_wheel = False
+
+        def __init__(self, name, comes_from=None):
+            self.name = name
+            self.comes_from = comes_from
+
+    def test_parallel_build_order_and_results(self):
+        """
+        Test parallel builds wait for the requirements a requirement
+        brought in, and report failures per requirement.
+        """
+        parent = self.Req('parent')
+        child = self.Req('child', parent)
+        broken = self.Req('broken')
+        built = []
+
+        def build(req):
+            built.append(req.name)
+            return req is not broken, 'output of %s' % req.name
+
+        builder = wheel.WheelBuilder(None, None, 'wheelhouse', jobs=4)
+        with patch.object(builder, '_build_captured', build):
+            succeeded = builder._build_parallel([parent, child, broken])
+        assert succeeded == set([parent, child])
+        assert built.index('child') < built.index('parent')
+        assert sorted(built) == ['broken', 'child', 'parent']
+
+    def test_circular_dependencies_are_built(self):
+        first = self.Req('first')
+        second = self.Req('second', first)
+        first.comes_from = second
+        builder = wheel.WheelBuilder(None, None, 'wheelhouse', jobs=2)
+        with patch.object(builder, '_build_captured', lambda req: (True, '')):
+            assert builder._build_parallel([first, second]) == set([first, second])
+
+
+def test_wheel_cache_get_picks_supported_wheel():
+    """
+    Test the wheel cache only returns wheels this interpreter supports,
+    the best one first.
+    """
+    cache_dir = mkdtemp()
+    try:
+        cache = wheel.WheelCache(cache_dir)
+        digest = 'ab' * 32
+        assert cache.get(digest) is None
+
+        build_dir = mkdtemp(dir=cache_dir)
+        tags = [t for t in pep425tags.supported_tags if '-' not in ''.join(t)]
+        for name in ['simple-0.1-py1-none-TEST.whl',
+                     'simple-0.1-%s-%s-%s.whl' % tags[-1],
+                     'simple-0.1-%s-%s-%s.whl' % tags[0]]:
+            path = os.path.join(build_dir, name)
+            open(path, 'w').close()
+            stored = cache.store(digest, path)
+            assert stored.startswith(os.path.join(cache_dir, 'ab', digest))
+            assert not os.path.exists(path)
+
+        best = cache.get(digest)
+        assert os.path.basename(best) == 'simple-0.1-%s-%s-%s.whl' % tags[0]
+        assert cache.get('cd' * 32) is None
+    finally:
+        rmtree(cache_dir)